@@ -0,0 +1,114 @@
+"""
+Benchmark do particionamento de cities por país: consultas típicas de relatórios
+e da carga na tabela particionada (cities) contra a cópia original
+(cities_unpartitioned, mantida por particionar_cidades.py --no-drop).
+
+Para cada cenário mede a mediana do tempo de execução (EXPLAIN ANALYZE) e quantas
+partições/tabelas de cidades o plano percorre, mostrando a poda de partições.
+
+Uso: python benchmarks/bench_cities_partitioning.py [repetições]
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from dao.database import get_engine
+
+# (nome, SQL na tabela particionada, SQL na tabela original)
+SCENARIOS = [
+    (
+        "relatório por país (join)",
+        """SELECT cities.name, states.name FROM cities
+           JOIN states ON cities.state_id = states.state_id AND cities.country_code = states.country_code
+           WHERE states.country_code = :country_code""",
+        """SELECT cities.name, states.name FROM cities_unpartitioned AS cities
+           JOIN states ON cities.state_id = states.state_id
+           WHERE states.country_code = :country_code""",
+    ),
+    (
+        "agregação por estado do país",
+        """SELECT states.name, count(*), sum(cities.population) FROM cities
+           JOIN states ON cities.state_id = states.state_id AND cities.country_code = states.country_code
+           WHERE states.country_code = :country_code GROUP BY states.name""",
+        """SELECT states.name, count(*), sum(cities.population) FROM cities_unpartitioned AS cities
+           JOIN states ON cities.state_id = states.state_id
+           WHERE states.country_code = :country_code GROUP BY states.name""",
+    ),
+    (
+        "dedupe da carga (estado)",
+        "SELECT name FROM cities WHERE country_code = :country_code AND state_id = :state_id",
+        "SELECT name FROM cities_unpartitioned WHERE state_id = :state_id",
+    ),
+    (
+        "busca por nome (todas)",
+        "SELECT city_id FROM cities WHERE name = :city_name",
+        "SELECT city_id FROM cities_unpartitioned WHERE name = :city_name",
+    ),
+]
+
+def scanned_relations(plan):
+    """
+    Tabelas de cidades (partições ou tabela original) lidas pelo plano
+    """
+    relations = set()
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        relation = node.get("Relation Name", "")
+        if relation.startswith("cities"):
+            relations.add(relation)
+        pending.extend(node.get("Plans", []))
+    return relations
+
+def measure(conn, sql, params, repetitions):
+    timings = []
+    relations = set()
+    for _ in range(repetitions):
+        result = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+        explain = result if isinstance(result, list) else json.loads(result)
+        timings.append(explain[0]["Planning Time"] + explain[0]["Execution Time"])
+        relations = scanned_relations(explain[0]["Plan"])
+    timings.sort()
+    return timings[len(timings) // 2], len(relations)
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+
+    with get_engine().connect() as conn:
+        partitions = conn.execute(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'public.cities'::regclass"
+        )).scalar()
+        has_baseline = conn.execute(text("SELECT to_regclass('public.cities_unpartitioned') IS NOT NULL")).scalar()
+        if not partitions:
+            print("cities não é particionada: execute BD/particionar_cidades.py antes do benchmark")
+            return
+
+        # Valores de exemplo: o estado com mais cidades
+        sample = conn.execute(text(
+            """SELECT s.country_code, s.state_id, min(c.name) AS city_name
+               FROM cities c JOIN states s ON s.state_id = c.state_id
+               GROUP BY s.country_code, s.state_id ORDER BY count(*) DESC LIMIT 1"""
+        )).mappings().first()
+        params = dict(sample)
+
+        print(f"cities: {partitions} partições; exemplo {params['country_code']} / estado {params['state_id']}; "
+              f"mediana de {repetitions} execuções\n")
+        print(f"{'cenário':<32}{'particionada (ms)':>19}{'partições':>11}{'original (ms)':>15}{'ganho':>8}")
+
+        for name, partitioned_sql, baseline_sql in SCENARIOS:
+            partitioned_time, scanned = measure(conn, partitioned_sql, params, repetitions)
+            line = f"{name:<32}{partitioned_time:>19.2f}{f'{scanned}/{partitions}':>11}"
+            if has_baseline:
+                baseline_time, _ = measure(conn, baseline_sql, params, repetitions)
+                line += f"{baseline_time:>15.2f}{baseline_time / partitioned_time:>7.1f}x"
+            print(line)
+
+        if not has_baseline:
+            print("\n(sem cities_unpartitioned: migre com particionar_cidades.py --no-drop para comparar com a tabela original)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark da serialização de relatórios: caminho antigo (RowMapping -> dict ->
+jsonable_encoder -> json) contra o caminho orjson a partir das tuplas.
+
+Não usa o banco: gera linhas sintéticas no formato de um relatório de cidades
+com join em estados e países (inteiros, textos, Decimal, float e datas).
+
+Uso: python benchmarks/bench_report_serialization.py [linhas] [repetições]
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from controller.reportResponse import render_report
+
+COLUMNS = [
+    "cities_id", "cities_name", "cities_population", "cities_latitude", "cities_longitude",
+    "states_name", "countries_name", "countries_gdp", "updated_at", "founded_on",
+]
+
+def generate_rows(count: int):
+    random.seed(42)
+    base_time = datetime(2024, 1, 1, 12, 0, 0)
+    rows = []
+    for index in range(count):
+        rows.append((
+            index + 1,
+            f"Cidade {index}",
+            random.randint(100, 12_000_000),
+            random.uniform(-90, 90),
+            random.uniform(-180, 180),
+            f"Estado {index % 27}",
+            f"País {index % 250}",
+            Decimal(f"{random.uniform(1e6, 1e12):.2f}"),
+            base_time + timedelta(minutes=index),
+            date(1500 + index % 500, 1 + index % 12, 1 + index % 28),
+        ))
+    return rows
+
+def legacy_path(rows, sql):
+    # Equivalente ao caminho anterior: dict por linha + encoder padrão do FastAPI
+    data = [dict(zip(COLUMNS, row)) for row in rows]
+    content = jsonable_encoder({"data": data, "sql": sql})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_objects_path(rows, sql):
+    return render_report(COLUMNS, rows, sql, "objects")
+
+def orjson_rows_path(rows, sql):
+    return render_report(COLUMNS, rows, sql, "rows")
+
+def measure(function, rows, sql, repetitions: int):
+    payload_size = len(function(rows, sql))
+    timings = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        function(rows, sql)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2], payload_size
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = generate_rows(row_count)
+    sql = "SELECT ... FROM cities JOIN states ... JOIN countries ... LIMIT 5000"
+
+    print(f"{row_count} linhas x {len(COLUMNS)} colunas, mediana de {repetitions} execuções\n")
+    print(f"{'caminho':<28}{'tempo (ms)':>12}{'linhas/s':>14}{'bytes':>12}{'ganho':>8}")
+
+    baseline = None
+    for name, function in [
+        ("jsonable_encoder + json", legacy_path),
+        ("orjson (objetos)", orjson_objects_path),
+        ("orjson (rows)", orjson_rows_path),
+    ]:
+        median, payload_size = measure(function, rows, sql, repetitions)
+        baseline = baseline or median
+        print(f"{name:<28}{median * 1000:>12.2f}{row_count / median:>14,.0f}{payload_size:>12,}{baseline / median:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
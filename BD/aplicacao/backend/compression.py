@@ -0,0 +1,210 @@
+"""
+Middleware ASGI de compressão com negociação de Content-Encoding (zstd, br, gzip)
+"""
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pacote opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pacote opcional
+    zstandard = None
+
+# Ordem de preferência do servidor quando o cliente aceita várias codificações com o mesmo peso
+ENCODING_PREFERENCE = ["zstd", "br", "gzip"]
+
+# Tipos já comprimidos ou binários que não se beneficiam de nova compressão
+INCOMPRESSIBLE_MEDIA_TYPES = {
+    "application/gzip",
+    "application/zip",
+    "application/octet-stream",
+    "application/vnd.apache.parquet",
+    "image/png",
+    "image/jpeg",
+}
+
+def available_encodings() -> List[str]:
+    """Codificações suportadas com os pacotes instalados"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Interpreta Accept-Encoding em {codificação: peso q}
+    """
+    weights = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights
+
+def negotiate_encoding(header: str, encodings: List[str]) -> Optional[str]:
+    """
+    Escolhe a codificação de maior peso aceita pelo cliente (desempate pela preferência do servidor)
+    """
+    weights = parse_accept_encoding(header)
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+class StreamCompressor:
+    """
+    Compressor incremental: cada bloco é emitido com flush, para que respostas
+    em streaming continuem chegando ao cliente aos poucos
+    """
+    def __init__(self, encoding: str, levels: Dict[str, int]):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=levels["zstd"]).compressobj()
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=levels["br"])
+        else:
+            self._compressor = zlib.compressobj(levels["gzip"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush()
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class CompressionMiddleware:
+    """
+    Comprime respostas acima de minimum_size com a melhor codificação aceita pelo cliente.
+
+    Respostas pequenas (health, metadados curtos) seguem sem compressão, sem custo extra;
+    respostas em streaming são comprimidas bloco a bloco.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), self.encodings)
+        # Respostas parciais (Range) precisam manter os bytes originais
+        if encoding is None or "range" in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self.app, encoding, self.minimum_size, self.levels)
+        await responder(scope, receive, send)
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int, levels: Dict[str, int]):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.levels = levels
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _suffix_etag(self, headers: MutableHeaders) -> None:
+        # Cada codificação é uma representação diferente: o ETag forte não pode ser o mesmo
+        if "etag" in headers and headers["etag"].endswith('"'):
+            headers["ETag"] = f'{headers["etag"][:-1]}-{self.encoding}"'
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Os cabeçalhos só são enviados quando o primeiro bloco do corpo define se haverá compressão
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            if message["status"] == 304:
+                # O 304 confirma a representação que o cliente tem, comprimida com a mesma codificação
+                self._suffix_etag(MutableHeaders(raw=message["headers"]))
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or media_type in INCOMPRESSIBLE_MEDIA_TYPES
+                or message["status"] < 200
+                or message["status"] in (204, 206, 304)
+            )
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self._suffix_etag(headers)
+            self.compressor = StreamCompressor(self.encoding, self.levels)
+
+            if not more_body:
+                message["body"] = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(message["body"]))
+            else:
+                # Tamanho final desconhecido em streaming
+                del headers["Content-Length"]
+                message["body"] = self.compressor.compress(body)
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        message["body"] = self.compressor.compress(body) if more_body else self.compressor.finish(body)
+        await self.send(message)
@@ -0,0 +1,60 @@
+"""
+ETags e requisições condicionais (If-None-Match -> 304 Not Modified)
+"""
+import hashlib
+import os
+from typing import Dict
+
+import orjson
+from fastapi import HTTPException, Request
+
+# Metadados mudam só com alterações no schema: o navegador pode reaproveitar por max-age segundos
+METADATA_CACHE_CONTROL = f"private, max-age={int(os.getenv('METADATA_CACHE_MAX_AGE', '0'))}, must-revalidate"
+# Relatórios sempre revalidam (a versão dos dados pode mudar a qualquer carga)
+REPORT_CACHE_CONTROL = "private, no-cache"
+
+# Sufixos adicionados ao ETag pelo middleware de compressão
+ENCODING_ETAG_SUFFIXES = ("-zstd", "-br", "-gzip")
+
+def make_etag(*parts: str) -> str:
+    """
+    ETag forte a partir das partes que identificam a representação
+    """
+    digest = hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def canonical_hash(content) -> str:
+    """
+    Hash de um conteúdo JSON independente da ordem das chaves
+    """
+    return hashlib.sha1(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Compara If-None-Match com o ETag (comparação fraca, como manda o RFC 9110)
+    """
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # A mesma representação comprimida carrega o sufixo da codificação
+        for suffix in ENCODING_ETAG_SUFFIXES:
+            if candidate.endswith(f'{suffix}"'):
+                candidate = candidate[:-len(suffix) - 1] + '"'
+                break
+        if candidate == etag:
+            return True
+    return False
+
+def check_not_modified(request: Request, etag: str, cache_control: str) -> Dict[str, str]:
+    """
+    Responde 304 se o cliente já tem a representação; senão retorna os
+    cabeçalhos de cache a incluir na resposta completa
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    return headers
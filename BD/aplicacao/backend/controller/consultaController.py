@@ -1,10 +1,15 @@
 """
 Controller para consultas e geração de relatórios ADHOC
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from dao.consultaDAO import ConsultaDAO
+from dao.dataVersionDAO import data_version_dao
+from dao.geoDAO import GEO_SOURCE_TABLES
+from dao.resultBuffer import ResultTooLargeError
+from controller.conditional import METADATA_CACHE_CONTROL, REPORT_CACHE_CONTROL, canonical_hash, check_not_modified, make_etag
+from controller.reportResponse import report_response
 
 router = APIRouter()
 consulta_dao = ConsultaDAO()
@@ -17,6 +22,7 @@ class JoinRequest(BaseModel):
     sourceAttribute: str = Field(..., description="Atributo da tabela origem")
     targetAttribute: str = Field(..., description="Atributo da tabela alvo")
     joinType: str = Field(default="INNER JOIN", description="Tipo de join")
+    alias: Optional[str] = Field(None, description="Alias da tabela alvo (permite juntar a mesma tabela mais de uma vez)")
 
 class JoinedTablesRequest(BaseModel):
     """Modelo para requisição de colunas de tabelas joinadas"""
@@ -43,6 +49,33 @@ class FilterCondition(BaseModel):
     function: Optional[str] = Field(None, description="Função a aplicar no atributo")
     logic: str = Field(default="AND", description="Lógica do filtro (AND/OR)")
 
+class FilterGroup(BaseModel):
+    """Modelo para grupo de filtros aninhados (equivale a parênteses no WHERE)"""
+    logic: str = Field(default="AND", pattern="^(AND|OR)$", description="Lógica que combina as condições do grupo (AND/OR)")
+    conditions: List[Union[FilterCondition, "FilterGroup"]] = Field(default=[], description="Condições simples ou subgrupos")
+
+FilterGroup.model_rebuild()
+
+class HavingCondition(BaseModel):
+    """Modelo para filtro sobre agregação (HAVING)"""
+    attribute: str = Field(..., description="Alias de uma função de agregação selecionada ou atributo a agregar")
+    function: Optional[str] = Field(None, description="Função de agregação (obrigatória quando attribute não é um alias)")
+    operator: str = Field(..., description="Operador de comparação")
+    value: Any = Field(..., description="Valor para comparação")
+    logic: str = Field(default="AND", description="Lógica do filtro (AND/OR)")
+
+class TopNPerGroup(BaseModel):
+    """Modelo para top-N por grupo (ROW_NUMBER() OVER (PARTITION BY ...))"""
+    partitionBy: List[str] = Field(..., min_length=1, description="Atributos que definem os grupos")
+    orderBy: List[OrderByColumn] = Field(..., min_length=1, description="Ordenação que define as N primeiras linhas de cada grupo")
+    n: int = Field(..., gt=0, description="Linhas mantidas por grupo")
+
+class PreviewOptions(BaseModel):
+    """Modelo para prévia amostrada do relatório (TABLESAMPLE na tabela base)"""
+    method: str = Field(default="SYSTEM", description="Método de amostragem (SYSTEM ou BERNOULLI)")
+    percent: float = Field(default=1.0, gt=0, le=100, description="Percentual da tabela base a amostrar")
+    seed: Optional[int] = Field(default=1, description="Semente para amostragem repetível (REPEATABLE)")
+
 class ReportRequest(BaseModel):
     """Modelo para requisição de relatório ADHOC"""
     baseTable: str = Field(..., description="Tabela base")
@@ -52,7 +85,14 @@ class ReportRequest(BaseModel):
     aggregateFunctions: List[AggregateFunction] = Field(default=[], description="Funções de agregação")
     orderByColumns: List[OrderByColumn] = Field(default=[], description="Colunas para ordenação")
     filters: List[FilterCondition] = Field(default=[], description="Filtros")
+    filterTree: Optional[FilterGroup] = Field(default=None, description="Filtros aninhados em grupos AND/OR (combinados com AND aos filtros)")
     limit: Optional[int] = Field(default=1000, description="Limite de resultados")
+    preview: Optional[PreviewOptions] = Field(default=None, description="Executa sobre uma amostra da tabela base")
+    having: List[HavingCondition] = Field(default=[], description="Filtros sobre agregações (HAVING)")
+    topN: Optional[TopNPerGroup] = Field(default=None, description="Mantém só as N primeiras linhas de cada grupo")
+    optimizeJoins: bool = Field(default=True, description="Remove joins que não afetam o resultado e reordena os demais")
+    engine: str = Field(default="auto", pattern="^(auto|postgres|olap)$", description="Motor de execução: auto (memória, DuckDB ou Postgres, pelo custo), postgres ou olap (DuckDB sobre snapshots Parquet)")
+    responseFormat: str = Field(default="objects", pattern="^(objects|rows)$", description="Formato dos dados: objects (lista de objetos) ou rows (colunas + linhas)")
 
 class TransitiveRelationsWithJoinsRequest(BaseModel):
     """Modelo para relações transitivas com joins"""
@@ -65,8 +105,88 @@ def handle_error(operation: str, error: Exception) -> HTTPException:
     print(error_message)  # Log do erro
     return HTTPException(status_code=500, detail=error_message)
 
-@router.get("/tables", summary="Listar todas as tabelas")
-async def get_all_tables():
+def build_report_kwargs(request: ReportRequest) -> Dict[str, Any]:
+    """Converte um ReportRequest nos argumentos nomeados esperados pelo DAO"""
+    # Converter objetos para dicionários antes de passar para o DAO
+    joins_dict = [join.model_dump() for join in request.joins]
+    agg_functions_dict = [agg.model_dump() for agg in request.aggregateFunctions]
+    
+    # Normalizar orderByColumns
+    order_by_dict = []
+    for order in request.orderByColumns:
+        order_dict = order.model_dump()
+        # Compatibilidade: usar 'column' como 'attribute' se 'attribute' não estiver presente
+        if order_dict.get('column') and not order_dict.get('attribute'):
+            order_dict['attribute'] = order_dict['column']
+        order_by_dict.append(order_dict)
+    
+    # Converter filtros para dicionários
+    filters_dict = [filter_obj.model_dump() for filter_obj in request.filters]
+    
+    return {
+        "base_table": request.baseTable,
+        "attributes": request.attributes,
+        "joins": joins_dict,
+        "group_by_attributes": request.groupByAttributes,
+        "aggregate_functions": agg_functions_dict,
+        "order_by_columns": order_by_dict,
+        "filters": filters_dict,
+        "limit": request.limit,
+        "preview": request.preview.model_dump() if request.preview else None,
+        "having": [having.model_dump() for having in request.having],
+        "top_n": request.topN.model_dump() if request.topN else None,
+        "optimize_joins": request.optimizeJoins,
+        "filter_tree": request.filterTree.model_dump() if request.filterTree else None,
+    }
+
+def build_join_plan(report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Resumo do otimizador de joins para a resposta (None quando nada mudou)"""
+    if not report["optimize_joins"] or not report["joins"]:
+        return None
+    _, plan = consulta_dao.optimizeJoins(
+        report["base_table"], report["attributes"], report["joins"], report["group_by_attributes"],
+        report["aggregate_functions"], report["order_by_columns"], report["filters"],
+        report["having"], report["top_n"], report["filter_tree"]
+    )
+    if not plan["pruned"] and plan["order"] == plan["originalOrder"]:
+        return None
+    return plan
+
+def schema_etag(request: Request, response: Response) -> None:
+    """
+    Dependência dos endpoints de metadados: ETag derivado do fingerprint do schema
+    e da URL; responde 304 quando o cliente já tem a mesma versão
+    """
+    try:
+        fingerprint = consulta_dao.getSchemaFingerprint()
+    except Exception as e:
+        # Sem fingerprint a resposta segue sem ETag (o endpoint reporta o erro, se houver)
+        print(f"Erro ao calcular fingerprint do schema: {e}")
+        return
+    etag = make_etag("schema", fingerprint, request.url.path, request.url.query)
+    response.headers.update(check_not_modified(request, etag, METADATA_CACHE_CONTROL))
+
+def report_etag(request: ReportRequest) -> Optional[str]:
+    """
+    ETag de relatório: versão dos dados das tabelas envolvidas, schema e hash canônico da requisição.
+    Prévias sem semente não são repetíveis e ficam sem ETag.
+    """
+    if request.preview and request.preview.seed is None:
+        return None
+    tables = [request.baseTable] + [join.targetTable for join in request.joins]
+    # Filtros por distância dependem das coordenadas dos países
+    if any((condition.get("operator") or "").upper() == "WITHIN_KM"
+           for condition in consulta_dao.listFilterConditions(request.filters, request.filterTree)):
+        tables += GEO_SOURCE_TABLES
+    return make_etag(
+        "report",
+        data_version_dao.getVersionToken(tables),
+        consulta_dao.getSchemaFingerprint(),
+        canonical_hash(request.model_dump(mode="json"))
+    )
+
+@router.get("/tables", summary="Listar todas as tabelas", dependencies=[Depends(schema_etag)])
+def get_all_tables():
     """Retorna todas as tabelas disponíveis no banco de dados"""
     try:
         tables = consulta_dao.getAllTables()
@@ -74,8 +194,8 @@ async def get_all_tables():
     except Exception as e:
         raise handle_error("buscar tabelas", e)
 
-@router.get("/tables/{table_name}/relations", summary="Obter relações de uma tabela")
-async def get_table_relations(table_name: str):
+@router.get("/tables/{table_name}/relations", summary="Obter relações de uma tabela", dependencies=[Depends(schema_etag)])
+def get_table_relations(table_name: str):
     """Retorna as relações de uma tabela específica"""
     try:
         relations = consulta_dao.getTableRelations(table_name)
@@ -83,8 +203,8 @@ async def get_table_relations(table_name: str):
     except Exception as e:
         raise handle_error(f"buscar relações da tabela {table_name}", e)
 
-@router.get("/tables/{table_name}/transitive-relations", summary="Obter relações transitivas")
-async def get_transitive_relations(table_name: str, used_tables: str = ""):
+@router.get("/tables/{table_name}/transitive-relations", summary="Obter relações transitivas", dependencies=[Depends(schema_etag)])
+def get_transitive_relations(table_name: str, used_tables: str = ""):
     """Retorna as relações diretas e transitivas de uma tabela específica"""
     try:
         used_tables_list = [table.strip() for table in used_tables.split(",") if table.strip()] if used_tables else []
@@ -94,7 +214,7 @@ async def get_transitive_relations(table_name: str, used_tables: str = ""):
         raise handle_error(f"buscar relações transitivas da tabela {table_name}", e)
 
 @router.post("/tables/{table_name}/transitive-relations-with-joins", summary="Obter relações transitivas com joins")
-async def get_transitive_relations_with_joins(table_name: str, request: TransitiveRelationsWithJoinsRequest):
+def get_transitive_relations_with_joins(table_name: str, request: TransitiveRelationsWithJoinsRequest):
     """Retorna as relações diretas e transitivas considerando joins já existentes"""
     try:
         joins_dict = [join.model_dump() for join in request.joins]
@@ -103,8 +223,8 @@ async def get_transitive_relations_with_joins(table_name: str, request: Transiti
     except Exception as e:
         raise handle_error(f"buscar relações transitivas com joins para {table_name}", e)
 
-@router.get("/tables/{table_name}/columns", summary="Obter colunas de uma tabela")
-async def get_table_columns(table_name: str):
+@router.get("/tables/{table_name}/columns", summary="Obter colunas de uma tabela", dependencies=[Depends(schema_etag)])
+def get_table_columns(table_name: str):
     """Retorna as colunas de uma tabela específica"""
     try:
         columns = consulta_dao.getTableColumns(table_name)
@@ -112,8 +232,17 @@ async def get_table_columns(table_name: str):
     except Exception as e:
         raise handle_error(f"buscar colunas da tabela {table_name}", e)
 
+@router.get("/tables/{table_name}/columns/{column_name}/values", summary="Obter valores distintos de uma coluna")
+def get_column_values(table_name: str, column_name: str, prefix: str = "", mode: str = "prefix", limit: int = 20):
+    """Retorna valores distintos de uma coluna para autocomplete de filtros (mode: prefix ou contains)"""
+    try:
+        result = consulta_dao.getColumnDistinctValues(table_name, column_name, prefix, mode, limit)
+        return result
+    except Exception as e:
+        raise handle_error(f"buscar valores da coluna {table_name}.{column_name}", e)
+
 @router.post("/tables/joined-columns", summary="Obter colunas de tabelas joinadas")
-async def get_joined_tables_columns(request: JoinedTablesRequest):
+def get_joined_tables_columns(request: JoinedTablesRequest):
     """Retorna as colunas de todas as tabelas envolvidas em joins"""
     try:
         joins_dict = [join.model_dump() for join in request.joins]
@@ -122,8 +251,8 @@ async def get_joined_tables_columns(request: JoinedTablesRequest):
     except Exception as e:
         raise handle_error("buscar colunas das tabelas joinadas", e)
 
-@router.get("/tables/{source_table}/foreign-keys/{target_table}", summary="Obter relações de chave estrangeira")
-async def get_foreign_key_relations(source_table: str, target_table: str):
+@router.get("/tables/{source_table}/foreign-keys/{target_table}", summary="Obter relações de chave estrangeira", dependencies=[Depends(schema_etag)])
+def get_foreign_key_relations(source_table: str, target_table: str):
     """Retorna as relações de chave estrangeira entre duas tabelas"""
     try:
         relations = consulta_dao.getForeignKeyRelations(source_table, target_table)
@@ -132,43 +261,53 @@ async def get_foreign_key_relations(source_table: str, target_table: str):
         raise handle_error(f"buscar relações FK entre {source_table} e {target_table}", e)
 
 @router.post("/report", summary="Gerar relatório ADHOC")
-async def generate_report(request: ReportRequest):
+def generate_report(request: ReportRequest, http_request: Request):
     """Gera um relatório adhoc com base nos parâmetros fornecidos"""
     try:
-        # Converter objetos para dicionários antes de passar para o DAO
-        joins_dict = [join.model_dump() for join in request.joins]
-        agg_functions_dict = [agg.model_dump() for agg in request.aggregateFunctions]
+        # Requisição condicional: com o mesmo ETag o relatório nem é executado
+        etag = report_etag(request)
+        headers = check_not_modified(http_request, etag, REPORT_CACHE_CONTROL) if etag else {}
         
-        # Normalizar orderByColumns
-        order_by_dict = []
-        for order in request.orderByColumns:
-            order_dict = order.model_dump()
-            # Compatibilidade: usar 'column' como 'attribute' se 'attribute' não estiver presente
-            if order_dict.get('column') and not order_dict.get('attribute'):
-                order_dict['attribute'] = order_dict['column']
-            order_by_dict.append(order_dict)
+        report = build_report_kwargs(request)
+        result, sql_query = consulta_dao.generateAdhocReportResult(**report, engine=request.engine)
         
-        # Converter filtros para dicionários
-        filters_dict = [filter_obj.model_dump() for filter_obj in request.filters]
+        try:
+            extra = {"engine": result.engine}
+            if report["preview"]:
+                extra["preview"] = consulta_dao.getPreviewInfo(report["preview"], report["aggregate_functions"])
+            join_plan = build_join_plan(report)
+            if join_plan:
+                extra["joinPlan"] = join_plan
+        except Exception:
+            result.close()
+            raise
         
-        result, sql_query = consulta_dao.generateAdhocReport(
-            request.baseTable,
-            request.attributes,
-            joins_dict,
-            request.groupByAttributes,
-            agg_functions_dict,
-            order_by_dict,
-            filters_dict,
-            request.limit
-        )
-        
-        return {"data": result, "sql": sql_query}
+        return report_response(result, sql_query, request.responseFormat, headers, **extra)
+    except HTTPException:
+        raise
+    except ResultTooLargeError as e:
+        print(f"Relatório rejeitado: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         import traceback
         error_detail = f"Erro ao gerar relatório: {str(e)}\n{traceback.format_exc()}"
         print(error_detail)
         raise HTTPException(status_code=500, detail=error_detail)
 
+@router.post("/report/plan", summary="Ver o SQL reescrito de um relatório ADHOC")
+def plan_report(request: ReportRequest):
+    """Retorna o SQL gerado (após a otimização dos joins), o resumo do otimizador e os filtros normalizados, sem executar a consulta"""
+    try:
+        report = build_report_kwargs(request)
+        query = consulta_dao.buildAdhocQuery(**report)
+        return {
+            "sql": consulta_dao.compileQuery(query),
+            "joinPlan": build_join_plan(report),
+            "filters": consulta_dao.normalizeFilters(report["filters"], report["filter_tree"]),
+        }
+    except Exception as e:
+        raise handle_error("planejar relatório", e)
+
 @router.get("/functions/available", summary="Obter funções disponíveis")
 async def get_available_functions():
     """Retorna as funções disponíveis por tipo de dados"""
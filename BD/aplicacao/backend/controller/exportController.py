@@ -0,0 +1,143 @@
+"""
+Controller para jobs de exportação de relatórios ADHOC
+"""
+import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from controller.consultaController import ReportRequest, build_report_kwargs, consulta_dao, handle_error
+from dao.exportDAO import ExportDAO
+
+router = APIRouter()
+export_dao = ExportDAO(consulta_dao)
+
+# Tamanho dos blocos lidos do arquivo ao responder requisições com Range
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+class ExportRequest(BaseModel):
+    """Modelo para requisição de exportação de relatório"""
+    report: ReportRequest = Field(..., description="Relatório a exportar (limit nulo exporta todas as linhas)")
+    format: str = Field(default="csv", description="Formato do arquivo (csv ou parquet)")
+
+def parse_range_header(range_header: str, file_size: int):
+    """
+    Interpreta um cabeçalho Range de intervalo único (bytes=início-fim, bytes=início- ou bytes=-sufixo)
+
+    Returns:
+        Tupla (início, fim) inclusiva, ou None se o intervalo for inválido
+    """
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+
+    start_text, _, end_text = byte_range.strip().partition("-")
+    try:
+        if start_text == "":
+            # Sufixo: últimos N bytes
+            suffix_length = int(end_text)
+            if suffix_length <= 0:
+                return None
+            return max(file_size - suffix_length, 0), file_size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        return None
+
+    if start >= file_size or start > end:
+        return None
+    return start, min(end, file_size - 1)
+
+def iter_file_range(path: str, start: int, end: int):
+    """Lê o arquivo do byte start ao byte end (inclusivo) em blocos"""
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@router.post("/exports", summary="Criar job de exportação")
+def create_export(request: ExportRequest):
+    """Enfileira a exportação de um relatório e retorna o id do job"""
+    try:
+        report = build_report_kwargs(request.report)
+        # Sem limit explícito a exportação traz todas as linhas
+        report["limit"] = request.report.limit if "limit" in request.report.model_fields_set else None
+        return export_dao.submitExport(report, request.format)
+    except Exception as e:
+        raise handle_error("criar job de exportação", e)
+
+@router.get("/exports", summary="Listar jobs de exportação")
+def list_exports():
+    """Retorna todos os jobs de exportação com status e progresso"""
+    try:
+        return {"jobs": export_dao.listJobs()}
+    except Exception as e:
+        raise handle_error("listar jobs de exportação", e)
+
+@router.get("/exports/{job_id}", summary="Obter status de um job de exportação")
+def get_export(job_id: str):
+    """Retorna status, linhas e bytes gravados de um job de exportação"""
+    try:
+        return export_dao.getJob(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error(f"buscar job de exportação {job_id}", e)
+
+@router.get("/exports/{job_id}/download", summary="Baixar arquivo exportado")
+def download_export(job_id: str, request: Request):
+    """Retorna o arquivo de um job concluído, com suporte a requisições Range"""
+    try:
+        job_file = export_dao.getJobFile(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    path = job_file["path"]
+    file_size = os.path.getsize(path)
+    content_disposition = f'attachment; filename="{job_file["file_name"]}"'
+
+    range_header = request.headers.get("range")
+    if not range_header:
+        return FileResponse(
+            path,
+            media_type=job_file["media_type"],
+            filename=job_file["file_name"],
+            headers={"Accept-Ranges": "bytes"}
+        )
+
+    byte_range = parse_range_header(range_header, file_size)
+    if byte_range is None:
+        raise HTTPException(
+            status_code=416,
+            detail="Intervalo solicitado inválido",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    start, end = byte_range
+    return StreamingResponse(
+        iter_file_range(path, start, end),
+        status_code=206,
+        media_type=job_file["media_type"],
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{file_size}",
+            "Content-Length": str(end - start + 1),
+            "Content-Disposition": content_disposition,
+        }
+    )
+
+@router.delete("/exports/{job_id}", summary="Cancelar ou remover job de exportação")
+def delete_export(job_id: str):
+    """Cancela um job em andamento ou remove o arquivo de um job finalizado"""
+    try:
+        return export_dao.deleteJob(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error(f"remover job de exportação {job_id}", e)
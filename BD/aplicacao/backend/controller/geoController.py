@@ -0,0 +1,24 @@
+"""
+Controller para consultas geográficas (países próximos)
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from controller.consultaController import handle_error
+from dao.geoDAO import geo_dao
+
+router = APIRouter()
+
+@router.get("/geo/nearby", summary="Países próximos de um país ou ponto")
+def get_nearby_countries(country: Optional[str] = None, lat: Optional[float] = None,
+                               lng: Optional[float] = None, radiusKm: Optional[float] = None,
+                               k: Optional[int] = None, includeSelf: bool = False):
+    """
+    Retorna os países a até radiusKm e/ou os k mais próximos do país (código) ou do ponto
+    lat/lng informado, ordenados pela distância haversine em km
+    """
+    try:
+        return geo_dao.getNearby(country, lat, lng, radiusKm, k, includeSelf)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error("buscar países próximos", e)
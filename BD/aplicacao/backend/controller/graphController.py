@@ -0,0 +1,44 @@
+"""
+Controller para consultas no grafo de fronteiras entre países
+"""
+from fastapi import APIRouter, HTTPException, Query
+from controller.consultaController import handle_error
+from dao.borderGraphDAO import MAX_NEIGHBORHOOD_HOPS, border_graph_dao
+
+router = APIRouter()
+
+@router.get("/graph/borders/path", summary="Menor caminho por fronteiras entre dois países")
+def get_border_path(source: str, target: str):
+    """
+    Retorna a menor sequência de países, cruzando apenas fronteiras terrestres,
+    de source até target (path vazio e hops nulo se não há caminho)
+    """
+    try:
+        return border_graph_dao.getShortestPath(source, target)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error("calcular caminho entre países", e)
+
+@router.get("/graph/borders/components", summary="Componentes conexos do grafo de fronteiras")
+def get_border_components(minSize: int = Query(1, ge=1)):
+    """
+    Retorna os grupos de países ligados por fronteiras terrestres, do maior para o menor
+    """
+    try:
+        return border_graph_dao.getComponents(minSize)
+    except Exception as e:
+        raise handle_error("listar componentes do grafo de fronteiras", e)
+
+@router.get("/graph/borders/{country}", summary="Vizinhança de um país a até k fronteiras")
+def get_border_neighborhood(country: str, hops: int = Query(1, ge=1, le=MAX_NEIGHBORHOOD_HOPS)):
+    """
+    Retorna os países alcançáveis a partir de country cruzando até hops fronteiras,
+    com a distância em saltos de cada um
+    """
+    try:
+        return border_graph_dao.getNeighborhood(country, hops)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error("buscar vizinhança do país", e)
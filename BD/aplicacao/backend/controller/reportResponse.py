@@ -0,0 +1,125 @@
+"""
+Serialização de relatórios com orjson, direto das tuplas retornadas pelo banco
+"""
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List
+
+import orjson
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Formatos de "data" aceitos na resposta de relatórios
+REPORT_RESPONSE_FORMATS = {"objects", "rows"}
+
+def encode_default(value: Any) -> Any:
+    """
+    Tipos que o orjson não serializa nativamente (chamado só para esses valores)
+    """
+    if isinstance(value, Decimal):
+        # Mesmo critério do encoder do FastAPI: inteiro quando não há casas decimais
+        return int(value) if value.is_finite() and value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    # Datas, floats, ints, strings e tuplas são tratados nativamente pelo orjson
+    return orjson.dumps(content, default=encode_default)
+
+def render_report(columns: List[str], rows: List[tuple], sql: str, response_format: str = "objects",
+                  **extra: Any) -> bytes:
+    """
+    Monta o corpo JSON de um relatório
+
+    Args:
+        columns: Nomes das colunas, na ordem das tuplas
+        rows: Linhas do resultado como tuplas
+        sql: SQL gerado
+        response_format: "objects" ([{coluna: valor}], formato padrão do frontend) ou
+            "rows" (colunas + linhas em arrays, sem nenhum dicionário por linha)
+        extra: Campos adicionais da resposta (ex.: preview)
+    """
+    if response_format not in REPORT_RESPONSE_FORMATS:
+        raise ValueError(f"Formato de resposta '{response_format}' não suportado")
+
+    if response_format == "rows":
+        # orjson serializa as tuplas nativamente como arrays
+        return dumps({"columns": columns, "rows": rows, "sql": sql, **extra})
+
+    # Formato de objetos: o dicionário de cada linha é criado em C (zip) e serializado sem
+    # passar pelo jsonable_encoder do FastAPI
+    return dumps({"data": [dict(zip(columns, row)) for row in rows], "sql": sql, **extra})
+
+def stream_report(result, sql: str, response_format: str = "objects", batch_size: int = 1000,
+                  **extra: Any) -> Iterator[bytes]:
+    """
+    Gera o mesmo JSON de render_report em blocos, lendo as linhas de um ResultBuffer
+    (memória e arquivo de spill) sem montar o corpo inteiro. Fecha o buffer ao final.
+    """
+    if response_format not in REPORT_RESPONSE_FORMATS:
+        raise ValueError(f"Formato de resposta '{response_format}' não suportado")
+
+    try:
+        columns = result.columns
+        if response_format == "rows":
+            yield b'{"columns":' + dumps(columns) + b',"rows":['
+        else:
+            yield b'{"data":['
+
+        first = True
+        for batch in result.iter_batches(batch_size):
+            if not batch:
+                continue
+            if response_format == "objects":
+                batch = [dict(zip(columns, row)) for row in batch]
+            # Remove os colchetes do array do bloco para concatenar os blocos em um único array
+            chunk = dumps(batch)[1:-1]
+            yield chunk if first else b"," + chunk
+            first = False
+
+        # Campos finais: o mesmo objeto de render_report sem a abertura "{"
+        yield b"]," + dumps({"sql": sql, **extra})[1:]
+    finally:
+        result.close()
+
+class ORJSONResponse(Response):
+    """
+    Resposta JSON serializada com orjson; aceita conteúdo já serializado (bytes)
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def report_response(result, sql: str, response_format: str = "objects", headers: Dict[str, str] = None,
+                    **extra: Any) -> Response:
+    """
+    Resposta de um relatório a partir de um ResultBuffer, que é sempre fechado: na hora,
+    se as linhas couberam em memória, ou ao fim do envio, se parte delas foi para o disco
+
+    Args:
+        result: ResultBuffer com as linhas (a resposta assume o fechamento)
+        sql: SQL gerado
+        response_format: "objects" ou "rows" (ver render_report)
+        headers: Cabeçalhos da resposta (ex.: ETag)
+        extra: Campos adicionais da resposta
+    """
+    if result.spilled:
+        # Resultado acima do orçamento de memória: parte das linhas está em disco e é enviada
+        # em streaming. A tarefa de fundo fecha o buffer mesmo se o cliente desconectar antes
+        # do primeiro bloco (quando o finally do gerador nunca roda)
+        return StreamingResponse(
+            stream_report(result, sql, response_format, **extra),
+            media_type="application/json",
+            headers=headers,
+            background=BackgroundTask(result.close)
+        )
+
+    # Serialização direta das tuplas com orjson (sem o jsonable_encoder do FastAPI)
+    with result:
+        content = render_report(result.columns, result.rows, sql, response_format, **extra)
+    return ORJSONResponse(content, headers=headers)
@@ -0,0 +1,75 @@
+"""
+Controller para relatórios salvos executados por prepared statements
+"""
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+from controller.consultaController import ReportRequest, build_report_kwargs, consulta_dao, handle_error
+from controller.reportResponse import report_response
+from dao.resultBuffer import ResultTooLargeError
+from dao.savedReportDAO import SavedReportDAO
+
+router = APIRouter()
+saved_report_dao = SavedReportDAO(consulta_dao)
+
+class SavedReportRequest(BaseModel):
+    """Modelo para definição de relatório salvo"""
+    report: ReportRequest = Field(..., description="Relatório; valores de filtro ':nome' são parâmetros")
+    parameters: List[str] = Field(default=[], description="Nomes dos parâmetros aceitos na execução")
+    description: Optional[str] = Field(None, description="Descrição do relatório")
+
+class RunSavedReportRequest(BaseModel):
+    """Modelo para execução de relatório salvo"""
+    parameters: Dict[str, Any] = Field(default={}, description="Valores dos parâmetros")
+
+@router.get("/saved-reports", summary="Listar relatórios salvos")
+def list_saved_reports():
+    """Retorna as definições de todos os relatórios salvos"""
+    try:
+        return {"reports": saved_report_dao.listSavedReports()}
+    except Exception as e:
+        raise handle_error("listar relatórios salvos", e)
+
+@router.get("/saved-reports/{name}", summary="Obter relatório salvo")
+def get_saved_report(name: str):
+    """Retorna a definição de um relatório salvo"""
+    try:
+        return saved_report_dao.getSavedReport(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error(f"buscar relatório salvo {name}", e)
+
+@router.put("/saved-reports/{name}", summary="Criar ou atualizar relatório salvo")
+def save_report(name: str, request: SavedReportRequest):
+    """Salva a definição de um relatório com placeholders de parâmetros nos filtros"""
+    try:
+        report = build_report_kwargs(request.report)
+        return saved_report_dao.saveReport(name, report, request.parameters, request.description)
+    except Exception as e:
+        raise handle_error(f"salvar relatório {name}", e)
+
+@router.delete("/saved-reports/{name}", summary="Remover relatório salvo")
+def delete_saved_report(name: str):
+    """Remove a definição de um relatório salvo"""
+    try:
+        saved_report_dao.deleteSavedReport(name)
+        return {"name": name, "status": "deleted"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise handle_error(f"remover relatório salvo {name}", e)
+
+@router.post("/saved-reports/{name}/run", summary="Executar relatório salvo")
+def run_saved_report(name: str, request: RunSavedReportRequest):
+    """Executa um relatório salvo informando apenas os valores dos parâmetros"""
+    try:
+        result, sql_query = saved_report_dao.runSavedReport(name, request.parameters)
+        return report_response(result, sql_query)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ResultTooLargeError as e:
+        print(f"Relatório salvo {name} rejeitado: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise handle_error(f"executar relatório salvo {name}", e)
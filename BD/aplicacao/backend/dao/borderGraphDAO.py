@@ -0,0 +1,213 @@
+"""
+Grafo de fronteiras terrestres entre países (tabela borders) em memória
+"""
+import threading
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+
+from .database import SessionLocal, run_read
+from .dataVersionDAO import data_version_dao
+from models.models import Borders, Countries
+
+# Tabelas cujas alterações exigem reconstruir o grafo
+GRAPH_SOURCE_TABLES = ["borders", "countries"]
+# Maior número de saltos aceito na vizinhança (o maior caminho entre países vizinhos é bem menor)
+MAX_NEIGHBORHOOD_HOPS = 50
+
+class BorderGraph:
+    """
+    Grafo não direcionado em formato CSR (compressed sparse row): os vizinhos do nó i
+    são neighbors[offsets[i]:offsets[i + 1]]. Dois arrays de inteiros contíguos, sem
+    objetos por aresta, percorridos por BFS.
+    """
+    def __init__(self, codes: List[str], names: Dict[str, str], edges: List[tuple]):
+        self.codes = codes
+        self.names = names
+        self.index = {code: i for i, code in enumerate(codes)}
+
+        adjacency = [set() for _ in codes]
+        for source, target in edges:
+            i, j = self.index.get(source), self.index.get(target)
+            if i is None or j is None or i == j:
+                continue
+            # borders guarda as duas direções, mas uma fronteira cadastrada em só uma delas também vale
+            adjacency[i].add(j)
+            adjacency[j].add(i)
+
+        self.offsets = array('i', [0])
+        self.neighbors = array('i')
+        for node_neighbors in adjacency:
+            self.neighbors.extend(sorted(node_neighbors))
+            self.offsets.append(len(self.neighbors))
+        self.component_of = self._label_components()
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.neighbors) // 2
+
+    def node(self, code: str) -> int:
+        """
+        Índice do país no grafo
+
+        Raises:
+            KeyError: se o país não existe
+        """
+        index = self.index.get(code.strip().upper())
+        if index is None:
+            raise KeyError(f"País '{code}' não encontrado")
+        return index
+
+    def bfs(self, start: int, max_hops: int = None, target: int = None):
+        """
+        Busca em largura a partir de start
+
+        Returns:
+            (distâncias por nó, -1 se não alcançado; predecessores por nó)
+        """
+        distances = array('i', [-1]) * len(self.codes)
+        parents = array('i', [-1]) * len(self.codes)
+        distances[start] = 0
+        queue = deque([start])
+        offsets, neighbors = self.offsets, self.neighbors
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                break
+            hops = distances[node]
+            if max_hops is not None and hops >= max_hops:
+                continue
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbor = neighbors[position]
+                if distances[neighbor] < 0:
+                    distances[neighbor] = hops + 1
+                    parents[neighbor] = node
+                    queue.append(neighbor)
+        return distances, parents
+
+    def _label_components(self) -> array:
+        component_of = array('i', [-1]) * len(self.codes)
+        component = 0
+        for start in range(len(self.codes)):
+            if component_of[start] >= 0:
+                continue
+            component_of[start] = component
+            stack = [start]
+            while stack:
+                node = stack.pop()
+                for position in range(self.offsets[node], self.offsets[node + 1]):
+                    neighbor = self.neighbors[position]
+                    if component_of[neighbor] < 0:
+                        component_of[neighbor] = component
+                        stack.append(neighbor)
+            component += 1
+        return component_of
+
+    def describe(self, node: int) -> Dict[str, Any]:
+        code = self.codes[node]
+        return {"country_code": code, "name": self.names.get(code)}
+
+class BorderGraphDAO:
+    """
+    Consultas de vizinhança sobre o grafo de fronteiras, mantido em memória.
+
+    O grafo é carregado na primeira consulta (ou no warmup) e reconstruído quando
+    a versão dos dados de borders/countries muda.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version_token = None
+        self._graph: Optional[BorderGraph] = None
+
+    def getGraph(self) -> BorderGraph:
+        token = data_version_dao.getVersionToken(GRAPH_SOURCE_TABLES)
+        graph = self._graph
+        if graph is not None and token == self._version_token:
+            return graph
+        with self._lock:
+            if self._graph is None or token != self._version_token:
+                self._graph = self._load_graph()
+                self._version_token = token
+                print(f"Grafo de fronteiras carregado: {len(self._graph.codes)} países, "
+                      f"{self._graph.edge_count} fronteiras (versão {token})")
+            return self._graph
+
+    def _load_graph(self) -> BorderGraph:
+        countries, edges = run_read(self._read_graph)
+        codes = [code.strip() for code, _ in countries]
+        names = {code.strip(): name for code, name in countries}
+        return BorderGraph(codes, names, [(source.strip(), target.strip()) for source, target in edges])
+
+    def _read_graph(self, read_engine):
+        with SessionLocal(bind=read_engine) as session:
+            countries = session.execute(
+                select(Countries.country_code, Countries.name).order_by(Countries.country_code)
+            ).all()
+            edges = session.execute(select(Borders.country_code, Borders.border_country_code)).all()
+        return countries, edges
+
+    def getNeighborhood(self, country_code: str, hops: int = 1) -> Dict[str, Any]:
+        """
+        Países a até hops fronteiras terrestres do país, com a distância em saltos
+
+        Raises:
+            KeyError: se o país não existe
+            ValueError: se hops está fora do intervalo aceito
+        """
+        if hops < 1 or hops > MAX_NEIGHBORHOOD_HOPS:
+            raise ValueError(f"hops deve estar entre 1 e {MAX_NEIGHBORHOOD_HOPS}")
+        graph = self.getGraph()
+        start = graph.node(country_code)
+        distances, _ = graph.bfs(start, max_hops=hops)
+        neighbors = [
+            {**graph.describe(node), "hops": distance}
+            for node, distance in enumerate(distances)
+            if distance > 0
+        ]
+        neighbors.sort(key=lambda item: (item["hops"], item["country_code"]))
+        return {"country": graph.describe(start), "hops": hops, "neighbors": neighbors}
+
+    def getShortestPath(self, source: str, target: str) -> Dict[str, Any]:
+        """
+        Menor sequência de fronteiras terrestres entre dois países (path vazio se não há caminho)
+
+        Raises:
+            KeyError: se algum dos países não existe
+        """
+        graph = self.getGraph()
+        start, end = graph.node(source), graph.node(target)
+        if graph.component_of[start] != graph.component_of[end]:
+            return {"source": graph.describe(start), "target": graph.describe(end), "hops": None, "path": []}
+
+        _, parents = graph.bfs(start, target=end)
+        path = [end]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return {
+            "source": graph.describe(start),
+            "target": graph.describe(end),
+            "hops": len(path) - 1,
+            "path": [graph.describe(node) for node in path],
+        }
+
+    def getComponents(self, min_size: int = 1) -> Dict[str, Any]:
+        """
+        Componentes conexos (massas de terra ligadas por fronteiras), do maior para o menor
+        """
+        graph = self.getGraph()
+        members: Dict[int, List[int]] = {}
+        for node, component in enumerate(graph.component_of):
+            members.setdefault(component, []).append(node)
+        components = [
+            {"size": len(nodes), "countries": [graph.describe(node) for node in nodes]}
+            for nodes in members.values()
+            if len(nodes) >= min_size
+        ]
+        components.sort(key=lambda item: (-item["size"], item["countries"][0]["country_code"]))
+        return {"count": len(components), "components": components}
+
+# Instância compartilhada pelos controllers
+border_graph_dao = BorderGraphDAO()
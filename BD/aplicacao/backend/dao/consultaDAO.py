@@ -1,11 +1,206 @@
-from typing import List, Dict, Any, Tuple
-from sqlalchemy import inspect, select, func, and_, or_, desc, asc, extract
-from .database import get_engine, SessionLocal
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import inspect, select, func, and_, or_, desc, asc, extract, cast, text, literal, tablesample, bindparam, any_, all_, false, String, Text, UniqueConstraint
+from sqlalchemy.sql.elements import BindParameter, Label
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.orm import aliased, configure_mappers
+from sqlalchemy.exc import NoSuchTableError, OperationalError
+from .database import get_engine, get_read_engine, is_replica_engine, mark_replica_unhealthy, run_read, SessionLocal
+from .geoDAO import geo_dao
+from .memoryEngine import MemoryEngineUnsupported, memory_engine
+from .olapDAO import olap_dao
+from .resultBuffer import ResultBuffer
 import models.models as models_module
 
+# Colunas de baixa cardinalidade sempre mantidas em cache para autocomplete
+LOW_CARDINALITY_COLUMNS = {
+    ('country_geography', 'region'),
+    ('currencies', 'currency'),
+    ('languages', 'language'),
+}
+# Colunas com até esse número de valores distintos (estimativa do pg_stats) também vão para o cache
+LOW_CARDINALITY_THRESHOLD = 500
+# Tempo de vida (segundos) dos valores distintos em cache
+DISTINCT_VALUES_CACHE_TTL = 600
+# Limite máximo de sugestões por requisição de autocomplete
+MAX_DISTINCT_VALUES_LIMIT = 100
+# Métodos de amostragem aceitos no modo prévia (TABLESAMPLE)
+SAMPLE_METHODS = {"SYSTEM", "BERNOULLI"}
+# Agregações cujo valor na amostra é extrapolado multiplicando pelo fator de escala;
+# AVG não precisa de ajuste e MIN/MAX na amostra são apenas limites do valor real
+SCALED_AGGREGATES = {"COUNT", "SUM"}
+# Valor de filtro que representa um parâmetro de relatório salvo (ex.: ":pais")
+PARAMETER_PLACEHOLDER_PATTERN = re.compile(r"^:([A-Za-z_][A-Za-z0-9_]*)$")
+# Prefixo dos bind parameters gerados para parâmetros de relatórios salvos
+PARAMETER_BIND_PREFIX = "saved_"
+# Tempo de vida (segundos) do cache de metadados do schema (tabelas, colunas e FKs)
+SCHEMA_CACHE_TTL = float(os.getenv('SCHEMA_CACHE_TTL', '300'))
+# Alias de tabela em joins (identificador SQL simples)
+TABLE_ALIAS_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Coluna interna com o ranking do top-N por grupo (não aparece no resultado)
+TOP_N_RANK_COLUMN = "_group_rank"
+# Linhas buscadas por vez do cursor do relatório (cada bloco entra no orçamento de memória)
+REPORT_FETCH_SIZE = int(os.getenv('REPORT_FETCH_SIZE', '2000'))
+# Interpretação do tipo de join: "legacy" mantém o comportamento original (só "LEFT"/"RIGHT"
+# são externos; "LEFT JOIN" da interface roda como INNER) e "sql" usa o significado do SQL
+JOIN_TYPE_SEMANTICS = os.getenv('REPORT_JOIN_TYPE_SEMANTICS', 'legacy').lower()
+# Tabelas de apoio de migrações, fora das listagens (ex.: particionar_cidades.py --no-drop)
+HIDDEN_TABLES = {'cities_unpartitioned'}
+# SQL exibido dos relatórios executados em memória, por definição do relatório (LRU)
+REPORT_SQL_CACHE_SIZE = 256
+# Motores de execução de relatórios: auto escolhe entre memória, DuckDB (OLAP) e Postgres
+REPORT_ENGINES = {"auto", "postgres", "olap"}
+
+class SchemaMismatchError(RuntimeError):
+    """Banco sem tabelas ou colunas que os modelos ORM usam (migração pendente)"""
+
+def _metadata_read(method):
+    """
+    Leituras pelo Inspector compartilhado: se a réplica do Inspector falha na conexão, ela
+    sai do balanceamento, o Inspector passa a ser do primário e a leitura é repetida
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except OperationalError as e:
+            insp = self._inspector
+            if insp is None or not is_replica_engine(insp.bind):
+                raise
+            mark_replica_unhealthy(insp.bind, e)
+            self._inspector = inspect(self.engine)
+            self._inspector_created_at = time.monotonic()
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class ConsultaDAO:
     def __init__(self):
         self.engine = get_engine()
+        # Cache de valores distintos: (tabela, coluna) -> (timestamp, lista de (valor, frequência) ou None)
+        self._distinct_values_cache = {}
+        # Inspector reaproveitado: ele memoriza tabelas, colunas e FKs já consultadas
+        self._inspector = None
+        self._inspector_created_at = 0.0
+        # Fingerprint do schema calculado a partir do Inspector atual: (inspector, hash)
+        self._schema_fingerprint = None
+        # Partições de tabelas particionadas lidas com o Inspector atual: (inspector, nomes)
+        self._partition_names = None
+        # SQL exibido dos relatórios atendidos em memória: chave da definição -> SQL
+        self._report_sql_cache = OrderedDict()
+        self._report_sql_lock = threading.Lock()
+
+    def _get_inspector(self):
+        """
+        Retorna o Inspector compartilhado, recriando-o quando o cache de metadados expira
+        
+        Returns:
+            Inspector do SQLAlchemy com cache de reflexão
+        """
+        now = time.monotonic()
+        if self._inspector is None or now - self._inspector_created_at > SCHEMA_CACHE_TTL:
+            self._inspector = inspect(get_read_engine())
+            self._inspector_created_at = now
+        return self._inspector
+
+    def clearSchemaCache(self) -> None:
+        """
+        Descarta os metadados em cache (ex.: após alterações no schema)
+        """
+        self._inspector = None
+
+    @_metadata_read
+    def getSchemaFingerprint(self) -> str:
+        """
+        Hash das tabelas, colunas (tipo e nulidade) e FKs do schema public.
+        Recalculado quando o cache de metadados expira.
+        
+        Returns:
+            Hash hexadecimal do schema
+        """
+        insp = self._get_inspector()
+        cached = self._schema_fingerprint
+        if cached is not None and cached[0] is insp:
+            return cached[1]
+        
+        parts = []
+        for table_name in sorted(self._get_relation_names(insp)):
+            for col in insp.get_columns(table_name, schema='public'):
+                parts.append(f"{table_name}.{col['name']}:{col['type']}:{col['nullable']}")
+            for fk in insp.get_foreign_keys(table_name, schema='public'):
+                parts.append(
+                    f"{table_name}({','.join(fk['constrained_columns'])})->"
+                    f"{fk['referred_table']}({','.join(fk['referred_columns'])})"
+                )
+        
+        fingerprint = hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+        self._schema_fingerprint = (insp, fingerprint)
+        return fingerprint
+
+    @_metadata_read
+    def warmup(self) -> Dict[str, Any]:
+        """
+        Pré-carrega o estado usado pelas requisições: mapeamentos ORM, metadados
+        de todas as tabelas e o cache de compilação de consultas do SQLAlchemy.
+        
+        Executado no processo master antes do fork dos workers, para que todos
+        herdem o estado já pronto.
+        
+        Returns:
+            Resumo do que foi carregado
+        """
+        configure_mappers()
+        model_classes = self._get_model_classes()
+        
+        missing = self.checkSchemaCompatibility()
+        if missing:
+            raise SchemaMismatchError(
+                f"O banco não tem {', '.join(missing)}, usados pelos modelos da API. Aplique as "
+                f"migrações das notas de atualização do README (ex.: cities.country_code vem de "
+                f"python BD/particionar_cidades.py)"
+            )
+        
+        tables = self.getAllTables()
+        insp = self._get_inspector()
+        for table_name in tables:
+            insp.get_columns(table_name, schema='public')
+            insp.get_foreign_keys(table_name, schema='public')
+        
+        # Executar um SELECT vazio por modelo valida o mapeamento contra o banco
+        # e aquece o cache de compilação da engine de leitura
+        def validate_models(read_engine):
+            with read_engine.connect() as conn:
+                for model in model_classes.values():
+                    conn.execute(select(model.__table__).limit(0))
+        run_read(validate_models)
+        
+        return {"models": len(model_classes), "tables": len(tables), "schema": self.getSchemaFingerprint()}
+
+    @_metadata_read
+    def checkSchemaCompatibility(self) -> List[str]:
+        """
+        Tabelas e colunas dos modelos ORM que não existem no banco
+
+        Returns:
+            Lista de "tabela" ou "tabela.coluna" ausentes (vazia se o banco está atualizado)
+        """
+        insp = self._get_inspector()
+        missing = []
+        for model in self._get_model_classes().values():
+            table = model.__table__
+            try:
+                db_columns = {column["name"] for column in insp.get_columns(table.name, schema='public')}
+            except NoSuchTableError:
+                missing.append(table.name)
+                continue
+            missing += [f"{table.name}.{column.name}" for column in table.columns if column.name not in db_columns]
+        return missing
 
     def _apply_function_to_column(self, column_obj, function_name: str):
         """
@@ -52,6 +247,7 @@ class ConsultaDAO:
             print(f"Função '{function_name}' não reconhecida, ignorando...")
             return column_obj
 
+    @_metadata_read
     def getAllTables(self) -> List[str]:
         """
         Retorna todas as tabelas disponíveis no banco de dados
@@ -60,8 +256,8 @@ class ConsultaDAO:
             Lista com nomes das tabelas
         """
         try:
-            insp = inspect(self.engine)
-            tables = insp.get_table_names(schema='public')
+            insp = self._get_inspector()
+            tables = self._get_relation_names(insp)
             if not tables:
                 print("Nenhuma tabela encontrada no schema 'public'")
             return tables
@@ -69,9 +265,32 @@ class ConsultaDAO:
             print(f"Erro ao buscar tabelas: {e}")
             raise e
     
+    def _get_relation_names(self, insp) -> List[str]:
+        """
+        Tabelas e views materializadas (ex.: country_profile) do schema public
+        """
+        return self._get_table_names(insp) + insp.get_materialized_view_names(schema='public')
+
+    def _get_table_names(self, insp) -> List[str]:
+        """
+        Tabelas do schema public consultáveis nos relatórios: sem as partições (lidas pela
+        tabela particionada, ex.: cities_p0) e sem as tabelas de apoio de migrações
+        """
+        cached = self._partition_names
+        if cached is None or cached[0] is not insp:
+            with insp.bind.connect() as conn:
+                partitions = set(conn.execute(text(
+                    """SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                       WHERE n.nspname = 'public' AND c.relispartition"""
+                )).scalars())
+            cached = self._partition_names = (insp, partitions)
+        hidden = cached[1] | HIDDEN_TABLES
+        return [table for table in insp.get_table_names(schema='public') if table not in hidden]
+    
+    @_metadata_read
     def getTableRelations(self, table_name: str) -> List[str]:
         try:
-            insp = inspect(self.engine)
+            insp = self._get_inspector()
             related_tables = set()
 
             # Relações onde table_name tem FKs para outras
@@ -80,7 +299,7 @@ class ConsultaDAO:
                 related_tables.add(fk['referred_table'])
 
             # Relações onde outras tabelas apontam para table_name
-            for other_table in insp.get_table_names(schema='public'):
+            for other_table in self._get_table_names(insp):
                 if other_table == table_name:
                     continue
                 other_fks = insp.get_foreign_keys(other_table, schema='public')
@@ -107,9 +326,6 @@ class ConsultaDAO:
         try:
             if used_tables is None:
                 used_tables = []
-                
-            insp = inspect(self.engine)
-            all_tables = set(insp.get_table_names(schema='public'))
             
             # Tabelas a serem excluídas (já utilizadas + tabela fonte)
             excluded_tables = set(used_tables + [source_table])
@@ -154,9 +370,10 @@ class ConsultaDAO:
             print(f"Erro ao buscar relações transitivas para {source_table}: {e}")
             raise e
             
+    @_metadata_read
     def getTableColumns(self, table_name: str) -> List[Dict[str, Any]]:
         try:
-            insp = inspect(self.engine)
+            insp = self._get_inspector()
             column_data = []
 
             columns = insp.get_columns(table_name, schema='public')
@@ -187,31 +404,150 @@ class ConsultaDAO:
                 })
             tables_processed.add(base_table)
             
-            # Adicionar colunas das tabelas joinadas
+            # Adicionar colunas das tabelas joinadas (joins com alias são qualificados pelo alias)
             for join in joins:
                 target_table = join.get('targetTable')
-                if target_table and target_table not in tables_processed:
+                qualifier = join.get('alias') or target_table
+                if target_table and qualifier not in tables_processed:
                     target_columns = self.getTableColumns(target_table)
                     for col in target_columns:
                         all_columns.append({
                             "name": col['name'],
                             "type": col['type'],
-                            "table": target_table,
-                            "qualified_name": f"{target_table}.{col['name']}"
+                            "table": qualifier,
+                            "qualified_name": f"{qualifier}.{col['name']}"
                         })
-                    tables_processed.add(target_table)
+                    tables_processed.add(qualifier)
             
             return all_columns
         except Exception as e:
             print(f"Erro ao buscar atributos das tabelas joinadas: {e}")
             raise e
 
+    def getColumnDistinctValues(self, table_name: str, column_name: str, prefix: str = "",
+                                mode: str = "prefix", limit: int = 20) -> Dict[str, Any]:
+        """
+        Retorna os valores distintos de uma coluna que casam com o texto digitado,
+        para autocomplete de filtros.
+
+        Colunas de baixa cardinalidade são carregadas uma vez (com frequências) e
+        filtradas em memória; as demais consultam o banco usando lower(coluna) LIKE,
+        atendido pelos índices de prefixo (varchar_pattern_ops) e de trigramas.
+
+        Args:
+            table_name: Nome da tabela
+            column_name: Nome da coluna
+            prefix: Texto digitado pelo usuário
+            mode: 'prefix' (começa com) ou 'contains' (contém)
+            limit: Número máximo de valores retornados
+
+        Returns:
+            Dicionário com os valores encontrados e se vieram do cache
+        """
+        mode = (mode or "prefix").lower()
+        if mode not in ("prefix", "contains"):
+            raise ValueError(f"Modo de busca '{mode}' não suportado (use 'prefix' ou 'contains')")
+
+        if limit <= 0 or limit > MAX_DISTINCT_VALUES_LIMIT:
+            raise ValueError(f"Limite deve estar entre 1 e {MAX_DISTINCT_VALUES_LIMIT}")
+
+        try:
+            model_classes = self._get_model_classes()
+            if table_name not in model_classes:
+                raise ValueError(f"Tabela '{table_name}' não encontrada nos modelos ORM")
+
+            model = model_classes[table_name]
+            if column_name not in model.__table__.columns:
+                raise ValueError(f"Coluna '{column_name}' não encontrada na tabela '{table_name}'")
+
+            column_obj = model.__table__.columns[column_name]
+            search = (prefix or "").lower()
+
+            cached_values = self._get_cached_distinct_values(table_name, column_obj)
+            if cached_values is not None:
+                # Valores já ordenados por frequência; basta filtrar
+                matches = []
+                for value, _count in cached_values:
+                    text_value = str(value).lower()
+                    if text_value.startswith(search) if mode == "prefix" else search in text_value:
+                        matches.append(value)
+                        if len(matches) >= limit:
+                            break
+                return {"values": matches, "cached": True}
+
+            # Coluna de alta cardinalidade: busca no banco
+            if isinstance(column_obj.type, String):
+                searchable = func.lower(column_obj)
+            else:
+                searchable = func.lower(cast(column_obj, Text))
+
+            escaped = self._escape_like(search)
+            pattern = f"{escaped}%" if mode == "prefix" else f"%{escaped}%"
+
+            query = (
+                select(column_obj)
+                .where(searchable.like(pattern, escape="\\"))
+                .group_by(column_obj)
+                .order_by(column_obj)
+                .limit(limit)
+            )
+
+            def search_values(read_engine):
+                with read_engine.connect() as conn:
+                    return list(conn.execute(query).scalars().all())
+
+            return {"values": run_read(search_values), "cached": False}
+        except Exception as e:
+            print(f"Erro ao buscar valores distintos de {table_name}.{column_name}: {e}")
+            raise e
+
+    def _get_cached_distinct_values(self, table_name: str, column_obj) -> Any:
+        """
+        Retorna os valores distintos (com frequência) de uma coluna de baixa cardinalidade,
+        carregando-os no cache se necessário.
+
+        Returns:
+            Lista de tuplas (valor, frequência) ordenada por frequência, ou None
+            se a coluna não for de baixa cardinalidade
+        """
+        cache_key = (table_name, column_obj.name)
+        cached = self._distinct_values_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < DISTINCT_VALUES_CACHE_TTL:
+            return cached[1]
+
+        def load_values(read_engine):
+            with read_engine.connect() as conn:
+                is_low_cardinality = cache_key in LOW_CARDINALITY_COLUMNS
+                if not is_low_cardinality:
+                    # n_distinct positivo é o número estimado de valores; negativo é uma fração das linhas
+                    n_distinct = conn.execute(
+                        text("SELECT n_distinct FROM pg_stats "
+                             "WHERE schemaname = 'public' AND tablename = :table AND attname = :column"),
+                        {"table": table_name, "column": column_obj.name}
+                    ).scalar()
+                    is_low_cardinality = n_distinct is not None and 0 < n_distinct <= LOW_CARDINALITY_THRESHOLD
+
+                if not is_low_cardinality:
+                    return None
+                rows = conn.execute(
+                    select(column_obj, func.count().label("frequency"))
+                    .where(column_obj.isnot(None))
+                    .group_by(column_obj)
+                    .order_by(desc("frequency"), column_obj)
+                ).all()
+                return [(row[0], row[1]) for row in rows]
+
+        values = run_read(load_values)
+        self._distinct_values_cache[cache_key] = (time.monotonic(), values)
+        return values
+
+    @_metadata_read
     def getForeignKeyRelations(self, source_table: str, target_table: str) -> List[Dict[str, Any]]:
         """
         Busca as relações de chave estrangeira entre duas tabelas
         """
         try:
-            insp = inspect(self.engine)
+            insp = self._get_inspector()
             relations = []
             
             # Verificar FKs da tabela de origem para a tabela de destino
@@ -239,13 +575,18 @@ class ConsultaDAO:
             print(f"Erro ao buscar relações FK entre {source_table} e {target_table}: {e}")
             raise e    
             
-    def generateAdhocReport(self, base_table: str, attributes: List[str], joins: List,
-                          group_by_attributes: List[str], aggregate_functions: List,
-                          order_by_columns: List, filters: List[Dict[str, Any]] = [],
-                          limit: int = 5000) -> Tuple[List[Dict[str, Any]], str]:
+    def generateAdhocReportResult(self, base_table: str, attributes: List[str], joins: List,
+                                  group_by_attributes: List[str], aggregate_functions: List,
+                                  order_by_columns: List, filters: List[Dict[str, Any]] = [],
+                                  limit: int = 5000, preview: Dict[str, Any] = None,
+                                  having: List[Dict[str, Any]] = None, top_n: Dict[str, Any] = None,
+                                  optimize_joins: bool = True, filter_tree: Dict[str, Any] = None,
+                                  engine: str = "auto") -> Tuple[ResultBuffer, str]:
         """
-        Gera um relatório adhoc baseado nos parâmetros fornecidos usando ORM SQLAlchemy.
-        
+        Gera um relatório adhoc baseado nos parâmetros fornecidos usando ORM SQLAlchemy,
+        materializando as linhas em um ResultBuffer: o que passa do orçamento de memória
+        vai para um arquivo temporário. Quem chama deve fechar o buffer.
+
         Args:
             base_table: Tabela base da consulta
             attributes: Lista de atributos a serem selecionados
@@ -255,8 +596,176 @@ class ConsultaDAO:
             order_by_columns: Lista de colunas para ordenação
             filters: Lista de filtros a serem aplicados
             limit: Limite de registros a retornar
-              Returns:
-            Tuple com os dados do relatório e a consulta SQL gerada
+            preview: Opções de prévia amostrada (method, percent, seed); None para consulta completa
+            having: Filtros sobre agregações (HAVING): alias de uma agregação ou função + atributo
+            top_n: Top-N por grupo (partitionBy, orderBy, n) via ROW_NUMBER() OVER (PARTITION BY ...)
+            optimize_joins: Remove joins sem efeito no resultado e reordena os demais (ver optimizeJoins)
+            filter_tree: Grupo de filtros aninhados ({"logic": "AND"|"OR", "conditions": [...]}),
+                combinado com AND aos filtros planos (ver normalizeFilters)
+            engine: Motor de execução: auto (memória, OLAP pela heurística de custo ou Postgres),
+                postgres ou olap (DuckDB sobre os snapshots Parquet)
+
+        Returns:
+            Tuple com o buffer de resultados e a consulta SQL gerada
+
+        Raises:
+            ResultTooLargeError: se o resultado passar do tamanho máximo configurado
+        """
+        if limit is None or limit <= 0:
+            raise ValueError("Limite deve ser maior que zero")
+        if engine not in REPORT_ENGINES:
+            raise ValueError(f"Motor de execução '{engine}' não suportado (use {', '.join(sorted(REPORT_ENGINES))})")
+        if engine == "olap" and preview:
+            raise ValueError("A prévia amostrada (TABLESAMPLE) só é executada no Postgres")
+        
+        report_args = (
+            base_table, attributes, joins, group_by_attributes, aggregate_functions,
+            order_by_columns, filters, limit, preview
+        )
+        report_kwargs = {"having": having, "top_n": top_n, "optimize_joins": optimize_joins, "filter_tree": filter_tree}
+        try:
+            # Relatórios só sobre as tabelas de dimensão rodam em memória, sem ida ao banco e
+            # sem montar a consulta: o SQL exibido é montado uma vez por definição do relatório
+            if engine == "auto" and not preview and not top_n and memory_engine.canExecute(base_table, joins):
+                result = self._execute_in_memory(
+                    base_table, attributes, joins, group_by_attributes, aggregate_functions,
+                    order_by_columns, filters, limit, having, filter_tree
+                )
+                if result is not None:
+                    try:
+                        return result, self._get_report_sql(report_args, report_kwargs)
+                    except Exception:
+                        result.close()
+                        raise
+            
+            query = self.buildAdhocQuery(*report_args, **report_kwargs)
+            
+            # Compilar a consulta para exibir o SQL gerado
+            sql_query = self.compileQuery(query)
+            
+            # Agregações sobre muitas linhas vão para o DuckDB (snapshots Parquet), fora do primário
+            tables = [base_table] + [
+                (join.model_dump() if hasattr(join, 'model_dump') else join).get("targetTable") for join in joins or []
+            ]
+            aggregated = bool(group_by_attributes or aggregate_functions)
+            if engine == "olap" or (engine == "auto" and not preview and olap_dao.shouldUse(tables, aggregated)):
+                try:
+                    return olap_dao.execute(query, tables), sql_query
+                except Exception as e:
+                    if engine == "olap":
+                        raise
+                    print(f"Falha no backend OLAP, relatório executado no Postgres: {e}")
+            
+            # Réplica indisponível: sai do balanceamento e o relatório é repetido no primário
+            result = run_read(lambda read_engine: self._execute_report_query(query, read_engine))
+            
+            return result, sql_query
+        except Exception as e:
+            print(f"Erro ao gerar relatório adhoc: {e}")
+            raise e
+
+    def _get_report_sql(self, report_args: tuple, report_kwargs: Dict[str, Any]) -> str:
+        """
+        SQL exibido de um relatório, montado e compilado só na primeira vez por definição
+        (e por versão do schema, que muda o resultado do otimizador de joins)
+        """
+        def plain(value):
+            return value.model_dump() if hasattr(value, 'model_dump') else value
+        definition = json.dumps(
+            [[plain(arg) if not isinstance(arg, list) else [plain(item) for item in arg] for arg in report_args],
+             {name: plain(value) for name, value in report_kwargs.items()},
+             self.getSchemaFingerprint()],
+            sort_keys=True, default=str
+        )
+        key = hashlib.sha1(definition.encode("utf-8")).hexdigest()
+        with self._report_sql_lock:
+            sql_query = self._report_sql_cache.get(key)
+            if sql_query is not None:
+                self._report_sql_cache.move_to_end(key)
+                return sql_query
+
+        sql_query = self.compileQuery(self.buildAdhocQuery(*report_args, **report_kwargs))
+        with self._report_sql_lock:
+            self._report_sql_cache[key] = sql_query
+            while len(self._report_sql_cache) > REPORT_SQL_CACHE_SIZE:
+                self._report_sql_cache.popitem(last=False)
+        return sql_query
+
+    def compileQuery(self, query) -> str:
+        """
+        SQL da consulta com os valores embutidos, para exibição
+        """
+        return str(query.compile(dialect=self.engine.dialect, compile_kwargs={"literal_binds": True}))
+
+    def _execute_report_query(self, query, bind) -> ResultBuffer:
+        """
+        Executa a consulta do relatório na engine informada (réplica ou primário)
+        """
+        with SessionLocal(bind=bind) as session:
+            # Cursor no servidor: as linhas chegam em blocos, sem materializar tudo no driver
+            result = session.execute(query.execution_options(stream_results=True, yield_per=REPORT_FETCH_SIZE))
+            buffer = ResultBuffer(list(result.keys()))
+            try:
+                for partition in result.partitions():
+                    # Row não é subclasse de tuple; a conversão é direta em C
+                    buffer.append_rows([tuple(row) for row in partition])
+            except Exception:
+                buffer.close()
+                raise
+            return buffer
+
+    def _execute_in_memory(self, base_table: str, attributes: List[str], joins: List,
+                           group_by_attributes: List[str], aggregate_functions: List,
+                           order_by_columns: List, filters: List, limit: int,
+                           having: List, filter_tree: Dict[str, Any]) -> Optional[ResultBuffer]:
+        """
+        Executa o relatório no motor em memória (ver memoryEngine)
+
+        Returns:
+            Buffer com o resultado, ou None se o relatório precisa ir para o banco
+        """
+        join_dicts = []
+        for join_info in joins or []:
+            join_dict = join_info.model_dump() if hasattr(join_info, 'model_dump') else dict(join_info)
+            join_dicts.append({**join_dict, "joinType": self._normalize_join_type(join_dict.get("joinType"))})
+        try:
+            columns, rows = memory_engine.execute(
+                base_table, attributes, join_dicts, group_by_attributes, aggregate_functions,
+                order_by_columns, self.normalizeFilters(filters, filter_tree), limit, having
+            )
+        except MemoryEngineUnsupported as e:
+            print(f"Relatório executado no banco (motor em memória não atende: {e})")
+            return None
+        buffer = ResultBuffer(columns, engine="memory")
+        try:
+            buffer.append_rows(rows)
+        except Exception:
+            buffer.close()
+            raise
+        return buffer
+
+    def buildAdhocQuery(self, base_table: str, attributes: List[str], joins: List,
+                        group_by_attributes: List[str], aggregate_functions: List,
+                        order_by_columns: List, filters: List[Dict[str, Any]] = [],
+                        limit: int = None, preview: Dict[str, Any] = None,
+                        parameter_names: List[str] = None, having: List[Dict[str, Any]] = None,
+                        top_n: Dict[str, Any] = None, optimize_joins: bool = True,
+                        filter_tree: Dict[str, Any] = None) -> Any:
+        """
+        Monta a consulta SELECT do relatório adhoc sem executá-la.
+        
+        Usado pela geração de relatórios e por quem precisa executar a consulta
+        de outra forma (ex.: exportação em streaming).
+        
+        Args:
+            (mesmos de generateAdhocReportResult)
+            limit: Limite de registros; None para não aplicar LIMIT
+            parameter_names: Nomes dos parâmetros aceitos nos filtros; valores ":nome"
+                viram bind parameters "saved_nome" em vez de literais
+            optimize_joins: Remove joins que não afetam o resultado e reordena os demais (ver optimizeJoins)
+            
+        Returns:
+            Objeto Select do SQLAlchemy
         """
         # Validações básicas
         if not base_table:
@@ -265,297 +774,719 @@ class ConsultaDAO:
         if not attributes:
             raise ValueError("Pelo menos um atributo deve ser selecionado")
         
-        if limit <= 0:
-            raise ValueError("Limite deve ser maior que zero")
+        preview_info = self.getPreviewInfo(preview, aggregate_functions) if preview else None
         
-        try:
-            with SessionLocal() as session:
-                # Mapear nome da tabela para a classe do modelo ORM correspondente
-                model_classes = self._get_model_classes()
-                
-                # Verificar se a tabela base existe no mapeamento
-                if base_table not in model_classes:
-                    raise ValueError(f"Tabela base '{base_table}' não encontrada nos modelos ORM")
-                
-                base_model = model_classes[base_table]
-                
-                # Dicionário para armazenar alias de tabelas joinadas para evitar duplicação
-                table_aliases = {base_table: base_model}
-                
-                # Iniciar a consulta select
-                query = select()
-                
-                # Armazenar colunas selecionadas e seus nomes para lidar com duplicações
-                select_columns = []
-                column_names_count = {}
-                
-                # Dicionário para mapear aliases de funções de agregação para as colunas
-                aggregate_aliases = {}
+        # Mapear nome da tabela para a classe do modelo ORM correspondente
+        model_classes = self._get_model_classes()
+        
+        # Verificar se a tabela base existe no mapeamento
+        if base_table not in model_classes:
+            raise ValueError(f"Tabela base '{base_table}' não encontrada nos modelos ORM")
+        
+        base_model = model_classes[base_table]
+        
+        # No modo prévia a tabela base é substituída por uma amostra (TABLESAMPLE)
+        # com o mesmo nome, para que as colunas continuem qualificadas como antes
+        if preview_info:
+            sampling = getattr(func, preview_info["method"].lower())(preview_info["percent"])
+            base_model = aliased(base_model, tablesample(
+                base_model, sampling, name=base_table,
+                seed=literal(int(preview_info["seed"])) if preview_info["seed"] is not None else None
+            ))
+        
+        if optimize_joins:
+            joins, _ = self.optimizeJoins(
+                base_table, attributes, joins, group_by_attributes, aggregate_functions,
+                order_by_columns, filters, having, top_n, filter_tree
+            )
+        
+        # Dicionário para armazenar alias de tabelas joinadas para evitar duplicação
+        table_aliases = {base_table: base_model}
+        
+        # Joins com alias (ex.: countries como "country" e como "neighbor") usam uma entidade
+        # aliased própria, registrada antes para que atributos "alias.coluna" possam ser resolvidos
+        for join_info in joins:
+            join_dict = join_info.model_dump() if hasattr(join_info, 'model_dump') else join_info
+            alias_name = join_dict.get("alias")
+            if not alias_name:
+                continue
+            target_table = join_dict.get("targetTable")
+            if target_table not in model_classes:
+                raise ValueError(f"Tabela alvo '{target_table}' não encontrada nos modelos ORM")
+            if not TABLE_ALIAS_PATTERN.match(alias_name):
+                raise ValueError(f"Alias de join inválido: '{alias_name}'")
+            if alias_name in table_aliases or (alias_name in model_classes and alias_name != target_table):
+                raise ValueError(f"Alias de join '{alias_name}' já está em uso na consulta")
+            table_aliases[alias_name] = aliased(model_classes[target_table], name=alias_name)
+        
+        # Iniciar a consulta select
+        query = select()
+        
+        # Armazenar colunas selecionadas e seus nomes para lidar com duplicações
+        select_columns = []
+        column_names_count = {}
+        
+        # Dicionário para mapear aliases de funções de agregação para as colunas
+        aggregate_aliases = {}
+        
+        # Função auxiliar para obter uma coluna de uma tabela específica
+        def get_column_from_table(table_name, column_name):
+            if table_name not in table_aliases:
+                if table_name not in model_classes:
+                    raise ValueError(f"Tabela '{table_name}' não encontrada nos modelos ORM")
+                # Criar um alias para a tabela se não existir
+                table_aliases[table_name] = model_classes[table_name]
+            
+            model = table_aliases[table_name]
+            # Obter a coluna do modelo
+            if not hasattr(model, column_name):
+                raise ValueError(f"Coluna '{column_name}' não encontrada na tabela '{table_name}'")
+            
+            return getattr(model, column_name)
+          # Adicionar colunas selecionadas
+        for attr in attributes:
+            if "." in attr:
+                table_name, col_name = attr.split(".")
+                column_obj = get_column_from_table(table_name, col_name)
                 
-                # Função auxiliar para obter uma coluna de uma tabela específica
-                def get_column_from_table(table_name, column_name):
-                    if table_name not in table_aliases:
-                        if table_name not in model_classes:
-                            raise ValueError(f"Tabela '{table_name}' não encontrada nos modelos ORM")
-                        # Criar um alias para a tabela se não existir
-                        table_aliases[table_name] = model_classes[table_name]
-                    
-                    model = table_aliases[table_name]
-                    # Obter a coluna do modelo
-                    if not hasattr(model, column_name):
-                        raise ValueError(f"Coluna '{column_name}' não encontrada na tabela '{table_name}'")
-                    
-                    return getattr(model, column_name)
-                  # Adicionar colunas selecionadas
-                for attr in attributes:
-                    if "." in attr:
-                        table_name, col_name = attr.split(".")
-                        column_obj = get_column_from_table(table_name, col_name)
+                # Verificar se o nome da coluna já foi usado e criar um alias se necessário
+                if col_name in column_names_count:
+                    column_names_count[col_name] += 1
+                    column_alias = f"{col_name}_{table_name}"
+                    select_columns.append(column_obj.label(column_alias))
+                else:
+                    column_names_count[col_name] = 1
+                    select_columns.append(column_obj)
+            else:
+                # Para colunas sem qualificador de tabela, tentar encontrar em todas as tabelas
+                found = False
+                for table_name, model in table_aliases.items():
+                    if hasattr(model, attr):
+                        column_obj = getattr(model, attr)
+                        found = True
                         
-                        # Verificar se o nome da coluna já foi usado e criar um alias se necessário
-                        if col_name in column_names_count:
-                            column_names_count[col_name] += 1
-                            column_alias = f"{col_name}_{table_name}"
+                        # Adicionar um alias se o mesmo nome de coluna existe em múltiplas tabelas
+                        if attr in column_names_count:
+                            column_names_count[attr] += 1
+                            column_alias = f"{attr}_{table_name}"
                             select_columns.append(column_obj.label(column_alias))
                         else:
-                            column_names_count[col_name] = 1
+                            column_names_count[attr] = 1
                             select_columns.append(column_obj)
-                    else:
-                        # Para colunas sem qualificador de tabela, tentar encontrar em todas as tabelas
-                        found = False
-                        for table_name, model in table_aliases.items():
-                            if hasattr(model, attr):
-                                column_obj = getattr(model, attr)
-                                found = True
-                                
-                                # Adicionar um alias se o mesmo nome de coluna existe em múltiplas tabelas
-                                if attr in column_names_count:
-                                    column_names_count[attr] += 1
-                                    column_alias = f"{attr}_{table_name}"
-                                    select_columns.append(column_obj.label(column_alias))
-                                else:
-                                    column_names_count[attr] = 1
-                                    select_columns.append(column_obj)
-                                break
-                        
-                        if not found:
-                            # Se não encontrou em nenhuma tabela, usar a tabela base
-                            column_obj = get_column_from_table(base_table, attr)
-                            
-                            if attr in column_names_count:
-                                column_names_count[attr] += 1
-                                column_alias = f"{attr}_{base_table}"
-                                select_columns.append(column_obj.label(column_alias))
-                            else:
-                                column_names_count[attr] = 1
-                                select_columns.append(column_obj)
+                        break
                 
-                # Adicionar funções de agregação
-                for agg in aggregate_functions:
-                    # Converter para dict se for um modelo Pydantic
-                    agg_dict = agg
-                    if hasattr(agg, 'model_dump'):
-                        agg_dict = agg.model_dump()
+                if not found:
+                    # Se não encontrou em nenhuma tabela, usar a tabela base
+                    column_obj = get_column_from_table(base_table, attr)
                     
-                    function_name = agg_dict.get("function")
-                    attr = agg_dict.get("attribute")
-                    alias_name = agg_dict.get("alias")
-                    
-                    if not function_name or not attr:
-                        continue
-                    
-                    # Obter a função de agregação do SQLAlchemy
-                    agg_func = getattr(func, function_name.lower(), None)
-                    if not agg_func:
-                        raise ValueError(f"Função de agregação '{function_name}' não suportada")
-                      # Obter a coluna para aplicar a função
-                    if "." in attr:
-                        table_name, col_name = attr.split(".")
-                        column_obj = get_column_from_table(table_name, col_name)
-                    else:
-                        # Se não tiver qualificação, buscar primeiro entre os aliases definidos
-                        # e depois na tabela base
-                        found = False
-                        for table_name, model in table_aliases.items():
-                            if hasattr(model, attr):
-                                column_obj = getattr(model, attr)
-                                found = True
-                                break
-                        
-                        if not found:
-                            column_obj = get_column_from_table(base_table, attr)
-                    
-                    # Adicionar a função de agregação com o alias
-                    agg_column = agg_func(column_obj).label(alias_name)
-                    select_columns.append(agg_column)
-                    
-                    # Salvar o alias para uso posterior no ORDER BY
-                    aggregate_aliases[alias_name] = agg_column
-                
-                # Adicionar colunas ao select
-                query = query.add_columns(*select_columns)
-                
-                # Definir a tabela base (FROM)
-                from_obj = base_model
-                  # Inicializar o objeto FROM
-                from_obj = base_model.__table__
-                
-                # Adicionar JOINs
-                for join_info in joins:
-                    # Converter para dict se for um modelo Pydantic
-                    join_dict = join_info
-                    if hasattr(join_info, 'model_dump'):
-                        join_dict = join_info.model_dump()
-                    
-                    target_table = join_dict.get("targetTable")
-                    source_attr = join_dict.get("sourceAttribute")
-                    target_attr = join_dict.get("targetAttribute")
-                    join_type = join_dict.get("joinType", "INNER").upper()
-                    
-                    # Verificar se a tabela alvo existe
-                    if target_table not in model_classes:
-                        raise ValueError(f"Tabela alvo '{target_table}' não encontrada nos modelos ORM")
-                    
-                    # Extrair tabela e coluna do atributo fonte
-                    if "." in source_attr:
-                        source_table, source_col = source_attr.split(".")
-                    else:
-                        source_table = base_table
-                        source_col = source_attr
-                    
-                    # Extrair tabela e coluna do atributo alvo
-                    if "." in target_attr:
-                        target_table_prefix, target_col = target_attr.split(".")
-                    else:
-                        target_col = target_attr
-                    
-                    # Obter os objetos de coluna para o join
-                    source_column = get_column_from_table(source_table, source_col)
-                    
-                    # Criar um alias para a tabela alvo se ainda não existir
-                    if target_table not in table_aliases:
-                        target_model = model_classes[target_table]
-                        table_aliases[target_table] = target_model
-                    
-                    target_model = table_aliases[target_table]
-                    target_column = getattr(target_model, target_col)
-                    
-                    # Criar a condição de join
-                    join_condition = source_column == target_column
-                    
-                    # Adicionar o join à consulta
-                    if join_type == "INNER":
-                        from_obj = from_obj.join(target_model.__table__, join_condition)
-                    elif join_type == "LEFT":
-                        from_obj = from_obj.join(target_model.__table__, join_condition, isouter=True)
-                    elif join_type == "RIGHT":
-                        # SQLAlchemy não tem right join diretamente, então invertemos a condição
-                        # Note: essa abordagem não é ideal para múltiplos joins, mas mantida para compatibilidade
-                        from_obj = target_model.__table__.join(from_obj, join_condition, isouter=True)
-                    else:  # Default to INNER
-                        from_obj = from_obj.join(target_model.__table__, join_condition)
-                
-                # Definir a cláusula FROM
-                query = query.select_from(from_obj)
-                
-                # Adicionar filtros (WHERE)
-                filter_conditions = []
-                for i, filter_info in enumerate(filters):
-                    operator = filter_info.get("operator", "=")
-                    attr = filter_info["attribute"]
-                    value = filter_info["value"]
-                    filter_function = filter_info.get("function", None)
-                    logic = filter_info.get("logic", "AND") 
-                    
-                    
-                    # Obter a coluna para o filtro
-                    if "." in attr:
-                        table_name, col_name = attr.split(".")
-                        column_obj = get_column_from_table(table_name, col_name)
+                    if attr in column_names_count:
+                        column_names_count[attr] += 1
+                        column_alias = f"{attr}_{base_table}"
+                        select_columns.append(column_obj.label(column_alias))
                     else:
-                        column_obj = get_column_from_table(base_table, attr)
-                    
-                    # Aplicar função se especificada
-                    if filter_function:
-                        column_obj = self._apply_function_to_column(column_obj, filter_function)
-                    
-                    # Aplicar o operador usando o método auxiliar
-                    filter_condition = self._apply_filter_operator(column_obj, operator, value)
-                    
-                    # Armazenar a condição com sua lógica
-                    filter_conditions.append({
-                        'condition': filter_condition,
-                        'logic': logic,
-                        'index': i
-                    })
-                
-                # Construir a expressão WHERE considerando a lógica AND/OR
-                if filter_conditions:
-                    # Construir expressão sequencialmente baseada na lógica de cada filtro
-                    where_expression = filter_conditions[0]['condition']
-                    
-                    for filter_data in filter_conditions[1:]:
-                        condition = filter_data['condition']
-                        logic = filter_data['logic']
-                        
-                        if logic == "OR":
-                            where_expression = or_(where_expression, condition)
-                        else:  # AND (padrão)
-                            where_expression = and_(where_expression, condition)
-                    
-                    query = query.where(where_expression)
-                  # Adicionar GROUP BY
-                if group_by_attributes:
-                    group_by_columns = []
-                    for attr in group_by_attributes:
-                        column_obj = self._get_column_with_qualifier(attr, base_table, table_aliases, get_column_from_table, aggregate_aliases)
-                        group_by_columns.append(column_obj)
-                    
-                    query = query.group_by(*group_by_columns)
-                
-                # Adicionar ORDER BY
-                if order_by_columns:
-                    order_by_clauses = []
-                    for order_info in order_by_columns:
-                        # Converter para dict se for um modelo Pydantic
-                        order_dict = order_info
-                        if hasattr(order_info, 'model_dump'):
-                            order_dict = order_info.model_dump()
-                        
-                        # Verificar se está usando 'attribute' ou 'column' (para compatibilidade)
-                        attr = order_dict.get("attribute", order_dict.get("column", ""))
-                        direction = order_dict.get("direction", "ASC").upper()
-                        
-                        if not attr:
-                            continue
-                          # Obter a coluna para ordenação
-                        column_obj = self._get_column_with_qualifier(attr, base_table, table_aliases, get_column_from_table, aggregate_aliases)
-                        
-                        # Adicionar a direção de ordenação
-                        if direction == "DESC":
-                            order_by_clauses.append(desc(column_obj))
-                        else:  # ASC
-                            order_by_clauses.append(asc(column_obj))
-                    
-                    query = query.order_by(*order_by_clauses)
-                
-                # Adicionar LIMIT
-                query = query.limit(limit)
-                
-                # Compilar a consulta para exibir o SQL gerado
-                compiled_query = query.compile(dialect=self.engine.dialect, compile_kwargs={"literal_binds": True})
-                sql_query = str(compiled_query)
+                        column_names_count[attr] = 1
+                        select_columns.append(column_obj)
+        
+        # Adicionar funções de agregação
+        for agg in aggregate_functions:
+            # Converter para dict se for um modelo Pydantic
+            agg_dict = agg
+            if hasattr(agg, 'model_dump'):
+                agg_dict = agg.model_dump()
+            
+            function_name = agg_dict.get("function")
+            attr = agg_dict.get("attribute")
+            alias_name = agg_dict.get("alias")
+            
+            if not function_name or not attr:
+                continue
+            
+              # Obter a coluna para aplicar a função
+            if "." in attr:
+                table_name, col_name = attr.split(".")
+                column_obj = get_column_from_table(table_name, col_name)
+            else:
+                # Se não tiver qualificação, buscar primeiro entre os aliases definidos
+                # e depois na tabela base
+                found = False
+                for table_name, model in table_aliases.items():
+                    if hasattr(model, attr):
+                        column_obj = getattr(model, attr)
+                        found = True
+                        break
                 
-                # Executar a consulta
-                result = session.execute(query).mappings().all()
+                if not found:
+                    column_obj = get_column_from_table(base_table, attr)
+            
+            # Adicionar a função de agregação com o alias
+            agg_column = self._build_aggregate_expression(function_name, column_obj, preview_info).label(alias_name)
+            select_columns.append(agg_column)
+            
+            # Salvar o alias para uso posterior no ORDER BY
+            aggregate_aliases[alias_name] = agg_column
+        
+        # Adicionar colunas ao select
+        query = query.add_columns(*select_columns)
+        
+        # Definir a tabela base (FROM)
+        from_obj = base_model
+          # Inicializar o objeto FROM (a tabela ou sua amostra no modo prévia)
+        from_obj = inspect(base_model).selectable
+        
+        # Adicionar JOINs
+        for join_info in joins:
+            # Converter para dict se for um modelo Pydantic
+            join_dict = join_info
+            if hasattr(join_info, 'model_dump'):
+                join_dict = join_info.model_dump()
+            
+            target_table = join_dict.get("targetTable")
+            source_attr = join_dict.get("sourceAttribute")
+            target_attr = join_dict.get("targetAttribute")
+            join_type = self._normalize_join_type(join_dict.get("joinType"))
+            
+            # Verificar se a tabela alvo existe
+            if target_table not in model_classes:
+                raise ValueError(f"Tabela alvo '{target_table}' não encontrada nos modelos ORM")
+            
+            # Extrair tabela e coluna do atributo fonte
+            if "." in source_attr:
+                source_table, source_col = source_attr.split(".")
+            else:
+                source_table = base_table
+                source_col = source_attr
+            
+            # Extrair tabela e coluna do atributo alvo
+            if "." in target_attr:
+                target_table_prefix, target_col = target_attr.split(".")
+            else:
+                target_col = target_attr
+            
+            # Obter os objetos de coluna para o join
+            source_column = get_column_from_table(source_table, source_col)
+            
+            alias_name = join_dict.get("alias")
+            if alias_name:
+                target_model = table_aliases[alias_name]
+            else:
+                # Criar um alias para a tabela alvo se ainda não existir
+                if target_table not in table_aliases:
+                    table_aliases[target_table] = model_classes[target_table]
+                elif target_table == base_table:
+                    raise ValueError(f"Join de '{target_table}' com ela mesma exige um alias")
+                target_model = table_aliases[target_table]
+            
+            if not hasattr(target_model, target_col):
+                raise ValueError(f"Coluna '{target_col}' não encontrada na tabela '{alias_name or target_table}'")
+            target_column = getattr(target_model, target_col)
+            # Tabela ou alias (ex.: countries AS neighbor) usado no FROM
+            target_selectable = inspect(target_model).selectable
+            
+            # Criar a condição de join; FKs compostas (ex.: cities (state_id, country_code) -> states)
+            # recebem as demais colunas, o que permite ao planner podar partições de cities
+            source_model = table_aliases[source_table]
+            join_condition = and_(source_column == target_column, *[
+                getattr(source_model, source_other) == getattr(target_model, target_other)
+                for source_other, target_other in self._composite_fk_pairs(source_model, source_col, target_model, target_col)
+            ])
+            
+            # Adicionar o join à consulta
+            if join_type == "INNER":
+                from_obj = from_obj.join(target_selectable, join_condition)
+            elif join_type == "LEFT":
+                from_obj = from_obj.join(target_selectable, join_condition, isouter=True)
+            elif join_type == "RIGHT":
+                # RIGHT JOIN normalizado: "F RIGHT JOIN T" é emitido como "T LEFT JOIN F"
+                from_obj = target_selectable.join(from_obj, join_condition, isouter=True)
+            elif join_type == "FULL":
+                from_obj = from_obj.join(target_selectable, join_condition, full=True)
+            else:  # Default to INNER
+                from_obj = from_obj.join(target_selectable, join_condition)
+        
+        # Definir a cláusula FROM
+        query = query.select_from(from_obj)
+        
+        # Adicionar filtros (WHERE)
+        def build_filter_condition(filter_info: Dict[str, Any]) -> Any:
+            operator = filter_info.get("operator", "=")
+            attr = filter_info["attribute"]
+            value = self._resolve_parameter_placeholder(filter_info["value"], parameter_names)
+            filter_function = filter_info.get("function", None)
+            
+            # Obter a coluna para o filtro
+            if "." in attr:
+                table_name, col_name = attr.split(".")
+                column_obj = get_column_from_table(table_name, col_name)
+            else:
+                column_obj = get_column_from_table(base_table, attr)
+            
+            # Aplicar função se especificada
+            if filter_function:
+                column_obj = self._apply_function_to_column(column_obj, filter_function)
+            
+            # Aplicar o operador usando o método auxiliar
+            return self._apply_filter_operator(column_obj, operator, value)
+        
+        def build_filter_expression(node: Dict[str, Any]) -> Any:
+            if "conditions" not in node:
+                return build_filter_condition(node)
+            children = [build_filter_expression(child) for child in node["conditions"]]
+            return or_(*children) if node["logic"] == "OR" else and_(*children)
+        
+        # Filtros planos (combinados da esquerda para a direita) e a árvore de filtros
+        # viram um único grupo normalizado antes de gerar o WHERE
+        normalized_filters = self.normalizeFilters(filters, filter_tree, parameter_names)
+        if normalized_filters:
+            query = query.where(build_filter_expression(normalized_filters))
+          # Adicionar GROUP BY
+        if group_by_attributes:
+            group_by_columns = []
+            for attr in group_by_attributes:
+                column_obj = self._get_column_with_qualifier(attr, base_table, table_aliases, get_column_from_table, aggregate_aliases)
+                group_by_columns.append(column_obj)
+            
+            query = query.group_by(*group_by_columns)
+        
+        # Adicionar HAVING (filtros sobre agregações)
+        if having:
+            having_expression = None
+            for having_info in having:
+                having_dict = having_info.model_dump() if hasattr(having_info, 'model_dump') else having_info
+                attr = having_dict["attribute"]
+                function_name = having_dict.get("function")
+                value = self._resolve_parameter_placeholder(having_dict["value"], parameter_names)
                 
-                # Converter para lista de dicionários
-                data = [dict(row) for row in result]
+                if function_name:
+                    column_obj = self._get_column_with_qualifier(attr, base_table, table_aliases, get_column_from_table)
+                    agg_expression = self._build_aggregate_expression(function_name, column_obj, preview_info)
+                elif attr in aggregate_aliases:
+                    # Alias de agregação selecionada: reutiliza a expressão (sem o rótulo)
+                    agg_expression = aggregate_aliases[attr].element
+                else:
+                    raise ValueError(
+                        f"Filtro HAVING em '{attr}' precisa de uma função de agregação ou do alias de uma agregação selecionada"
+                    )
                 
-                return data, sql_query
-        except Exception as e:
-            print(f"Erro ao gerar relatório adhoc: {e}")
-            raise e
+                condition = self._apply_filter_operator(agg_expression, having_dict.get("operator", "="), value)
+                if having_expression is None:
+                    having_expression = condition
+                elif having_dict.get("logic", "AND") == "OR":
+                    having_expression = or_(having_expression, condition)
+                else:
+                    having_expression = and_(having_expression, condition)
+            
+            if having_expression is not None:
+                query = query.having(having_expression)
+        
+        def resolve_column(attr):
+            return self._get_column_with_qualifier(attr, base_table, table_aliases, get_column_from_table, aggregate_aliases)
+        
+        # Adicionar ORDER BY
+        order_by_specs = self._resolve_order_by(order_by_columns, resolve_column)
+        
+        if top_n:
+            # Top-N por grupo: ranking calculado no banco, a ordenação vai para a consulta externa
+            query = self._apply_top_n_per_group(query, top_n, order_by_specs, resolve_column)
+        elif order_by_specs:
+            query = query.order_by(*[
+                desc(column_obj) if direction == "DESC" else asc(column_obj)
+                for column_obj, direction in order_by_specs
+            ])
+    
+        # Adicionar LIMIT
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return query
+
+    def optimizeJoins(self, base_table: str, attributes: List[str], joins: List,
+                      group_by_attributes: List[str], aggregate_functions: List,
+                      order_by_columns: List, filters: List[Dict[str, Any]] = [],
+                      having: List[Dict[str, Any]] = None, top_n: Dict[str, Any] = None,
+                      filter_tree: Dict[str, Any] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Otimiza a lista de joins do relatório antes de montar a consulta:
+        
+        - normaliza o tipo ("LEFT JOIN", "left outer" -> LEFT; RIGHT é emitido como LEFT invertido);
+        - remove joins cuja tabela não contribui com nenhuma coluna e que comprovadamente
+          não mudam o resultado: LEFT para coluna única (PK/UNIQUE) do alvo, ou INNER por FK
+          não nula para coluna única do alvo, a partir de uma tabela que não é estendida com nulos;
+        - ordena os joins internos antes dos externos (primeiro os com filtro na tabela alvo),
+          respeitando as dependências entre eles. Com RIGHT/FULL a ordem original é mantida.
+        
+        Returns:
+            Tuple com a lista de joins otimizada e o resumo das alterações (joinPlan)
+        """
+        model_classes = self._get_model_classes()
+        # Condições da árvore de filtros contam como filtros comuns para uso e ordenação
+        filter_conditions = self.listFilterConditions(filters, filter_tree)
+        join_entries = []
+        for index, join_info in enumerate(joins):
+            join_dict = dict(join_info.model_dump() if hasattr(join_info, 'model_dump') else join_info)
+            join_dict["joinType"] = self._normalize_join_type(join_dict.get("joinType"))
+            source_attr = join_dict.get("sourceAttribute") or ""
+            source, _, source_col = source_attr.rpartition(".")
+            join_entries.append({
+                "index": index,
+                "join": join_dict,
+                "qualifier": join_dict.get("alias") or join_dict.get("targetTable"),
+                "source": source or base_table,
+                "source_col": source_col,
+                "target_col": (join_dict.get("targetAttribute") or "").rpartition(".")[2],
+            })
+        
+        plan = {
+            "originalOrder": [entry["qualifier"] for entry in join_entries],
+            "order": [],
+            "pruned": [],
+        }
+        
+        referenced = self._collect_referenced_qualifiers(
+            base_table, join_entries, model_classes, attributes, group_by_attributes,
+            aggregate_functions, order_by_columns, filter_conditions, having, top_n
+        )
+        has_outer_reorder_barrier = any(entry["join"]["joinType"] in ("RIGHT", "FULL") for entry in join_entries)
+        
+        # Remoção até um ponto fixo: remover um join pode deixar sem uso a tabela de origem de outro
+        kept = list(join_entries)
+        if not has_outer_reorder_barrier:
+            changed = True
+            while changed:
+                changed = False
+                preserved = self._preserved_qualifiers(base_table, kept)
+                used_as_source = {entry["source"] for entry in kept}
+                for entry in reversed(kept):
+                    if entry["qualifier"] in referenced or entry["qualifier"] in used_as_source:
+                        continue
+                    reason = self._join_prune_reason(entry, kept, model_classes, preserved)
+                    if reason:
+                        kept.remove(entry)
+                        plan["pruned"].append({
+                            "table": entry["join"].get("targetTable"),
+                            "alias": entry["join"].get("alias"),
+                            "reason": reason,
+                        })
+                        changed = True
+                        break
+        
+        if not has_outer_reorder_barrier:
+            kept = self._order_joins(base_table, kept, filter_conditions)
+        
+        plan["order"] = [entry["qualifier"] for entry in kept]
+        return [entry["join"] for entry in kept], plan
+
+    def _composite_fk_pairs(self, source_model, source_col: str, target_model, target_col: str) -> List[Tuple[str, str]]:
+        """
+        Demais pares (coluna de origem, coluna alvo) da FK composta que contém o par do join,
+        em qualquer direção; vazio quando a FK é simples ou não existe
+        """
+        source_table = inspect(source_model).mapper.local_table
+        target_table = inspect(target_model).mapper.local_table
+        for child, child_col, parent, parent_col, reverse in (
+            (source_table, source_col, target_table, target_col, False),
+            (target_table, target_col, source_table, source_col, True),
+        ):
+            for constraint in child.foreign_key_constraints:
+                if constraint.referred_table.name != parent.name:
+                    continue
+                pairs = [(element.parent.name, element.column.name) for element in constraint.elements]
+                if len(pairs) > 1 and (child_col, parent_col) in pairs:
+                    others = [pair for pair in pairs if pair != (child_col, parent_col)]
+                    return [(parent_name, child_name) for child_name, parent_name in others] if reverse else others
+        return []
+
+    def _normalize_join_type(self, join_type: str) -> str:
+        """
+        Tipo de join executado: INNER, LEFT, RIGHT ou FULL
+
+        No modo legacy (padrão) vale o comportamento original do construtor de relatórios:
+        só "LEFT" e "RIGHT" são joins externos e o restante, inclusive o "LEFT JOIN" enviado
+        pela interface, roda como INNER, para não mudar o resultado de relatórios existentes.
+        Com REPORT_JOIN_TYPE_SEMANTICS=sql, "LEFT JOIN", "LEFT OUTER JOIN", "FULL JOIN" etc.
+        têm o significado do SQL.
+        """
+        if JOIN_TYPE_SEMANTICS != "sql":
+            normalized = (join_type or "INNER").strip().upper()
+            return normalized if normalized in ("LEFT", "RIGHT") else "INNER"
+        words = (join_type or "INNER").upper().replace("OUTER", "").replace("JOIN", "").split()
+        normalized = words[0] if words else "INNER"
+        return normalized if normalized in ("INNER", "LEFT", "RIGHT", "FULL") else "INNER"
+
+    def _collect_referenced_qualifiers(self, base_table: str, join_entries: List[Dict[str, Any]],
+                                       model_classes: Dict[str, Any], attributes: List[str],
+                                       group_by_attributes: List[str], aggregate_functions: List,
+                                       order_by_columns: List, filters: List, having: List,
+                                       top_n: Dict[str, Any]) -> set:
+        """
+        Tabelas/aliases usados por alguma coluna selecionada, agregada, filtrada, agrupada ou ordenada.
+        Atributos sem qualificador contam para toda tabela que tem a coluna (aproximação segura).
+        """
+        def as_dict(item):
+            return item.model_dump() if hasattr(item, 'model_dump') else item
+        
+        names = list(attributes) + list(group_by_attributes or [])
+        names += [as_dict(agg).get("attribute") for agg in aggregate_functions or []]
+        names += [as_dict(order).get("attribute") or as_dict(order).get("column") for order in order_by_columns or []]
+        names += [as_dict(filter_info).get("attribute") for filter_info in filters or []]
+        names += [as_dict(having_info).get("attribute") for having_info in having or []]
+        if top_n:
+            top_n = as_dict(top_n)
+            names += list(top_n.get("partitionBy") or [])
+            names += [as_dict(order).get("attribute") or as_dict(order).get("column") for order in top_n.get("orderBy") or []]
+        
+        qualifier_tables = {base_table: base_table}
+        for entry in join_entries:
+            qualifier_tables[entry["qualifier"]] = entry["join"].get("targetTable")
+        
+        referenced = set()
+        for name in names:
+            if not name:
+                continue
+            if "." in name:
+                referenced.add(name.split(".")[0])
+                continue
+            for qualifier, table_name in qualifier_tables.items():
+                model = model_classes.get(table_name)
+                if model is not None and name in model.__table__.c:
+                    referenced.add(qualifier)
+        return referenced
+
+    def _preserved_qualifiers(self, base_table: str, join_entries: List[Dict[str, Any]]) -> set:
+        """
+        Tabelas cujas linhas nunca são estendidas com nulos: a base e os alvos de INNER JOINs a partir delas
+        """
+        preserved = {base_table}
+        for entry in join_entries:
+            if entry["join"]["joinType"] == "INNER" and entry["source"] in preserved:
+                preserved.add(entry["qualifier"])
+        return preserved
+
+    def _join_prune_reason(self, entry: Dict[str, Any], join_entries: List[Dict[str, Any]],
+                           model_classes: Dict[str, Any], preserved: set) -> Optional[str]:
+        """
+        Motivo pelo qual o join pode ser removido sem alterar o resultado, ou None
+        """
+        join_dict = entry["join"]
+        target_model = model_classes.get(join_dict.get("targetTable"))
+        if target_model is None:
+            return None
+        target_table = target_model.__table__
+        target_col = entry["target_col"]
+        if target_col not in target_table.c:
+            return None
+        
+        # Coluna única no alvo: cada linha de origem casa com no máximo uma linha
+        target_column = target_table.c[target_col]
+        unique_target = (
+            set(target_table.primary_key.columns.keys()) == {target_col}
+            or target_column.unique
+            or any(
+                isinstance(constraint, UniqueConstraint) and set(constraint.columns.keys()) == {target_col}
+                for constraint in target_table.constraints
+            )
+        )
+        if not unique_target:
+            return None
+        
+        if join_dict["joinType"] == "LEFT":
+            return f"LEFT JOIN para coluna única {join_dict.get('targetTable')}.{target_col} sem colunas usadas"
+        
+        if join_dict["joinType"] != "INNER" or entry["source"] not in preserved:
+            return None
+        
+        # INNER JOIN: toda linha de origem precisa ter exatamente uma correspondente (FK não nula)
+        source_table_name = entry["source"]
+        for other in join_entries:
+            if other["qualifier"] == entry["source"]:
+                source_table_name = other["join"].get("targetTable")
+        source_model = model_classes.get(source_table_name)
+        if source_model is None or entry["source_col"] not in source_model.__table__.c:
+            return None
+        source_column = source_model.__table__.c[entry["source_col"]]
+        references_target = any(
+            fk.column.table.name == target_table.name and fk.column.name == target_col
+            for fk in source_column.foreign_keys
+        )
+        if references_target and not source_column.nullable:
+            return (
+                f"FK não nula {source_table_name}.{entry['source_col']} -> "
+                f"{target_table.name}.{target_col} sem colunas usadas"
+            )
+        return None
+
+    def _order_joins(self, base_table: str, join_entries: List[Dict[str, Any]], filters: List) -> List[Dict[str, Any]]:
+        """
+        Ordena os joins: INNER com filtro na tabela alvo, demais INNER e por fim LEFT,
+        sempre depois do join que introduz a tabela de origem
+        """
+        filtered = {
+            (filter_info.get("attribute") or "").split(".")[0]
+            for filter_info in (filter_info.model_dump() if hasattr(filter_info, 'model_dump') else filter_info
+                                for filter_info in filters or [])
+            if "." in (filter_info.get("attribute") or "")
+        }
+        
+        def priority(entry):
+            if entry["join"]["joinType"] == "INNER":
+                return (0 if entry["qualifier"] in filtered else 1, entry["index"])
+            return (2, entry["index"])
+        
+        available = {base_table}
+        pending = list(join_entries)
+        ordered = []
+        while pending:
+            ready = [entry for entry in pending if entry["source"] in available]
+            if not ready:
+                # Origem desconhecida (ex.: atributo sem qualificador): mantém a ordem restante
+                ordered.extend(pending)
+                break
+            chosen = min(ready, key=priority)
+            ordered.append(chosen)
+            available.add(chosen["qualifier"])
+            pending.remove(chosen)
+        return ordered
+
+    def _build_aggregate_expression(self, function_name: str, column_obj, preview_info: Dict[str, Any] = None):
+        """
+        Monta a expressão de agregação, extrapolando COUNT/SUM no modo prévia
+        """
+        agg_func = getattr(func, function_name.lower(), None)
+        if not agg_func:
+            raise ValueError(f"Função de agregação '{function_name}' não suportada")
+        
+        agg_expression = agg_func(column_obj)
+        if preview_info and function_name.upper() in SCALED_AGGREGATES:
+            # Extrapolar o valor da amostra para a tabela inteira
+            agg_expression = agg_expression * preview_info["scaleFactor"]
+            if function_name.upper() == "COUNT":
+                agg_expression = func.round(agg_expression)
+        return agg_expression
+
+    def _resolve_order_by(self, order_by_columns: List, resolve_column) -> List[Tuple[Any, str]]:
+        """
+        Converte a lista de ordenação em pares (coluna, direção)
+        """
+        order_by_specs = []
+        for order_info in order_by_columns or []:
+            # Converter para dict se for um modelo Pydantic
+            order_dict = order_info
+            if hasattr(order_info, 'model_dump'):
+                order_dict = order_info.model_dump()
+            
+            # Verificar se está usando 'attribute' ou 'column' (para compatibilidade)
+            attr = order_dict.get("attribute") or order_dict.get("column") or ""
+            direction = (order_dict.get("direction") or "ASC").upper()
+            
+            if not attr:
+                continue
+            order_by_specs.append((resolve_column(attr), "DESC" if direction == "DESC" else "ASC"))
+        return order_by_specs
+
+    def _apply_top_n_per_group(self, query, top_n: Dict[str, Any], order_by_specs: List[Tuple[Any, str]],
+                               resolve_column) -> Any:
+        """
+        Mantém só as N primeiras linhas de cada grupo:
+        SELECT ... FROM (SELECT ..., ROW_NUMBER() OVER (PARTITION BY ... ORDER BY ...) AS rank) AS ranked
+        WHERE rank <= N
+        
+        Args:
+            query: Consulta do relatório (sem ORDER BY e LIMIT)
+            top_n: Dicionário com partitionBy (atributos), orderBy (ordenação dentro do grupo) e n
+            order_by_specs: Ordenação final do relatório, aplicada à consulta externa
+            resolve_column: Função que resolve um atributo (ou alias de agregação) para a coluna
+            
+        Returns:
+            Select externo filtrando pelo ranking
+        """
+        top_n = top_n.model_dump() if hasattr(top_n, 'model_dump') else top_n
+        n = int(top_n.get("n") or 0)
+        if n <= 0:
+            raise ValueError("N do top-N por grupo deve ser maior que zero")
+        if not top_n.get("partitionBy"):
+            raise ValueError("Top-N por grupo exige pelo menos um atributo em partitionBy")
+        
+        def unlabel(column_obj):
+            # Dentro do OVER vai a expressão, não o rótulo da agregação
+            return column_obj.element if isinstance(column_obj, Label) else column_obj
+        
+        partition_columns = [unlabel(resolve_column(attr)) for attr in top_n["partitionBy"]]
+        rank_order = [
+            desc(unlabel(column_obj)) if direction == "DESC" else asc(unlabel(column_obj))
+            for column_obj, direction in self._resolve_order_by(top_n.get("orderBy"), resolve_column)
+        ]
+        if not rank_order:
+            raise ValueError("Top-N por grupo exige a ordenação (orderBy) que define as N primeiras linhas")
+        
+        row_number = func.row_number().over(partition_by=partition_columns, order_by=rank_order)
+        ranked = query.add_columns(row_number.label(TOP_N_RANK_COLUMN)).subquery("ranked")
+        rank_column = ranked.c[TOP_N_RANK_COLUMN]
+        
+        outer_query = select(*[column for column in ranked.c if column.key != TOP_N_RANK_COLUMN]).where(rank_column <= n)
+        
+        def outer_column(column_obj):
+            element = column_obj.__clause_element__() if hasattr(column_obj, '__clause_element__') else column_obj
+            return ranked.corresponding_column(element)
+        
+        outer_order = []
+        if order_by_specs:
+            for column_obj, direction in order_by_specs:
+                column = outer_column(column_obj)
+                if column is None:
+                    raise ValueError("Com top-N por grupo, a ordenação do relatório deve usar colunas selecionadas")
+                outer_order.append(desc(column) if direction == "DESC" else asc(column))
+        else:
+            # Padrão: grupos juntos (quando as colunas de partição estão selecionadas) e em ordem de ranking
+            for attr in top_n["partitionBy"]:
+                column = outer_column(resolve_column(attr))
+                if column is not None:
+                    outer_order.append(asc(column))
+        outer_order.append(asc(rank_column))
+        
+        return outer_query.order_by(*outer_order)
+
+    def getPreviewInfo(self, preview: Dict[str, Any], aggregate_functions: List) -> Dict[str, Any]:
+        """
+        Valida as opções de prévia amostrada e descreve como ler o resultado
+        
+        Args:
+            preview: Opções de prévia (method, percent, seed)
+            aggregate_functions: Lista de funções de agregação do relatório
+            
+        Returns:
+            Dicionário com método, percentual, semente, fator de escala e a
+            lista de agregações aproximadas (indicando quais foram extrapoladas)
+        """
+        method = (preview.get("method") or "SYSTEM").upper()
+        if method not in SAMPLE_METHODS:
+            raise ValueError(f"Método de amostragem '{method}' não suportado (use SYSTEM ou BERNOULLI)")
+        
+        percent = float(preview.get("percent") or 1.0)
+        if percent <= 0 or percent > 100:
+            raise ValueError("Percentual de amostragem deve estar entre 0 (exclusivo) e 100")
+        
+        scale_factor = 100.0 / percent
+        approximate_aggregates = []
+        for agg in aggregate_functions:
+            agg_dict = agg.model_dump() if hasattr(agg, 'model_dump') else agg
+            function_name = (agg_dict.get("function") or "").upper()
+            if not function_name or not agg_dict.get("attribute"):
+                continue
+            scaled = function_name in SCALED_AGGREGATES
+            approximate_aggregates.append({
+                "alias": agg_dict.get("alias"),
+                "function": function_name,
+                "scaled": scaled,
+                "scaleFactor": scale_factor if scaled else 1.0
+            })
+        
+        return {
+            "approximate": True,
+            "method": method,
+            "percent": percent,
+            "seed": preview.get("seed"),
+            "scaleFactor": scale_factor,
+            "aggregates": approximate_aggregates
+        }
 
     def _get_model_classes(self) -> Dict[str, Any]:
         """
@@ -571,6 +1502,246 @@ class ConsultaDAO:
                        hasattr(getattr(models_module, cls_name), '__tablename__')]
         }
 
+    def listFilterConditions(self, filters: List = None, filter_tree: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Todas as condições simples (folhas) dos filtros planos e da árvore de filtros
+        """
+        def as_dict(item):
+            return item.model_dump() if hasattr(item, 'model_dump') else item
+        
+        conditions = [as_dict(filter_info) for filter_info in filters or []]
+        pending = [as_dict(filter_tree)] if filter_tree else []
+        while pending:
+            node = pending.pop(0)
+            if "conditions" in node:
+                pending[0:0] = [as_dict(child) for child in node["conditions"] or []]
+            else:
+                conditions.append(node)
+        return conditions
+
+    def normalizeFilters(self, filters: List = None, filter_tree: Dict[str, Any] = None,
+                         parameter_names: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Combina os filtros planos e a árvore de filtros em um único grupo normalizado.
+        
+        Os filtros planos mantêm a semântica antiga (combinação da esquerda para a direita
+        pelo campo logic) e entram com AND junto da árvore. A normalização:
+        
+        - achata grupos aninhados com a mesma lógica e descarta grupos vazios;
+        - remove predicados e grupos repetidos e grupos absorvidos (A AND (A OR B) -> A);
+        - junta igualdades em OR sobre a mesma coluna em IN (col = 1 OR col = 2 -> col IN (1, 2)),
+          e diferenças em AND em NOT IN; IN com um único valor volta a ser "=".
+        
+        A coluna nunca é envolvida em expressões novas, então os índices continuam utilizáveis.
+        
+        Returns:
+            Grupo {"logic", "conditions"}, condição simples, ou None sem filtros
+        """
+        nodes = []
+        flat_tree = self._flat_filters_to_tree(filters or [])
+        if flat_tree:
+            nodes.append(flat_tree)
+        if filter_tree:
+            nodes.append(filter_tree.model_dump() if hasattr(filter_tree, 'model_dump') else filter_tree)
+        return self._normalize_filter_node({"logic": "AND", "conditions": nodes}, parameter_names)
+
+    def _flat_filters_to_tree(self, filters: List) -> Optional[Dict[str, Any]]:
+        """
+        Converte a lista plana na árvore equivalente: ((f1 op2 f2) op3 f3) ...
+        """
+        tree = None
+        for filter_info in filters:
+            filter_dict = filter_info.model_dump() if hasattr(filter_info, 'model_dump') else dict(filter_info)
+            logic = (filter_dict.get("logic") or "AND").upper()
+            tree = filter_dict if tree is None else {
+                "logic": "OR" if logic == "OR" else "AND",
+                "conditions": [tree, filter_dict],
+            }
+        return tree
+
+    def _normalize_filter_node(self, node: Dict[str, Any], parameter_names: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Normaliza um nó da árvore de filtros (ver normalizeFilters)
+        """
+        if hasattr(node, 'model_dump'):
+            node = node.model_dump()
+        
+        if "conditions" not in node:
+            return self._normalize_filter_condition(node, parameter_names)
+        
+        logic = (node.get("logic") or "AND").upper()
+        if logic not in ("AND", "OR"):
+            raise ValueError(f"Lógica de filtro '{node.get('logic')}' não suportada (use AND ou OR)")
+        
+        # Achatar subgrupos com a mesma lógica: A AND (B AND C) -> A AND B AND C
+        children = []
+        for child in node.get("conditions") or []:
+            child = self._normalize_filter_node(child, parameter_names)
+            if child is None:
+                continue
+            if "conditions" in child and child["logic"] == logic:
+                children.extend(child["conditions"])
+            else:
+                children.append(child)
+        
+        children = self._merge_equality_conditions(logic, children, parameter_names)
+        
+        # Remover repetições e subgrupos absorvidos por uma condição irmã
+        unique_children = []
+        seen = set()
+        for child in children:
+            key = self._filter_node_key(child)
+            if key not in seen:
+                seen.add(key)
+                unique_children.append(child)
+        children = [
+            child for child in unique_children
+            if "conditions" not in child or not self._is_absorbed(logic, child, unique_children, seen)
+        ]
+        
+        if not children:
+            return None
+        if len(children) == 1:
+            return children[0]
+        return {"logic": logic, "conditions": children}
+
+    def _normalize_filter_condition(self, condition: Dict[str, Any], parameter_names: List[str] = None) -> Dict[str, Any]:
+        """
+        Forma canônica de uma condição simples: operador em maiúsculas e listas de IN/NOT IN
+        """
+        if not condition.get("attribute"):
+            raise ValueError("Condição de filtro sem atributo")
+        operator = (condition.get("operator") or "=").strip().upper()
+        value = condition.get("value")
+        if operator in ("IN", "NOT IN") and not self._is_parameter_placeholder(value, parameter_names):
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(",")]
+            elif not isinstance(value, list):
+                value = [value]
+            value = self._unique_values(value)
+            # IN (NULL) nunca casa, mas "= NULL" viraria IS NULL: listas com NULL ficam como estão
+            if len(value) == 1 and not self._has_null_value(value):
+                operator, value = ("=" if operator == "IN" else "!="), value[0]
+        return {
+            "attribute": condition["attribute"],
+            "operator": operator,
+            "value": value,
+            "function": condition.get("function") or None,
+        }
+
+    def _merge_equality_conditions(self, logic: str, children: List[Dict[str, Any]],
+                                   parameter_names: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        OR de igualdades na mesma coluna -> IN; AND de diferenças na mesma coluna -> NOT IN.
+        A condição combinada fica na posição da primeira delas.
+
+        Condições com NULL não são combinadas: "col = NULL" vira IS NULL, mas NULL dentro de
+        IN nunca casa e dentro de NOT IN torna a condição sempre falsa.
+        """
+        merge_operators = {"=": "IN", "IN": "IN"} if logic == "OR" else {"!=": "NOT IN", "NOT IN": "NOT IN"}
+        merged = []
+        groups = {}
+        for child in children:
+            operator = child.get("operator")
+            # Placeholders de relatórios salvos viram bind parameters próprios e não são combinados
+            if ("conditions" in child or operator not in merge_operators
+                    or self._is_parameter_placeholder(child["value"], parameter_names)
+                    or self._has_null_value(child["value"])):
+                merged.append(child)
+                continue
+            key = (child["attribute"], child["function"])
+            values = child["value"] if operator in ("IN", "NOT IN") else [child["value"]]
+            if key in groups:
+                groups[key]["value"].extend(values)
+                continue
+            groups[key] = {
+                "attribute": child["attribute"],
+                "operator": merge_operators[operator],
+                "value": list(values),
+                "function": child["function"],
+            }
+            merged.append(groups[key])
+        
+        for condition in groups.values():
+            condition["value"] = self._unique_values(condition["value"])
+            if len(condition["value"]) == 1:
+                condition["operator"] = "=" if condition["operator"] == "IN" else "!="
+                condition["value"] = condition["value"][0]
+        return merged
+
+    def _is_absorbed(self, logic: str, group: Dict[str, Any], siblings: List[Dict[str, Any]], sibling_keys: set) -> bool:
+        """
+        Indica se o subgrupo é redundante diante das condições irmãs:
+        A AND (A OR B) -> A, A OR (A AND B) -> A, e o mesmo quando uma igualdade/IN
+        contém a outra (col IN (1, 2) OR (col = 1 AND B) -> col IN (1, 2))
+        """
+        if any(self._filter_node_key(grandchild) in sibling_keys for grandchild in group["conditions"]):
+            return True
+        sibling_sets = [self._filter_value_set(sibling) for sibling in siblings if "conditions" not in sibling]
+        for grandchild in group["conditions"]:
+            inner = self._filter_value_set(grandchild)
+            if inner is None:
+                continue
+            for outer in sibling_sets:
+                if outer is None or outer[0] != inner[0]:
+                    continue
+                # OR: o subgrupo AND implica a condição irmã; AND: a condição irmã implica o subgrupo OR
+                if (logic == "OR" and inner[1] <= outer[1]) or (logic == "AND" and outer[1] <= inner[1]):
+                    return True
+        return False
+
+    def _has_null_value(self, value: Any) -> bool:
+        return value is None or (isinstance(value, list) and any(item is None for item in value))
+
+    def _filter_value_set(self, node: Dict[str, Any]) -> Optional[Tuple[Tuple[str, Any], frozenset]]:
+        """
+        ((atributo, função), conjunto de valores) de uma condição "=" ou IN com valores literais
+        """
+        if "conditions" in node or node["operator"] not in ("=", "IN"):
+            return None
+        values = node["value"] if node["operator"] == "IN" else [node["value"]]
+        if not isinstance(values, list) or any(isinstance(v, str) and PARAMETER_PLACEHOLDER_PATTERN.match(v.strip()) for v in values):
+            return None
+        # NULL em "=" é IS NULL e em IN nunca casa: não entra na comparação de conjuntos
+        if any(v is None for v in values):
+            return None
+        return (node["attribute"], node["function"]), frozenset(repr(v) for v in values)
+
+    def _unique_values(self, values: List[Any]) -> List[Any]:
+        """
+        Valores sem repetição, na ordem original
+        """
+        unique = []
+        seen = set()
+        for value in values:
+            key = repr(value)
+            if key not in seen:
+                seen.add(key)
+                unique.append(value)
+        return unique
+
+    def _filter_node_key(self, node: Dict[str, Any]) -> Any:
+        """
+        Chave de comparação de um nó normalizado (grupos comparados sem considerar a ordem)
+        """
+        if "conditions" in node:
+            return (node["logic"], frozenset(self._filter_node_key(child) for child in node["conditions"]))
+        value = node["value"]
+        if node["operator"] in ("IN", "NOT IN") and isinstance(value, list):
+            value = frozenset(repr(v) for v in value)
+        else:
+            value = repr(value)
+        return (node["attribute"], node["function"], node["operator"], value)
+
+    def _is_parameter_placeholder(self, value: Any, parameter_names: List[str] = None) -> bool:
+        """
+        Indica se o valor é um placeholder ":nome" de parâmetro declarado
+        """
+        if not parameter_names or not isinstance(value, str):
+            return False
+        match = PARAMETER_PLACEHOLDER_PATTERN.match(value.strip())
+        return bool(match) and match.group(1) in parameter_names
+
     def _apply_filter_operator(self, column_obj, operator: str, value: Any) -> Any:
         """
         Aplica o operador de filtro à coluna
@@ -594,20 +1765,39 @@ class ConsultaDAO:
             "<=": lambda col, val: col <= val,
             "LIKE": lambda col, val: col.like(val),
             "ILIKE": lambda col, val: col.ilike(val),
+            # Contém o termo (sem case), com curingas escapados: ILIKE '%termo%';
+            # em colunas array (ex.: country_profile.languages) contém o(s) elemento(s): col @> ARRAY[...]
+            "CONTAINS": lambda col, val: (
+                col.contains(array([val]) if isinstance(val, BindParameter) else (val if isinstance(val, list) else [val]))
+                if isinstance(getattr(col, "type", None), ARRAY)
+                else col.ilike(self._contains_pattern(val)) if isinstance(val, BindParameter)
+                else col.ilike(f"%{self._escape_like(str(val))}%", escape="\\")
+            ),
+            # Similaridade por trigramas do pg_trgm (operador %)
+            "SIMILAR": lambda col, val: col.op("%")(val),
         }
         
         if operator in operator_mapping:
             return operator_mapping[operator](column_obj, value)
         elif operator == "IN":
-            if isinstance(value, str):
+            if isinstance(value, BindParameter):
+                # Parâmetro recebe um array: col = ANY($n) mantém a consulta preparável
+                return column_obj == any_(value)
+            elif isinstance(value, str):
                 values = [v.strip() for v in value.split(",")]
                 return column_obj.in_(values)
             elif isinstance(value, list):
                 return column_obj.in_(value)
             else:
                 return column_obj.in_([value])
+        elif operator == "WITHIN_KM":
+            # Coluna com códigos de país: países a até N km de um ponto, pelo índice geográfico em memória
+            country_codes = geo_dao.getCountryCodesWithin(value)
+            return column_obj.in_(country_codes) if country_codes else false()
         elif operator == "NOT IN":
-            if isinstance(value, str):
+            if isinstance(value, BindParameter):
+                return column_obj != all_(value)
+            elif isinstance(value, str):
                 values = [v.strip() for v in value.split(",")]
                 return column_obj.notin_(values)
             elif isinstance(value, list):
@@ -617,6 +1807,39 @@ class ConsultaDAO:
         else:
             raise ValueError(f"Operador '{operator}' não suportado")
 
+    def _resolve_parameter_placeholder(self, value: Any, parameter_names: List[str] = None) -> Any:
+        """
+        Converte um valor ":nome" em bind parameter quando "nome" é um parâmetro declarado
+        
+        Args:
+            value: Valor do filtro
+            parameter_names: Parâmetros declarados do relatório salvo (None fora de relatórios salvos)
+            
+        Returns:
+            BindParameter sem valor para placeholders, ou o próprio valor
+        """
+        if not parameter_names or not isinstance(value, str):
+            return value
+        match = PARAMETER_PLACEHOLDER_PATTERN.match(value.strip())
+        if not match or match.group(1) not in parameter_names:
+            return value
+        return bindparam(f"{PARAMETER_BIND_PREFIX}{match.group(1)}")
+
+    def _contains_pattern(self, value: BindParameter):
+        """
+        Padrão '%' || valor || '%' de um parâmetro de relatório salvo. Todos os operandos
+        têm tipo explícito: com concat(...) (VARIADIC "any") o PREPARE não consegue
+        deduzir o tipo do parâmetro
+        """
+        wildcard = cast(literal("%"), String)
+        return wildcard + cast(value, String) + wildcard
+
+    def _escape_like(self, value: str) -> str:
+        """
+        Escapa os curingas de LIKE (%, _ e a própria barra) em um valor literal
+        """
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
     def _get_column_with_qualifier(self, attr: str, base_table: str, table_aliases: Dict, get_column_from_table, aggregate_aliases: Dict = None) -> Any:
         """
         Obtém uma coluna com qualificador de tabela (ex: tabela.coluna)
@@ -648,6 +1871,7 @@ class ConsultaDAO:
             # Se não encontrou em nenhuma tabela, usar a tabela base
             return get_column_from_table(base_table, attr)
 
+    @_metadata_read
     def getTransitiveRelationsWithJoins(self, base_table: str, existing_joins: List[Dict]) -> Dict[str, Any]:
         """
         Busca relações transitivas considerando joins já existentes
@@ -660,7 +1884,7 @@ class ConsultaDAO:
             Dicionário com relações diretas e transitivas
         """
         try:
-            insp = inspect(self.engine)
+            insp = self._get_inspector()
             
             # Obter todas as tabelas envolvidas nos joins existentes
             involved_tables = {base_table}
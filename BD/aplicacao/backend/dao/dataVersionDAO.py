@@ -0,0 +1,73 @@
+"""
+Versão dos dados por tabela (tabela data_versions, incrementada ao fim das cargas)
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from .database import run_read
+
+# Tempo (segundos) durante o qual as versões lidas do banco são reaproveitadas
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', '2'))
+
+class DataVersionDAO:
+    """
+    Lê e mantém em cache as versões dos dados de cada tabela.
+
+    Sem a tabela data_versions (banco criado antes dela), todas as versões
+    são 0 e os consumidores simplesmente nunca veem mudança de versão.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._loaded_at = 0.0
+        self._available = True
+
+    def getVersions(self) -> Dict[str, int]:
+        """
+        Retorna {tabela: versão}, relendo do banco quando o cache expira
+        """
+        now = time.monotonic()
+        if now - self._loaded_at <= DATA_VERSION_TTL:
+            return self._versions
+
+        with self._lock:
+            if time.monotonic() - self._loaded_at <= DATA_VERSION_TTL:
+                return self._versions
+            if self._available:
+                try:
+                    rows = run_read(self._read_versions)
+                    self._versions = {table_name: version for table_name, version in rows}
+                except ProgrammingError as e:
+                    print(f"Tabela data_versions indisponível, versões dos dados fixas em 0: {e}")
+                    self._available = False
+            self._loaded_at = time.monotonic()
+            return self._versions
+
+    def _read_versions(self, read_engine):
+        with read_engine.connect() as conn:
+            return conn.execute(text("SELECT table_name, version FROM data_versions")).all()
+
+    def getVersion(self, table_name: str) -> int:
+        return self.getVersions().get(table_name, 0)
+
+    def getVersionToken(self, tables: Optional[List[str]] = None) -> str:
+        """
+        Representação estável das versões das tabelas informadas (todas, se None)
+        """
+        versions = self.getVersions()
+        names = sorted(set(tables)) if tables is not None else sorted(versions)
+        return "|".join(f"{name}:{versions.get(name, 0)}" for name in names)
+
+    def invalidate(self) -> None:
+        """
+        Força a releitura das versões na próxima consulta
+        """
+        self._loaded_at = 0.0
+
+# Instância compartilhada pelos DAOs e controllers do processo
+data_version_dao = DataVersionDAO()
@@ -0,0 +1,351 @@
+"""
+Jobs de exportação de relatórios ADHOC para arquivos CSV (gzip) e Parquet
+"""
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from .database import SessionLocal, run_read
+
+# Diretório onde os arquivos exportados e o estado dos jobs são gravados
+# (compartilhado entre os workers; com várias instâncias, um volume comum)
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'adhoc_exports'))
+# Jobs sem atualização há mais que isso (segundos) são removidos com seus arquivos
+EXPORT_TTL = float(os.getenv('EXPORT_TTL', '86400'))
+# Intervalo mínimo (segundos) entre duas limpezas de jobs expirados no mesmo processo
+EXPORT_CLEANUP_INTERVAL = 300
+# Formato dos ids de job (uuid4 em hexadecimal)
+EXPORT_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# Número de exportações executadas simultaneamente
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '2'))
+# Linhas lidas do cursor do servidor e gravadas por vez
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '10000'))
+
+EXPORT_FORMATS = {
+    'csv': {'extension': 'csv.gz', 'media_type': 'application/gzip'},
+    'parquet': {'extension': 'parquet', 'media_type': 'application/vnd.apache.parquet'},
+}
+
+class ExportCancelled(Exception):
+    """Sinaliza que o job foi cancelado durante a exportação"""
+    pass
+
+class ExportDAO:
+    """
+    Jobs de exportação compartilhados entre os workers: o estado de cada job fica em
+    <id>.json no diretório de exportação, ao lado do arquivo gerado, e o cancelamento
+    é pedido por um marcador <id>.cancel que o worker dono do job verifica entre os
+    chunks. Status, download e remoção funcionam em qualquer worker que enxergue o
+    diretório. Jobs sem atualização há mais de EXPORT_TTL são removidos.
+    """
+    def __init__(self, consulta_dao, export_dir: str = EXPORT_DIR):
+        self.consulta_dao = consulta_dao
+        self.export_dir = export_dir
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+        os.makedirs(export_dir, exist_ok=True)
+
+    def submitExport(self, report: Dict[str, Any], export_format: str = 'csv') -> Dict[str, Any]:
+        """
+        Cria um job de exportação e o coloca na fila do pool de workers
+
+        Args:
+            report: Parâmetros do relatório (mesmos argumentos de buildAdhocQuery)
+            export_format: 'csv' (gzip) ou 'parquet'
+
+        Returns:
+            Estado inicial do job
+        """
+        export_format = (export_format or 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportação '{export_format}' não suportado (use csv ou parquet)")
+
+        if export_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError("Exportação em Parquet requer o pacote 'pyarrow'")
+
+        # Montar a consulta já na submissão para rejeitar relatórios inválidos imediatamente
+        query = self.consulta_dao.buildAdhocQuery(**report)
+        self._cleanup_expired()
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            'id': job_id,
+            'format': export_format,
+            'status': 'pending',
+            'rows': 0,
+            'bytes': 0,
+            'error': None,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'updated_at': now,
+            'file_name': f"{job_id}.{EXPORT_FORMATS[export_format]['extension']}",
+        }
+        self._write_job(job)
+
+        self._executor.submit(self._run_export, job_id, query)
+        return self.getJob(job_id)
+
+    def getJob(self, job_id: str) -> Dict[str, Any]:
+        """
+        Retorna o estado de um job
+        """
+        job = self._read_job(job_id)
+        if job is None:
+            raise KeyError(f"Job de exportação '{job_id}' não encontrado")
+        return job
+
+    def listJobs(self) -> List[Dict[str, Any]]:
+        """
+        Lista todos os jobs conhecidos, do mais recente para o mais antigo
+        """
+        self._cleanup_expired()
+        jobs = [job for job in map(self._read_job, self._job_ids()) if job is not None]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+    def getJobFile(self, job_id: str) -> Dict[str, Any]:
+        """
+        Retorna caminho, nome e media type do arquivo de um job concluído
+        """
+        job = self.getJob(job_id)
+        if job['status'] != 'completed':
+            raise ValueError(f"Job de exportação '{job_id}' ainda não foi concluído (status: {job['status']})")
+        path = os.path.join(self.export_dir, job['file_name'])
+        if not os.path.exists(path):
+            raise KeyError(f"Arquivo do job de exportação '{job_id}' não encontrado")
+        return {
+            'path': path,
+            'file_name': job['file_name'],
+            'media_type': EXPORT_FORMATS[job['format']]['media_type'],
+        }
+
+    def deleteJob(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancela um job em andamento ou remove o arquivo de um job finalizado
+        """
+        job = self.getJob(job_id)
+        if job['status'] in ('pending', 'running'):
+            # O worker dono do job verifica o marcador entre os chunks e remove o arquivo parcial
+            with open(self._path(job_id, 'cancel'), 'w'):
+                pass
+            return {'id': job_id, 'status': 'cancelling'}
+        self._remove_job_files(job)
+        return {'id': job_id, 'status': 'deleted'}
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.export_dir, f"{job_id}.{suffix}")
+
+    def _job_ids(self) -> List[str]:
+        return [
+            name[:-len('.json')] for name in os.listdir(self.export_dir)
+            if name.endswith('.json') and EXPORT_JOB_ID_PATTERN.match(name[:-len('.json')])
+        ]
+
+    def _read_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # O id vem da URL: só ids no formato gerado viram caminho de arquivo
+        if not EXPORT_JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id, 'json'), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_job(self, job: Dict[str, Any]) -> None:
+        # Troca atômica: outro worker nunca lê o estado pela metade
+        partial_path = self._path(job['id'], f"json.{os.getpid()}.part")
+        with open(partial_path, 'w', encoding='utf-8') as file:
+            json.dump(job, file)
+        os.replace(partial_path, self._path(job['id'], 'json'))
+
+    def _update_job(self, job_id: str, **changes) -> Dict[str, Any]:
+        """
+        Atualiza o estado do job (só o worker dono do job grava)
+
+        Raises:
+            ExportCancelled: se o job foi removido (ex.: expirado) durante a exportação
+        """
+        with self._lock:
+            job = self._read_job(job_id)
+            if job is None:
+                raise ExportCancelled()
+            job.update(changes, updated_at=time.time())
+            self._write_job(job)
+            return job
+
+    def _check_cancelled(self, job_id: str) -> None:
+        if os.path.exists(self._path(job_id, 'cancel')):
+            raise ExportCancelled()
+
+    def _remove_job_files(self, job: Dict[str, Any]) -> None:
+        path = os.path.join(self.export_dir, job['file_name'])
+        for each_path in (path, path + '.part', self._path(job['id'], 'cancel'), self._path(job['id'], 'json')):
+            self._remove_file(each_path)
+
+    def _cleanup_expired(self) -> None:
+        """
+        Remove jobs (estado e arquivos) sem atualização há mais de EXPORT_TTL segundos:
+        os finalizados e os de workers que morreram no meio da exportação.
+        Roda no máximo a cada EXPORT_CLEANUP_INTERVAL segundos em cada processo.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < EXPORT_CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+        for job_id in self._job_ids():
+            job = self._read_job(job_id)
+            if job is None or now - job.get('updated_at', job['created_at']) <= EXPORT_TTL:
+                continue
+            try:
+                self._remove_job_files(job)
+            except OSError as e:
+                print(f"Não foi possível remover o job de exportação expirado {job_id}: {e}")
+
+    def _run_export(self, job_id: str, query) -> None:
+        """
+        Executa a consulta com cursor do lado do servidor e grava o arquivo em chunks
+        """
+        try:
+            job = self._update_job(job_id, status='running', started_at=time.time())
+        except ExportCancelled:
+            return
+        path = os.path.join(self.export_dir, job['file_name'])
+        partial_path = path + '.part'
+
+        try:
+            self._check_cancelled(job_id)
+
+            def export(read_engine):
+                # Nova tentativa (réplica indisponível): o arquivo parcial é regravado do início
+                self._update_job(job_id, rows=0, bytes=0)
+                with SessionLocal(bind=read_engine) as session:
+                    # stream_results usa cursor nomeado no PostgreSQL: as linhas chegam aos poucos
+                    result = session.execute(
+                        query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+                    )
+                    columns = list(result.keys())
+
+                    if job['format'] == 'parquet':
+                        self._write_parquet(job_id, result, columns, query, partial_path)
+                    else:
+                        self._write_csv(job_id, result, columns, partial_path)
+
+            run_read(export)
+            os.replace(partial_path, path)
+            self._update_job(
+                job_id,
+                status='completed',
+                bytes=os.path.getsize(path),
+                finished_at=time.time()
+            )
+        except ExportCancelled:
+            self._remove_file(partial_path)
+            self._remove_file(self._path(job_id, 'cancel'))
+            self._finish_job(job_id, status='cancelled')
+        except Exception as e:
+            print(f"Erro no job de exportação {job_id}: {e}")
+            self._remove_file(partial_path)
+            self._finish_job(job_id, status='failed', error=str(e))
+
+    def _finish_job(self, job_id: str, **changes) -> None:
+        try:
+            self._update_job(job_id, finished_at=time.time(), **changes)
+        except ExportCancelled:
+            # Job já removido: não há estado a atualizar
+            pass
+
+    def _write_csv(self, job_id: str, result, columns: List[str], path: str) -> None:
+        with gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6) as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+                self._check_cancelled(job_id)
+                writer.writerows(chunk)
+                self._advance(job_id, len(chunk), path)
+
+    def _write_parquet(self, job_id: str, result, columns: List[str], query, path: str) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            pa.field(name, self._arrow_type(column.type))
+            for name, column in zip(columns, query.selected_columns)
+        ])
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+                self._check_cancelled(job_id)
+                arrays = [
+                    pa.array([self._arrow_value(row[index], field.type) for row in chunk], type=field.type)
+                    for index, field in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                self._advance(job_id, len(chunk), path)
+
+    def _advance(self, job_id: str, rows: int, path: str) -> None:
+        with self._lock:
+            job = self._read_job(job_id)
+            if job is None:
+                raise ExportCancelled()
+            job['rows'] += rows
+            job['bytes'] = os.path.getsize(path) if os.path.exists(path) else job['bytes']
+            job['updated_at'] = time.time()
+            self._write_job(job)
+
+    def _arrow_type(self, sql_type):
+        """
+        Mapeia o tipo SQLAlchemy da coluna para um tipo Arrow (texto quando desconhecido)
+        """
+        import pyarrow as pa
+
+        try:
+            python_type = sql_type.python_type
+        except NotImplementedError:
+            return pa.string()
+
+        if python_type is bool:
+            return pa.bool_()
+        if python_type is int:
+            return pa.int64()
+        if python_type in (float, Decimal):
+            return pa.float64()
+        if python_type is datetime:
+            return pa.timestamp('us')
+        if python_type is date:
+            return pa.date32()
+        return pa.string()
+
+    def _arrow_value(self, value: Any, arrow_type) -> Any:
+        """
+        Converte o valor vindo do driver para o tipo Arrow da coluna
+        """
+        import pyarrow as pa
+
+        if value is None:
+            return None
+        if pa.types.is_string(arrow_type) and not isinstance(value, str):
+            return str(value)
+        if pa.types.is_integer(arrow_type) and isinstance(value, (Decimal, float)):
+            return int(value)
+        if isinstance(value, Decimal):
+            return float(value)
+        return value
+
+    def _remove_file(self, path: Optional[str]) -> None:
+        if path and os.path.exists(path):
+            os.remove(path)
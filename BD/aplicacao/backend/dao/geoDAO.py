@@ -0,0 +1,267 @@
+"""
+Consultas de vizinhança geográfica sobre as coordenadas dos países (country_geography)
+"""
+import heapq
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from .database import SessionLocal, run_read
+from .dataVersionDAO import data_version_dao
+from models.models import Countries, CountryGeography
+
+# Raio médio da Terra (km), usado na distância haversine
+EARTH_RADIUS_KM = 6371.0088
+# Tabelas cujas alterações exigem reconstruir o índice
+GEO_SOURCE_TABLES = ["countries", "country_geography"]
+# Vizinhos retornados quando nem raio nem k são informados
+DEFAULT_NEARBY_K = 10
+
+def to_unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    """
+    Ponto (lat, lng em graus) na esfera unitária: a distância euclidiana (corda)
+    entre dois vetores cresce com a distância sobre a superfície
+    """
+    lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lng_rad), cos_lat * math.sin(lng_rad), math.sin(lat_rad))
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Distância sobre a superfície da Terra (km) entre dois pontos em graus
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def km_to_chord(distance_km: float) -> float:
+    """
+    Distância sobre a superfície (km) -> corda na esfera unitária
+    """
+    angle = min(distance_km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+class SphereKDTree:
+    """
+    KD-tree estática sobre pontos da esfera unitária (x, y, z).
+
+    Cada nó divide os pontos pela mediana do eixo de maior amplitude; as consultas
+    descartam subárvores pela distância ao plano de corte, sem percorrer todos os pontos.
+    """
+    def __init__(self, points: List[Tuple[float, float, float]]):
+        self.points = points
+        # Nós: (índice do ponto, eixo, filho esquerdo, filho direito); -1 = sem filho
+        self.nodes: List[Tuple[int, int, int, int]] = []
+        self.root = self._build(list(range(len(points))))
+
+    def _build(self, indices: List[int]) -> int:
+        if not indices:
+            return -1
+        axis = max(range(3), key=lambda a: (
+            max(self.points[i][a] for i in indices) - min(self.points[i][a] for i in indices)
+        ))
+        indices.sort(key=lambda i: self.points[i][axis])
+        middle = len(indices) // 2
+        node_index = len(self.nodes)
+        self.nodes.append((indices[middle], axis, -1, -1))
+        left = self._build(indices[:middle])
+        right = self._build(indices[middle + 1:])
+        self.nodes[node_index] = (indices[middle], axis, left, right)
+        return node_index
+
+    def _distance_sq(self, index: int, target: Tuple[float, float, float]) -> float:
+        point = self.points[index]
+        return (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+
+    def within(self, target: Tuple[float, float, float], radius: float) -> List[int]:
+        """
+        Índices dos pontos a até radius (corda) do alvo
+        """
+        found = []
+        radius_sq = radius * radius
+        stack = [self.root]
+        while stack:
+            node_index = stack.pop()
+            if node_index < 0:
+                continue
+            point_index, axis, left, right = self.nodes[node_index]
+            if self._distance_sq(point_index, target) <= radius_sq:
+                found.append(point_index)
+            diff = target[axis] - self.points[point_index][axis]
+            near, far = (left, right) if diff <= 0 else (right, left)
+            stack.append(near)
+            if diff * diff <= radius_sq:
+                stack.append(far)
+        return found
+
+    def nearest(self, target: Tuple[float, float, float], k: int, radius: float = None) -> List[int]:
+        """
+        Índices dos k pontos mais próximos do alvo (opcionalmente limitados a radius), do mais próximo ao mais distante
+        """
+        # Heap máximo (distâncias negativas) com os k melhores até agora
+        best: List[Tuple[float, int]] = []
+        limit_sq = radius * radius if radius is not None else math.inf
+
+        def visit(node_index: int) -> None:
+            if node_index < 0:
+                return
+            point_index, axis, left, right = self.nodes[node_index]
+            distance_sq = self._distance_sq(point_index, target)
+            if distance_sq <= limit_sq:
+                if len(best) < k:
+                    heapq.heappush(best, (-distance_sq, point_index))
+                elif distance_sq < -best[0][0]:
+                    heapq.heapreplace(best, (-distance_sq, point_index))
+            diff = target[axis] - self.points[point_index][axis]
+            near, far = (left, right) if diff <= 0 else (right, left)
+            visit(near)
+            worst_sq = -best[0][0] if len(best) == k else limit_sq
+            if diff * diff <= worst_sq:
+                visit(far)
+
+        if k > 0:
+            visit(self.root)
+        return [point_index for _, point_index in sorted(best, key=lambda item: -item[0])]
+
+class GeoDAO:
+    """
+    Índice espacial em memória das coordenadas dos países.
+
+    Construído na primeira consulta a partir de country_geography e reconstruído
+    quando a versão dos dados de countries/country_geography muda.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version_token = None
+        self._countries: List[Dict[str, Any]] = []
+        self._by_code: Dict[str, Dict[str, Any]] = {}
+        self._tree: Optional[SphereKDTree] = None
+
+    def _ensure_index(self) -> None:
+        token = data_version_dao.getVersionToken(GEO_SOURCE_TABLES)
+        if self._tree is not None and token == self._version_token:
+            return
+        with self._lock:
+            if self._tree is not None and token == self._version_token:
+                return
+            self._build_index(token)
+
+    def _build_index(self, token: str) -> None:
+        query = (
+            select(Countries.country_code, Countries.name, CountryGeography.lat, CountryGeography.lng)
+            .join(CountryGeography, CountryGeography.country_code == Countries.country_code)
+            .where(CountryGeography.lat.is_not(None), CountryGeography.lng.is_not(None))
+            .order_by(Countries.country_code, CountryGeography.country_id)
+        )
+
+        def read_rows(read_engine):
+            with SessionLocal(bind=read_engine) as session:
+                return session.execute(query).all()
+        rows = run_read(read_rows)
+
+        countries = []
+        by_code = {}
+        for country_code, name, lat, lng in rows:
+            country_code = country_code.strip()
+            # Um ponto por país (o primeiro registro de geografia)
+            if country_code in by_code:
+                continue
+            country = {"country_code": country_code, "name": name, "lat": lat, "lng": lng}
+            by_code[country_code] = country
+            countries.append(country)
+
+        # Substituição atômica: consultas em andamento continuam com o índice anterior
+        self._countries = countries
+        self._by_code = by_code
+        self._tree = SphereKDTree([to_unit_vector(c["lat"], c["lng"]) for c in countries])
+        self._version_token = token
+        print(f"Índice geográfico construído: {len(countries)} países (versão {token})")
+
+    def resolveCenter(self, country_code: str = None, lat: float = None, lng: float = None) -> Dict[str, Any]:
+        """
+        Ponto de referência: coordenadas de um país ou lat/lng informados
+
+        Raises:
+            KeyError: se o país não tem coordenadas cadastradas
+            ValueError: se nem país nem lat/lng válidos foram informados
+        """
+        if country_code:
+            self._ensure_index()
+            country = self._by_code.get(country_code.strip().upper())
+            if country is None:
+                raise KeyError(f"País '{country_code}' não encontrado ou sem coordenadas")
+            return dict(country)
+        if lat is None or lng is None:
+            raise ValueError("Informe o país ou a latitude e a longitude do ponto de referência")
+        if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            raise ValueError("Latitude deve estar entre -90 e 90 e longitude entre -180 e 180")
+        return {"lat": lat, "lng": lng}
+
+    def getNearby(self, country_code: str = None, lat: float = None, lng: float = None,
+                  radius_km: float = None, k: int = None, include_self: bool = False) -> Dict[str, Any]:
+        """
+        Países próximos de um ponto, do mais próximo ao mais distante
+
+        Args:
+            country_code: País de referência (alternativa a lat/lng)
+            lat, lng: Ponto de referência em graus
+            radius_km: Distância máxima (km)
+            k: Número máximo de países (padrão DEFAULT_NEARBY_K quando não há raio)
+            include_self: Inclui o próprio país de referência no resultado
+
+        Returns:
+            Ponto de referência e lista de países com distance_km
+        """
+        if radius_km is not None and radius_km < 0:
+            raise ValueError("O raio deve ser maior ou igual a zero")
+        if k is not None and k <= 0:
+            raise ValueError("k deve ser maior que zero")
+        if radius_km is None and k is None:
+            k = DEFAULT_NEARBY_K
+
+        center = self.resolveCenter(country_code, lat, lng)
+        self._ensure_index()
+        countries, tree = self._countries, self._tree
+        target = to_unit_vector(center["lat"], center["lng"])
+        radius = km_to_chord(radius_km) if radius_km is not None else None
+        exclude = center.get("country_code") if not include_self else None
+
+        if k is None:
+            indices = tree.within(target, radius)
+        else:
+            # Um a mais para compensar o próprio país, removido em seguida
+            indices = tree.nearest(target, k + (1 if exclude else 0), radius)
+
+        results = []
+        for index in indices:
+            country = countries[index]
+            if country["country_code"] == exclude:
+                continue
+            results.append({
+                **country,
+                "distance_km": round(haversine_km(center["lat"], center["lng"], country["lat"], country["lng"]), 3),
+            })
+        results.sort(key=lambda item: item["distance_km"])
+        if k is not None:
+            results = results[:k]
+        return {"center": center, "radiusKm": radius_km, "k": k, "results": results}
+
+    def getCountryCodesWithin(self, value: Dict[str, Any]) -> List[str]:
+        """
+        Códigos dos países a até value["km"] do ponto de value (country ou lat/lng),
+        usado pelo operador de filtro WITHIN_KM dos relatórios
+        """
+        if not isinstance(value, dict) or value.get("km") is None:
+            raise ValueError('Filtro WITHIN_KM espera {"km": ..., "country": ...} ou {"km": ..., "lat": ..., "lng": ...}')
+        nearby = self.getNearby(
+            country_code=value.get("country"), lat=value.get("lat"), lng=value.get("lng"),
+            radius_km=float(value["km"]), include_self=True
+        )
+        return [country["country_code"] for country in nearby["results"]]
+
+# Instância compartilhada pelos controllers e pelo DAO de consultas
+geo_dao = GeoDAO()
@@ -0,0 +1,601 @@
+"""
+Execução de relatórios em memória (NumPy) sobre as tabelas pequenas de dimensão
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from .database import run_read
+from .dataVersionDAO import data_version_dao
+from .geoDAO import geo_dao
+import models.models as models_module
+
+try:
+    import numpy as np
+except ImportError:  # pacote opcional
+    np = None
+
+# Tabelas copiadas para a memória (poucos milhares de linhas no total)
+MEMORY_RESIDENT_TABLES = ["countries", "country_geography", "country_society", "languages", "currencies", "borders"]
+# Desliga o motor em memória (todos os relatórios vão para o Postgres)
+MEMORY_ENGINE_ENABLED = os.getenv('MEMORY_ENGINE', 'true').lower() == 'true'
+# Agregações calculadas em memória
+MEMORY_AGGREGATES = {"COUNT", "SUM", "AVG", "MIN", "MAX"}
+# Funções de filtro calculadas em memória; as demais funções conhecidas pelo banco levam o relatório ao Postgres
+MEMORY_FILTER_FUNCTIONS = {"UPPER", "LOWER", "TRIM", "ABS", "ROUND", "CEIL", "FLOOR"}
+DATABASE_FILTER_FUNCTIONS = {"LENGTH", "EXTRACT_YEAR", "EXTRACT_MONTH", "EXTRACT_DAY", "DATE_TRUNC_MONTH", "DATE_TRUNC_YEAR"}
+# Prefixo das colunas com a posição de cada texto na ordenação do banco (collation)
+RANK_COLUMN_PREFIX = "_rank_"
+
+class MemoryEngineUnsupported(Exception):
+    """Relatório fora do que o motor em memória atende: deve ser executado no banco"""
+
+class Vector:
+    """
+    Coluna em memória: valores, máscara de nulos, chave de ordenação e tipo (int, float ou str).
+
+    Para textos a chave é a posição do valor na ordenação do Postgres (dense_rank calculado
+    na carga), o que mantém ORDER BY, MIN e MAX iguais aos do banco; textos derivados
+    (ex.: UPPER) não têm chave.
+    """
+    __slots__ = ("values", "nulls", "keys", "kind")
+
+    def __init__(self, values, nulls, keys, kind: str):
+        self.values = values
+        self.nulls = nulls
+        self.keys = keys
+        self.kind = kind
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def take(self, indices) -> "Vector":
+        """
+        Linhas nas posições informadas; posição -1 (lado sem correspondência de um outer join) é nula
+        """
+        missing = indices < 0
+        if len(self.values) == 0:
+            keys = np.zeros(len(indices), dtype=self.keys.dtype) if self.keys is not None else None
+            return Vector(np.zeros(len(indices), dtype=self.values.dtype), np.ones(len(indices), dtype=bool), keys, self.kind)
+        safe = np.where(missing, 0, indices)
+        keys = self.keys[safe] if self.keys is not None else None
+        return Vector(self.values[safe], self.nulls[safe] | missing, keys, self.kind)
+
+    def sort_keys(self):
+        if self.keys is None:
+            raise MemoryEngineUnsupported("ordenação de texto calculado")
+        return self.keys
+
+    def to_list(self) -> List[Any]:
+        return [None if null else value for value, null in zip(self.values.tolist(), self.nulls.tolist())]
+
+class MemoryEngine:
+    """
+    Executa relatórios adhoc sobre cópias colunares (NumPy) das tabelas de dimensão.
+
+    A cópia é carregada na primeira consulta (ou no warmup) e recarregada quando a versão
+    dos dados dessas tabelas muda. Filtros, joins (hash join por ordenação), GROUP BY,
+    agregações, HAVING e ORDER BY são avaliados de forma vetorizada; qualquer recurso fora
+    desse subconjunto gera MemoryEngineUnsupported e o relatório segue para o Postgres.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version_token = None
+        self._tables: Dict[str, Dict[str, Vector]] = {}
+
+    @property
+    def available(self) -> bool:
+        return MEMORY_ENGINE_ENABLED and np is not None
+
+    def canExecute(self, base_table: str, joins: List) -> bool:
+        """
+        Verifica se todas as tabelas do relatório (base e joins) estão em memória
+        """
+        if not self.available or base_table not in MEMORY_RESIDENT_TABLES:
+            return False
+        for join_info in joins or []:
+            join_dict = join_info.model_dump() if hasattr(join_info, 'model_dump') else join_info
+            if join_dict.get("targetTable") not in MEMORY_RESIDENT_TABLES:
+                return False
+        return True
+
+    def warmup(self) -> Dict[str, Any]:
+        """
+        Carrega a cópia das tabelas (no processo master, antes do fork dos workers)
+        """
+        if not self.available:
+            return {"enabled": False}
+        tables = self._get_tables()
+        return {"enabled": True, "tables": {name: len(next(iter(columns.values()))) for name, columns in tables.items()}}
+
+    def _get_tables(self) -> Dict[str, Dict[str, Vector]]:
+        token = data_version_dao.getVersionToken(MEMORY_RESIDENT_TABLES)
+        tables = self._tables
+        if tables and token == self._version_token:
+            return tables
+        with self._lock:
+            if not self._tables or token != self._version_token:
+                self._tables = self._load_tables()
+                self._version_token = token
+                rows = sum(len(next(iter(columns.values()))) for columns in self._tables.values())
+                print(f"Tabelas de dimensão carregadas em memória: {len(self._tables)} tabelas, {rows} linhas (versão {token})")
+            return self._tables
+
+    def _load_tables(self) -> Dict[str, Dict[str, Vector]]:
+        return run_read(self._read_tables)
+
+    def _read_tables(self, read_engine) -> Dict[str, Dict[str, Vector]]:
+        models = {
+            model.__tablename__: model
+            for model in (getattr(models_module, name) for name in dir(models_module))
+            if hasattr(model, '__tablename__') and model.__tablename__ in MEMORY_RESIDENT_TABLES
+        }
+        tables = {}
+        with read_engine.connect() as conn:
+            for table_name in MEMORY_RESIDENT_TABLES:
+                table = models[table_name].__table__
+                kinds = {column.name: self._column_kind(column) for column in table.columns}
+                kinds = {name: kind for name, kind in kinds.items() if kind is not None}
+                text_columns = [name for name, kind in kinds.items() if kind == "str"]
+                query = select(
+                    *[table.c[name] for name in kinds],
+                    *[func.dense_rank().over(order_by=table.c[name]).label(f"{RANK_COLUMN_PREFIX}{name}") for name in text_columns]
+                )
+                rows = conn.execute(query).all()
+                columns = list(zip(*rows)) if rows else [()] * (len(kinds) + len(text_columns))
+                ranks = dict(zip(text_columns, columns[len(kinds):]))
+                tables[table_name] = {
+                    name: self._build_vector(values, kind, ranks.get(name))
+                    for (name, kind), values in zip(kinds.items(), columns)
+                }
+        return tables
+
+    def _column_kind(self, column) -> Optional[str]:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return None
+        if python_type is bool:
+            return None
+        if issubclass(python_type, int):
+            return "int"
+        if issubclass(python_type, float):
+            return "float"
+        if issubclass(python_type, str):
+            return "str"
+        return None
+
+    def _build_vector(self, values, kind: str, ranks=None) -> Vector:
+        nulls = np.array([value is None for value in values], dtype=bool)
+        if kind == "str":
+            data = np.array(["" if value is None else value for value in values], dtype=object)
+            keys = np.array([0 if rank is None else rank for rank in ranks], dtype=np.int64)
+            return Vector(data, nulls, keys, kind)
+        dtype = np.int64 if kind == "int" else np.float64
+        data = np.array([0 if value is None else value for value in values], dtype=dtype)
+        return Vector(data, nulls, data, kind)
+
+    def execute(self, base_table: str, attributes: List[str], joins: List,
+                group_by_attributes: List[str], aggregate_functions: List,
+                order_by_columns: List, filter_node: Optional[Dict[str, Any]],
+                limit: int = None, having: List = None) -> Tuple[List[str], List[tuple]]:
+        """
+        Executa o relatório em memória
+
+        Args:
+            (mesmos de ConsultaDAO.generateAdhocReportResult)
+            joins: Joins como dicionários, com joinType já normalizado (INNER, LEFT, RIGHT ou FULL)
+            filter_node: Filtros já normalizados (ver ConsultaDAO.normalizeFilters)
+
+        Returns:
+            Tuple com os nomes das colunas e as linhas (tuplas)
+
+        Raises:
+            MemoryEngineUnsupported: se o relatório usa algo que só o banco executa
+        """
+        tables = self._get_tables()
+        qualifiers, frame = self._join_frame(tables, base_table, joins)
+
+        def row_vector(attr: str) -> Vector:
+            qualifier, column_name = self._resolve(attr, base_table, qualifiers, tables)
+            return tables[qualifiers[qualifier]][column_name].take(frame[qualifier])
+
+        # WHERE
+        row_count = len(frame[base_table])
+        if filter_node:
+            mask = self._filter_mask(filter_node, row_vector, row_count)
+            frame = {qualifier: indices[mask] for qualifier, indices in frame.items()}
+            row_count = int(mask.sum())
+
+        # Colunas selecionadas, com os mesmos nomes da consulta SQL (repetidos ganham o sufixo _tabela)
+        output = []
+        column_names_count = {}
+        for attr in attributes:
+            qualifier, column_name = self._resolve(attr, base_table, qualifiers, tables)
+            name = column_name
+            if column_name in column_names_count:
+                name = f"{column_name}_{qualifier}"
+            column_names_count[column_name] = column_names_count.get(column_name, 0) + 1
+            output.append((name, (qualifier, column_name)))
+
+        aggregates = []
+        for agg in aggregate_functions or []:
+            agg_dict = agg.model_dump() if hasattr(agg, 'model_dump') else agg
+            if not agg_dict.get("function") or not agg_dict.get("attribute"):
+                continue
+            if not agg_dict.get("alias"):
+                raise MemoryEngineUnsupported("agregação sem alias")
+            aggregates.append(agg_dict)
+
+        if aggregates or group_by_attributes:
+            names, vectors, sort_vector, row_count = self._aggregate(
+                output, aggregates, group_by_attributes, having, base_table, qualifiers, tables, row_vector, row_count
+            )
+        else:
+            if having:
+                raise MemoryEngineUnsupported("HAVING sem agregação")
+            names = [name for name, _ in output]
+            vectors = [row_vector(f"{qualifier}.{column_name}") for _, (qualifier, column_name) in output]
+            sort_vector = row_vector
+
+        # ORDER BY e LIMIT
+        order = self._sort_order(order_by_columns, sort_vector, row_count)
+        if limit is not None:
+            order = order[:limit]
+        columns = [vector.take(order).to_list() for vector in vectors]
+        return names, list(zip(*columns))
+
+    def _join_frame(self, tables, base_table: str, joins: List) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """
+        Aplica os joins: o resultado é, para cada tabela/alias, o índice da linha de
+        origem em cada linha do relatório (-1 quando o outer join não encontrou par)
+        """
+        qualifiers = {base_table: base_table}
+        frame = {base_table: np.arange(len(next(iter(tables[base_table].values()))), dtype=np.int64)}
+        for join_dict in joins or []:
+            target_table = join_dict.get("targetTable")
+            qualifier = join_dict.get("alias") or target_table
+            if qualifier in qualifiers:
+                raise MemoryEngineUnsupported(f"tabela '{qualifier}' repetida no join")
+
+            source_qualifier, source_col = self._split(join_dict.get("sourceAttribute"), base_table)
+            if source_qualifier not in frame:
+                raise MemoryEngineUnsupported(f"join a partir de '{source_qualifier}', que ainda não está na consulta")
+            _, target_col = self._split(join_dict.get("targetAttribute"), target_table)
+            source_table = qualifiers[source_qualifier]
+            if source_col not in tables[source_table] or target_col not in tables[target_table]:
+                raise MemoryEngineUnsupported("coluna de join não carregada")
+
+            left = tables[source_table][source_col].take(frame[source_qualifier])
+            right = tables[target_table][target_col]
+            left_idx, right_idx = self._match(left, right)
+
+            join_type = join_dict.get("joinType")
+            if join_type in ("LEFT", "FULL"):
+                unmatched = np.setdiff1d(np.arange(len(left), dtype=np.int64), left_idx)
+                left_idx = np.concatenate([left_idx, unmatched])
+                right_idx = np.concatenate([right_idx, np.full(len(unmatched), -1, dtype=np.int64)])
+            if join_type in ("RIGHT", "FULL"):
+                unmatched = np.setdiff1d(np.arange(len(right), dtype=np.int64), right_idx)
+                left_idx = np.concatenate([left_idx, np.full(len(unmatched), -1, dtype=np.int64)])
+                right_idx = np.concatenate([right_idx, unmatched])
+
+            frame = {name: self._remap(indices, left_idx) for name, indices in frame.items()}
+            frame[qualifier] = right_idx
+            qualifiers[qualifier] = target_table
+        return qualifiers, frame
+
+    def _remap(self, indices, positions):
+        """
+        Índices de linha após o join: positions aponta para linhas do resultado anterior (-1 = sem par)
+        """
+        if len(indices) == 0:
+            return np.full(len(positions), -1, dtype=np.int64)
+        return np.where(positions < 0, -1, indices[np.where(positions < 0, 0, positions)])
+
+    def _match(self, left: Vector, right: Vector):
+        """
+        Pares (linha da esquerda, linha da direita) com chaves iguais e não nulas:
+        ordena as chaves da direita e localiza cada chave da esquerda por busca binária
+        """
+        if (left.kind == "str") != (right.kind == "str"):
+            raise MemoryEngineUnsupported("join entre colunas de tipos diferentes")
+        left_values, right_values = left.values, right.values
+        if left.kind != right.kind:
+            left_values, right_values = left_values.astype(np.float64), right_values.astype(np.float64)
+
+        valid = np.flatnonzero(~right.nulls)
+        order = valid[np.argsort(right_values[valid], kind="stable")]
+        sorted_keys = right_values[order]
+        low = np.searchsorted(sorted_keys, left_values, side="left")
+        high = np.searchsorted(sorted_keys, left_values, side="right")
+        counts = np.where(left.nulls, 0, high - low)
+
+        left_idx = np.repeat(np.arange(len(left_values), dtype=np.int64), counts)
+        starts = np.repeat(low, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return left_idx, order[starts + offsets].astype(np.int64)
+
+    def _split(self, attr: str, default_qualifier: str) -> Tuple[str, str]:
+        if "." in attr:
+            qualifier, column_name = attr.split(".")
+            return qualifier, column_name
+        return default_qualifier, attr
+
+    def _resolve(self, attr: str, base_table: str, qualifiers: Dict[str, str], tables) -> Tuple[str, str]:
+        """
+        Tabela/alias e coluna de um atributo. Atributos sem tabela só são resolvidos na
+        tabela base; nos demais casos a resolução do SQL depende da ordem dos joins
+        """
+        qualifier, column_name = self._split(attr, base_table)
+        if qualifier not in qualifiers:
+            raise MemoryEngineUnsupported(f"tabela '{qualifier}' fora dos joins do relatório")
+        if column_name not in tables[qualifiers[qualifier]]:
+            raise MemoryEngineUnsupported(f"coluna '{attr}' não carregada em memória")
+        return qualifier, column_name
+
+    def _filter_mask(self, node: Dict[str, Any], row_vector, row_count: int):
+        if "conditions" in node:
+            masks = [self._filter_mask(child, row_vector, row_count) for child in node["conditions"]]
+            if not masks:
+                return np.ones(row_count, dtype=bool)
+            return np.logical_or.reduce(masks) if node.get("logic") == "OR" else np.logical_and.reduce(masks)
+
+        vector = row_vector(node["attribute"])
+        function_name = (node.get("function") or "").upper()
+        if function_name:
+            vector = self._apply_function(vector, function_name)
+        return self._compare(vector, (node.get("operator") or "=").upper(), node.get("value"))
+
+    def _apply_function(self, vector: Vector, function_name: str) -> Vector:
+        if function_name in DATABASE_FILTER_FUNCTIONS:
+            raise MemoryEngineUnsupported(f"função '{function_name}'")
+        if function_name not in MEMORY_FILTER_FUNCTIONS:
+            # Como no SQL, funções desconhecidas são ignoradas
+            return vector
+        if (vector.kind == "str") != (function_name in ("UPPER", "LOWER", "TRIM")):
+            raise MemoryEngineUnsupported(f"função '{function_name}' em coluna do tipo {vector.kind}")
+        if vector.kind == "str":
+            transform = {"UPPER": str.upper, "LOWER": str.lower, "TRIM": lambda value: value.strip(" ")}[function_name]
+            values = np.array([transform(value) for value in vector.values], dtype=object)
+            return Vector(values, vector.nulls, None, "str")
+        if function_name == "ABS":
+            values = np.abs(vector.values)
+        elif vector.kind == "int":
+            values = vector.values
+        else:
+            values = {"ROUND": np.rint, "CEIL": np.ceil, "FLOOR": np.floor}[function_name](vector.values)
+        return Vector(values, vector.nulls, values, vector.kind)
+
+    def _coerce(self, value: Any, vector: Vector) -> Any:
+        """
+        Valor do filtro no tipo da coluna, como o Postgres converteria o literal
+        """
+        if vector.kind == "str":
+            if not isinstance(value, str):
+                raise MemoryEngineUnsupported("comparação de texto com valor não textual")
+            return value
+        if isinstance(value, bool):
+            raise MemoryEngineUnsupported("comparação numérica com booleano")
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            try:
+                return int(value) if vector.kind == "int" else float(value)
+            except ValueError:
+                raise MemoryEngineUnsupported(f"valor '{value}' inválido para coluna numérica")
+        raise MemoryEngineUnsupported(f"valor de filtro do tipo {type(value).__name__}")
+
+    def _compare(self, vector: Vector, operator: str, value: Any):
+        """
+        Máscara das linhas que atendem à condição; comparações com nulo são falsas, como no WHERE
+        """
+        present = ~vector.nulls
+        if value is None and operator in ("=", "!="):
+            # col = NULL / col != NULL viram IS NULL / IS NOT NULL no SQLAlchemy
+            return vector.nulls.copy() if operator == "=" else present
+        values = vector.values
+
+        if operator in ("=", "!=", ">", "<", ">=", "<="):
+            if vector.kind == "str" and operator not in ("=", "!="):
+                # A ordem de textos depende da collation do banco
+                raise MemoryEngineUnsupported("comparação de ordem entre textos")
+            target = self._coerce(value, vector)
+            result = {
+                "=": lambda: values == target, "!=": lambda: values != target,
+                ">": lambda: values > target, "<": lambda: values < target,
+                ">=": lambda: values >= target, "<=": lambda: values <= target,
+            }[operator]()
+            return np.asarray(result, dtype=bool) & present
+
+        if operator in ("LIKE", "ILIKE", "CONTAINS"):
+            if vector.kind != "str" or not isinstance(value, str):
+                raise MemoryEngineUnsupported(f"{operator} fora de colunas de texto")
+            if operator == "CONTAINS":
+                term = value.lower()
+                matches = [term in text.lower() for text in values]
+            else:
+                pattern = self._like_regex(value, operator == "ILIKE")
+                matches = [pattern.fullmatch(text) is not None for text in values]
+            return np.array(matches, dtype=bool) & present
+
+        if operator in ("IN", "NOT IN", "WITHIN_KM"):
+            if operator == "WITHIN_KM":
+                candidates = geo_dao.getCountryCodesWithin(value)
+            elif isinstance(value, str):
+                candidates = [item.strip() for item in value.split(",")]
+            elif isinstance(value, list):
+                candidates = value
+            else:
+                candidates = [value]
+            if any(item is None for item in candidates):
+                raise MemoryEngineUnsupported("lista com NULL")
+            candidates = [self._coerce(item, vector) for item in candidates]
+            member = np.isin(values, np.array(candidates, dtype=values.dtype if vector.kind == "str" else None))
+            return (~member if operator == "NOT IN" else member) & present
+
+        raise MemoryEngineUnsupported(f"operador '{operator}'")
+
+    def _like_regex(self, pattern: str, ignore_case: bool):
+        parts = []
+        escaped = False
+        for char in pattern:
+            if escaped:
+                parts.append(re.escape(char))
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == "%":
+                parts.append(".*")
+            elif char == "_":
+                parts.append(".")
+            else:
+                parts.append(re.escape(char))
+        return re.compile("".join(parts), re.DOTALL | (re.IGNORECASE if ignore_case else 0))
+
+    def _factorize(self, vector: Vector):
+        """
+        Código do grupo de cada linha (valores iguais, mesmo código; nulos formam um grupo) e o número de grupos
+        """
+        codes = np.zeros(len(vector), dtype=np.int64)
+        present = ~vector.nulls
+        uniques, inverse = np.unique(vector.sort_keys()[present], return_inverse=True)
+        codes[present] = inverse.reshape(-1)
+        codes[vector.nulls] = len(uniques)
+        return codes, len(uniques) + 1
+
+    def _aggregate(self, output, aggregates, group_by_attributes, having, base_table, qualifiers, tables, row_vector, row_count):
+        """
+        GROUP BY, agregações e HAVING
+
+        Returns:
+            (nomes das colunas, vetores por coluna com uma linha por grupo, função que
+            resolve atributos de ordenação para vetores por grupo, número de grupos)
+        """
+        group_keys = []
+        for attr in group_by_attributes or []:
+            if any(agg["alias"] == attr for agg in aggregates):
+                raise MemoryEngineUnsupported("GROUP BY por alias de agregação")
+            group_keys.append(self._resolve(attr, base_table, qualifiers, tables))
+        for _, key in output:
+            if key not in group_keys:
+                # Colunas dependentes da chave primária agrupada são aceitas pelo Postgres
+                raise MemoryEngineUnsupported("coluna selecionada fora do GROUP BY")
+
+        groups = np.zeros(row_count, dtype=np.int64)
+        for qualifier, column_name in group_keys:
+            codes, cardinality = self._factorize(row_vector(f"{qualifier}.{column_name}"))
+            _, groups = np.unique(groups * cardinality + codes, return_inverse=True)
+            groups = groups.reshape(-1)
+        group_count = int(groups.max()) + 1 if row_count else 0
+        if not group_keys:
+            # Agregação sem GROUP BY: uma linha, mesmo sem registros
+            group_count = 1
+        first_rows = np.full(group_count, -1, dtype=np.int64)
+        first_rows[groups[::-1]] = np.arange(row_count, dtype=np.int64)[::-1]
+
+        def group_vector(attr: str) -> Vector:
+            key = self._resolve(attr, base_table, qualifiers, tables)
+            if key not in group_keys:
+                raise MemoryEngineUnsupported(f"'{attr}' fora do GROUP BY")
+            return row_vector(attr).take(first_rows)
+
+        aggregated = {}
+        for agg in aggregates:
+            aggregated[agg["alias"]] = self._aggregate_vector(agg["function"], row_vector(agg["attribute"]), groups, group_count)
+
+        names = [name for name, _ in output] + [agg["alias"] for agg in aggregates]
+        vectors = [group_vector(f"{qualifier}.{column_name}") for _, (qualifier, column_name) in output]
+        vectors += [aggregated[agg["alias"]] for agg in aggregates]
+
+        if having:
+            mask = None
+            for having_info in having:
+                having_dict = having_info.model_dump() if hasattr(having_info, 'model_dump') else having_info
+                attr = having_dict["attribute"]
+                if having_dict.get("function"):
+                    vector = self._aggregate_vector(having_dict["function"], row_vector(attr), groups, group_count)
+                elif attr in aggregated:
+                    vector = aggregated[attr]
+                else:
+                    raise MemoryEngineUnsupported(f"HAVING em '{attr}'")
+                condition = self._compare(vector, (having_dict.get("operator") or "=").upper(), having_dict["value"])
+                if mask is None:
+                    mask = condition
+                elif having_dict.get("logic", "AND") == "OR":
+                    mask = mask | condition
+                else:
+                    mask = mask & condition
+            kept = np.flatnonzero(mask)
+            vectors = [vector.take(kept) for vector in vectors]
+            first_rows = first_rows[kept]
+            aggregated = {alias: vector.take(kept) for alias, vector in aggregated.items()}
+            group_count = len(kept)
+
+        def sort_vector(attr: str) -> Vector:
+            return aggregated[attr] if attr in aggregated else group_vector(attr)
+
+        return names, vectors, sort_vector, group_count
+
+    def _aggregate_vector(self, function_name: str, vector: Vector, groups, group_count: int) -> Vector:
+        function_name = function_name.upper()
+        if function_name not in MEMORY_AGGREGATES:
+            raise MemoryEngineUnsupported(f"agregação '{function_name}'")
+        present = ~vector.nulls
+        counts = np.bincount(groups[present], minlength=group_count)[:group_count]
+        empty = counts == 0
+
+        if function_name == "COUNT":
+            return Vector(counts.astype(np.int64), np.zeros(group_count, dtype=bool), counts, "int")
+        if function_name in ("SUM", "AVG"):
+            if vector.kind == "str":
+                raise MemoryEngineUnsupported(f"{function_name} de texto")
+            totals = np.zeros(group_count, dtype=vector.values.dtype)
+            np.add.at(totals, groups[present], vector.values[present])
+            if function_name == "SUM":
+                return Vector(totals, empty, totals, vector.kind)
+            averages = totals / np.where(empty, 1, counts)
+            return Vector(averages, empty, averages, "float")
+
+        # MIN/MAX pela chave de ordenação (para textos, a ordem do banco)
+        keys = vector.sort_keys()
+        if function_name == "MIN":
+            best = np.full(group_count, np.iinfo(np.int64).max if keys.dtype.kind == "i" else np.inf, dtype=keys.dtype)
+            np.minimum.at(best, groups[present], keys[present])
+        else:
+            best = np.full(group_count, np.iinfo(np.int64).min if keys.dtype.kind == "i" else -np.inf, dtype=keys.dtype)
+            np.maximum.at(best, groups[present], keys[present])
+        if vector.kind != "str":
+            best = np.where(empty, 0, best).astype(vector.values.dtype)
+            return Vector(best, empty, best, vector.kind)
+        # Textos: o valor de cada grupo é o de uma linha com a chave escolhida
+        rows = np.flatnonzero(present)
+        chosen = np.full(group_count, -1, dtype=np.int64)
+        winners = rows[keys[rows] == best[groups[rows]]]
+        chosen[groups[winners]] = winners
+        return vector.take(chosen)
+
+    def _sort_order(self, order_by_columns: List, sort_vector, row_count: int):
+        """
+        Permutação das linhas pela ordenação do relatório (nulos por último em ASC e primeiro em DESC, como no Postgres)
+        """
+        sort_keys = []
+        for order_info in order_by_columns or []:
+            order_dict = order_info.model_dump() if hasattr(order_info, 'model_dump') else order_info
+            attr = order_dict.get("attribute") or order_dict.get("column") or ""
+            if not attr:
+                continue
+            descending = (order_dict.get("direction") or "ASC").upper() == "DESC"
+            vector = sort_vector(attr)
+            keys = vector.sort_keys()
+            sort_keys.append((~vector.nulls if descending else vector.nulls, -keys if descending else keys))
+        if not sort_keys:
+            return np.arange(row_count, dtype=np.int64)
+        # lexsort usa a última chave como principal
+        return np.lexsort([key for pair in reversed(sort_keys) for key in reversed(pair)])
+
+# Instância compartilhada pelo DAO de consultas
+memory_engine = MemoryEngine()
@@ -0,0 +1,183 @@
+"""
+Backend OLAP de relatórios: DuckDB embutido sobre snapshots Parquet das tabelas
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List
+
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from sqlalchemy.sql import compiler
+
+from .dataVersionDAO import data_version_dao
+from .resultBuffer import ResultBuffer
+
+try:
+    import duckdb
+except ImportError:  # pacote opcional
+    duckdb = None
+
+# Diretório dos snapshots gravados por BD/pos_carga.py (export_parquet_snapshots)
+OLAP_SNAPSHOT_DIR = os.getenv(
+    'OLAP_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'olap_snapshots')
+)
+OLAP_MANIFEST_FILE = 'manifest.json'
+# No modo automático, relatórios agregados que leem pelo menos essas linhas vão para o DuckDB
+OLAP_MIN_SCAN_ROWS = int(os.getenv('OLAP_MIN_SCAN_ROWS', '200000'))
+# Threads do DuckDB por consulta
+OLAP_THREADS = int(os.getenv('OLAP_THREADS', '4'))
+# Linhas buscadas por vez do resultado do DuckDB
+OLAP_FETCH_SIZE = 5000
+
+class OlapCompiler(PGCompiler):
+    """
+    Compilador do Postgres que renderiza strings no padrão SQL (só aspas duplicadas),
+    sem as barras invertidas duplicadas do driver: é o formato que o DuckDB espera
+    """
+    def render_literal_value(self, value, type_):
+        return compiler.SQLCompiler.render_literal_value(self, value, type_)
+
+class OlapDialect(PGDialect_psycopg2):
+    """
+    Dialeto do Postgres usado para compilar o SQL executado no DuckDB; com paramstyle
+    named o % dos literais não é escapado como %%
+    """
+    statement_compiler = OlapCompiler
+
+OLAP_DIALECT = OlapDialect(paramstyle="named")
+
+class OlapDAO:
+    """
+    Executa o SQL dos relatórios no DuckDB, com uma view por tabela apontando para o
+    snapshot Parquet exportado ao fim da última carga: agregações pesadas rodam em um
+    motor colunar vetorizado, sem consumir conexões nem CPU do Postgres.
+
+    O manifest do diretório registra a versão dos dados de cada snapshot; o modo
+    automático só usa snapshots com a mesma versão do banco.
+    """
+    def __init__(self, snapshot_dir: str = OLAP_SNAPSHOT_DIR):
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        # Manifest em cache: (mtime do arquivo, conteúdo)
+        self._manifest = (None, {})
+
+    @property
+    def available(self) -> bool:
+        return duckdb is not None and bool(self.getManifest())
+
+    def getManifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshots disponíveis: {tabela: {"rows", "version", "exported_at"}}
+        """
+        path = os.path.join(self.snapshot_dir, OLAP_MANIFEST_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        with self._lock:
+            if self._manifest[0] != mtime:
+                with open(path, encoding='utf-8') as file:
+                    tables = json.load(file).get('tables', {})
+                # Só tabelas cujo arquivo existe
+                tables = {
+                    name: info for name, info in tables.items()
+                    if os.path.exists(os.path.join(self.snapshot_dir, f"{name}.parquet"))
+                }
+                self._manifest = (mtime, tables)
+            return self._manifest[1]
+
+    def getStatus(self) -> Dict[str, Any]:
+        """
+        Situação dos snapshots (linhas, versão exportada e versão atual no banco)
+        """
+        manifest = self.getManifest()
+        return {
+            "available": duckdb is not None,
+            "snapshotDir": self.snapshot_dir,
+            "minScanRows": OLAP_MIN_SCAN_ROWS,
+            "tables": {
+                name: {**info, "currentVersion": data_version_dao.getVersion(name),
+                       "fresh": info.get("version") == data_version_dao.getVersion(name)}
+                for name, info in sorted(manifest.items())
+            },
+        }
+
+    def isFresh(self, tables: List[str]) -> bool:
+        """
+        Verifica se todas as tabelas têm snapshot na versão atual dos dados
+        """
+        manifest = self.getManifest()
+        return all(
+            table in manifest and manifest[table].get("version") == data_version_dao.getVersion(table)
+            for table in set(tables)
+        )
+
+    def estimateScanRows(self, tables: List[str]) -> int:
+        manifest = self.getManifest()
+        return sum(manifest.get(table, {}).get("rows", 0) for table in set(tables))
+
+    def shouldUse(self, tables: List[str], aggregated: bool) -> bool:
+        """
+        Heurística do modo automático: relatório agregado, snapshots atualizados
+        e volume lido acima de OLAP_MIN_SCAN_ROWS
+        """
+        if not aggregated or not self.available or not self.isFresh(tables):
+            return False
+        return self.estimateScanRows(tables) >= OLAP_MIN_SCAN_ROWS
+
+    def compileQuery(self, query) -> str:
+        """
+        SQL da consulta com os valores embutidos, para execução no DuckDB
+        """
+        return str(query.compile(dialect=OLAP_DIALECT, compile_kwargs={"literal_binds": True}))
+
+    def execute(self, query, tables: List[str]) -> ResultBuffer:
+        """
+        Executa a consulta do relatório no DuckDB
+
+        Args:
+            query: Select do relatório (ver ConsultaDAO.buildAdhocQuery)
+            tables: Tabelas lidas pela consulta
+
+        Returns:
+            Buffer com o resultado
+
+        Raises:
+            ValueError: se o DuckDB não está instalado ou falta o snapshot de alguma tabela
+        """
+        if duckdb is None:
+            raise ValueError("O backend OLAP requer o pacote 'duckdb'")
+        manifest = self.getManifest()
+        missing = sorted(set(tables) - set(manifest))
+        if missing:
+            raise ValueError(f"Sem snapshot Parquet para: {', '.join(missing)} (execute BD/pos_carga.py --snapshots)")
+
+        # Conexão própria por consulta: conexões DuckDB não são compartilhadas entre threads
+        conn = duckdb.connect(database=':memory:')
+        try:
+            conn.execute(f"SET threads = {OLAP_THREADS}")
+            # Ordem dos NULLs do Postgres (últimos no ASC, primeiros no DESC); o padrão do DuckDB
+            # os põe por último nas duas direções e ORDER BY ... DESC LIMIT n mudaria de linhas
+            conn.execute("SET default_null_order = 'nulls_last_on_asc_first_on_desc'")
+            for table in sorted(set(tables)):
+                path = os.path.join(self.snapshot_dir, f"{table}.parquet").replace("'", "''")
+                conn.execute(f'CREATE VIEW "{table}" AS SELECT * FROM read_parquet(\'{path}\')')
+            cursor = conn.execute(self.compileQuery(query))
+            buffer = ResultBuffer([column[0] for column in cursor.description], engine="olap")
+            try:
+                while True:
+                    rows = cursor.fetchmany(OLAP_FETCH_SIZE)
+                    if not rows:
+                        break
+                    buffer.append_rows(rows)
+            except Exception:
+                buffer.close()
+                raise
+            return buffer
+        finally:
+            conn.close()
+
+# Instância compartilhada pelo DAO de consultas e pelos controllers
+olap_dao = OlapDAO()
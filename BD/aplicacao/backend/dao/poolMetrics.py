@@ -0,0 +1,222 @@
+"""
+Instrumentação e dimensionamento adaptativo do pool de conexões
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Limites superiores (ms) dos buckets do histograma de espera por conexão
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+class PoolMetrics:
+    """
+    Contadores do pool: checkouts, timeouts, histograma do tempo de espera na fila
+    e, separado dele, o tempo de abertura de conexões novas
+    """
+    def __init__(self, window_size: int = 1000):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        # Um bucket a mais para esperas acima do maior limite
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        # Janela das esperas mais recentes, usada pelo modo adaptativo
+        self.recent_waits_ms = deque(maxlen=window_size)
+        self.connects = 0
+        self.total_connect_ms = 0.0
+        self.max_connect_ms = 0.0
+
+    def record_checkout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.wait_histogram[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.recent_waits_ms.append(wait_ms)
+
+    def record_connect(self, connect_ms: float) -> None:
+        with self._lock:
+            self.connects += 1
+            self.total_connect_ms += connect_ms
+            self.max_connect_ms = max(self.max_connect_ms, connect_ms)
+
+    def record_timeout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.recent_waits_ms.append(wait_ms)
+
+    def recent_percentile(self, percentile: float) -> float:
+        """
+        Percentil (0-100) das esperas recentes, em ms
+        """
+        with self._lock:
+            waits = sorted(self.recent_waits_ms)
+        if not waits:
+            return 0.0
+        index = min(len(waits) - 1, int(len(waits) * percentile / 100))
+        return waits[index]
+
+    def reset_window(self) -> None:
+        """
+        Descarta a janela recente (após um ajuste, para medir o efeito do novo tamanho)
+        """
+        with self._lock:
+            self.recent_waits_ms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bucket}ms" for bucket in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait_ms / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_ms,
+                "wait_histogram": dict(zip(labels, self.wait_histogram)),
+                "connects": self.connects,
+                "avg_connect_ms": self.total_connect_ms / self.connects if self.connects else 0.0,
+                "max_connect_ms": self.max_connect_ms,
+            }
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mede o tempo de espera de cada checkout e, opcionalmente,
+    ajusta o max_overflow entre limites configurados conforme a espera observada.
+
+    A espera conta só o tempo na fila do pool: quando o checkout abre uma conexão
+    nova (overflow), o tempo de conexão é descontado e registrado à parte, para o
+    modo adaptativo reagir a disputa por conexões e não à latência do banco.
+    """
+    def __init__(self, creator, **kw):
+        super().__init__(creator, **kw)
+        self.metrics = PoolMetrics()
+        self.adaptive = False
+        self.min_overflow = 0
+        self.max_overflow_limit = self._max_overflow
+        self.target_wait_ms = 50.0
+        self.adjust_interval = 10.0
+        self._adjust_lock = threading.Lock()
+        self._last_adjust = time.monotonic()
+        self.adjustments: List[Dict[str, Any]] = []
+        # Checkout em andamento na thread: o _do_get do QueuePool chama a si mesmo
+        self._checkout_state = threading.local()
+
+    def configure_adaptive(self, enabled: bool, min_overflow: int, max_overflow_limit: int,
+                           target_wait_ms: float, adjust_interval: float) -> None:
+        """
+        Configura o modo adaptativo (create_engine não repassa argumentos extras ao pool)
+
+        Args:
+            enabled: Ativa o ajuste automático do max_overflow
+            min_overflow / max_overflow_limit: Limites do ajuste
+            target_wait_ms: p95 de espera acima do qual o pool cresce
+            adjust_interval: Intervalo mínimo (s) entre ajustes
+        """
+        self.adaptive = enabled
+        self.min_overflow = min_overflow
+        self.max_overflow_limit = max(max_overflow_limit, min_overflow)
+        self.target_wait_ms = target_wait_ms
+        self.adjust_interval = adjust_interval
+        self._max_overflow = min(max(self._max_overflow, self.min_overflow), self.max_overflow_limit)
+
+    def recreate(self):
+        # Pool recriado (ex.: engine.dispose()) mantém as mesmas configurações de instrumentação
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        pool.adaptive = self.adaptive
+        pool.min_overflow = self.min_overflow
+        pool.max_overflow_limit = self.max_overflow_limit
+        pool.target_wait_ms = self.target_wait_ms
+        pool.adjust_interval = self.adjust_interval
+        pool.adjustments = self.adjustments
+        pool._max_overflow = self._max_overflow
+        return pool
+
+    def _do_get(self):
+        state = self._checkout_state
+        if getattr(state, "active", False):
+            return super()._do_get()
+        state.active = True
+        state.connect_ms = 0.0
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout((time.perf_counter() - started) * 1000 - state.connect_ms)
+            self._maybe_adjust()
+            raise
+        finally:
+            state.active = False
+        self.metrics.record_checkout((time.perf_counter() - started) * 1000 - state.connect_ms)
+        self._maybe_adjust()
+        return connection
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            connect_ms = (time.perf_counter() - started) * 1000
+            self.metrics.record_connect(connect_ms)
+            state = self._checkout_state
+            if getattr(state, "active", False):
+                state.connect_ms += connect_ms
+
+    def _maybe_adjust(self) -> None:
+        """
+        Cresce o overflow quando o p95 de espera passa do alvo e reduz quando
+        não há espera e o overflow está ocioso
+        """
+        if not self.adaptive or not self._adjust_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._last_adjust >= self.adjust_interval:
+                self._last_adjust = now
+                self._adjust_overflow()
+        finally:
+            self._adjust_lock.release()
+
+    def _adjust_overflow(self) -> None:
+        p95_wait = self.metrics.recent_percentile(95)
+        current = self._max_overflow
+        if p95_wait > self.target_wait_ms and current < self.max_overflow_limit:
+            new_value = min(self.max_overflow_limit, max(current + 1, int(current * 1.5)))
+        elif p95_wait < self.target_wait_ms / 10 and self.overflow() < current // 2 and current > self.min_overflow:
+            new_value = max(self.min_overflow, current - max(1, current // 4))
+        else:
+            return
+
+        self._max_overflow = new_value
+        self.metrics.reset_window()
+        self.adjustments.append({"at": time.time(), "from": current, "to": new_value, "p95_wait_ms": p95_wait})
+        del self.adjustments[:-20]
+        print(f"Pool de conexões ajustado: max_overflow {current} -> {new_value} (p95 de espera {p95_wait:.1f}ms)")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estado atual do pool e métricas acumuladas
+        """
+        overflow_in_use = max(self.overflow(), 0)
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow_in_use": overflow_in_use,
+            "max_overflow": self._max_overflow,
+            "timeout_s": self.timeout(),
+            "adaptive": {
+                "enabled": self.adaptive,
+                "min_overflow": self.min_overflow,
+                "max_overflow_limit": self.max_overflow_limit,
+                "target_wait_ms": self.target_wait_ms,
+                "recent_p95_wait_ms": self.metrics.recent_percentile(95),
+                "adjustments": list(self.adjustments),
+            },
+            **self.metrics.snapshot(),
+        }
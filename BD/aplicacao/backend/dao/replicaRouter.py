@@ -0,0 +1,127 @@
+"""
+Roteamento de leituras para réplicas do banco com health check e fallback para o primário
+"""
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Any, List
+
+from sqlalchemy import text
+
+# Estratégias de balanceamento suportadas
+BALANCING_STRATEGIES = {"round_robin", "least_connections"}
+
+class ReplicaRouter:
+    """
+    Escolhe a engine usada para leituras (relatórios e metadados).
+
+    Réplicas são verificadas periodicamente com SELECT 1 em uma thread de fundo;
+    réplicas com falha saem do rodízio até voltarem a responder. Sem réplicas
+    saudáveis, as leituras vão para o primário.
+    """
+    def __init__(self, primary_engine, replica_engines: List[Any], strategy: str = "round_robin",
+                 health_check_interval: float = 5.0):
+        strategy = (strategy or "round_robin").lower()
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(f"Estratégia de balanceamento '{strategy}' não suportada")
+
+        self.primary_engine = primary_engine
+        self.replicas = [
+            {"engine": replica, "healthy": True, "last_error": None, "last_check": None, "failures": 0}
+            for replica in replica_engines
+        ]
+        self.strategy = strategy
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._health_thread = None
+        self._health_thread_pid = None
+
+    def get_read_engine(self):
+        """
+        Retorna a engine de uma réplica saudável, ou o primário se não houver nenhuma
+        """
+        if not self.replicas:
+            return self.primary_engine
+
+        self._ensure_health_thread()
+
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica["healthy"]]
+        if not healthy:
+            return self.primary_engine
+
+        if self.strategy == "least_connections":
+            chosen = min(healthy, key=lambda replica: replica["engine"].pool.checkedout())
+        else:
+            chosen = healthy[next(self._round_robin) % len(healthy)]
+        return chosen["engine"]
+
+    def mark_unhealthy(self, engine, error: Exception) -> None:
+        """
+        Retira uma réplica do rodízio após uma falha de conexão (o health check a recoloca)
+        """
+        with self._lock:
+            for replica in self.replicas:
+                if replica["engine"] is engine:
+                    replica["healthy"] = False
+                    replica["failures"] += 1
+                    replica["last_error"] = str(error)
+                    print(f"Réplica {engine.url.render_as_string(hide_password=True)} marcada como indisponível: {error}")
+
+    def is_replica(self, engine) -> bool:
+        return any(replica["engine"] is engine for replica in self.replicas)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Estado das réplicas para diagnóstico
+        """
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "replicas": [
+                    {
+                        "url": replica["engine"].url.render_as_string(hide_password=True),
+                        "healthy": replica["healthy"],
+                        "failures": replica["failures"],
+                        "last_error": replica["last_error"],
+                        "last_check": replica["last_check"],
+                        "checked_out": replica["engine"].pool.checkedout(),
+                    }
+                    for replica in self.replicas
+                ],
+            }
+
+    def _ensure_health_thread(self) -> None:
+        # Threads não sobrevivem a fork: cada processo worker inicia a sua
+        if self._health_thread_pid == os.getpid() and self._health_thread and self._health_thread.is_alive():
+            return
+        with self._lock:
+            if self._health_thread_pid == os.getpid() and self._health_thread and self._health_thread.is_alive():
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="replica-health", daemon=True)
+            self._health_thread_pid = os.getpid()
+            self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        while True:
+            for replica in self.replicas:
+                self._check_replica(replica)
+            time.sleep(self.health_check_interval)
+
+    def _check_replica(self, replica: Dict[str, Any]) -> None:
+        try:
+            with replica["engine"].connect() as conn:
+                conn.execute(text("SELECT 1"))
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+
+        with self._lock:
+            if healthy and not replica["healthy"]:
+                print(f"Réplica {replica['engine'].url.render_as_string(hide_password=True)} disponível novamente")
+            replica["healthy"] = healthy
+            replica["last_check"] = time.time()
+            if error:
+                replica["last_error"] = error
@@ -0,0 +1,191 @@
+"""
+Materialização de resultados de relatórios com orçamento de memória e spill para disco
+"""
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List
+
+# Bytes (estimados) que um único relatório pode manter em memória antes de gravar o excedente em disco
+REPORT_MEMORY_BUDGET_BYTES = int(os.getenv('REPORT_MEMORY_BUDGET_MB', '32')) * 1024 * 1024
+# Bytes somados de todos os relatórios em andamento no processo (worker)
+PROCESS_MEMORY_BUDGET_BYTES = int(os.getenv('REPORT_PROCESS_MEMORY_BUDGET_MB', '256')) * 1024 * 1024
+# Tamanho máximo (memória + disco) de um resultado; acima disso o relatório é rejeitado
+REPORT_MAX_RESULT_BYTES = int(os.getenv('REPORT_MAX_RESULT_MB', '512')) * 1024 * 1024
+# Diretório dos arquivos temporários de spill (padrão: diretório temporário do sistema)
+REPORT_SPILL_DIR = os.getenv('REPORT_SPILL_DIR') or None
+# Linhas amostradas por bloco para estimar o tamanho em memória
+SIZE_SAMPLE_ROWS = 50
+
+class ResultTooLargeError(ValueError):
+    """Resultado do relatório acima do limite máximo configurado"""
+
+class ProcessMemoryBudget:
+    """
+    Orçamento de memória compartilhado pelos relatórios em andamento no processo
+    """
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.reserved_bytes = 0
+        self.spilled_reports = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        """
+        Reserva size bytes se couberem no orçamento; não bloqueia
+        """
+        with self._lock:
+            if self.reserved_bytes + size > self.limit_bytes:
+                return False
+            self.reserved_bytes += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.reserved_bytes = max(0, self.reserved_bytes - size)
+
+    def record_spill(self) -> None:
+        with self._lock:
+            self.spilled_reports += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit_bytes": self.limit_bytes,
+                "reserved_bytes": self.reserved_bytes,
+                "spilled_reports": self.spilled_reports,
+            }
+
+process_budget = ProcessMemoryBudget(PROCESS_MEMORY_BUDGET_BYTES)
+
+def estimate_rows_size(rows: List[tuple]) -> int:
+    """
+    Estimativa do tamanho em memória de um bloco de linhas, a partir de uma amostra
+    """
+    if not rows:
+        return 0
+    step = max(1, len(rows) // SIZE_SAMPLE_ROWS)
+    sample = rows[::step]
+    sample_size = 0
+    for row in sample:
+        # Tupla + ponteiros + cada valor (texto pelo tamanho, demais como objetos pequenos)
+        sample_size += 56 + 8 * len(row)
+        for value in row:
+            sample_size += 49 + len(value) if isinstance(value, str) else 32
+    return sample_size * len(rows) // len(sample)
+
+class ResultBuffer:
+    """
+    Linhas de um relatório: mantidas em memória até o orçamento do relatório
+    (ou do processo) e, a partir daí, gravadas em um arquivo temporário.
+
+    Use como context manager (ou chame close) para liberar a reserva de memória
+    e remover o arquivo de spill.
+    """
+    def __init__(self, columns: List[str], memory_budget: int = None, max_bytes: int = None,
+                 budget: ProcessMemoryBudget = None, engine: str = "postgres"):
+        self.columns = columns
+        # Motor que produziu as linhas: postgres, memory ou olap
+        self.engine = engine
+        self.memory_budget = REPORT_MEMORY_BUDGET_BYTES if memory_budget is None else memory_budget
+        self.max_bytes = REPORT_MAX_RESULT_BYTES if max_bytes is None else max_bytes
+        self.budget = budget or process_budget
+        self.rows: List[tuple] = []
+        self.row_count = 0
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.spilled_rows = 0
+        self._spill_file = None
+        self._close_lock = threading.Lock()
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill_file is not None
+
+    @property
+    def estimated_bytes(self) -> int:
+        return self.memory_bytes + self.spilled_bytes
+
+    def append_rows(self, rows: List[tuple]) -> None:
+        """
+        Adiciona um bloco de linhas, em memória se couber no orçamento, senão no arquivo de spill
+
+        Raises:
+            ResultTooLargeError: se o resultado passar do tamanho máximo
+        """
+        if not rows:
+            return
+        size = estimate_rows_size(rows)
+        if self.estimated_bytes + size > self.max_bytes:
+            raise ResultTooLargeError(
+                f"O resultado do relatório passa do limite de {self.max_bytes // (1024 * 1024)} MB "
+                f"(mais de {self.row_count + len(rows)} linhas). Reduza o limite de linhas, "
+                f"adicione filtros ou use a exportação de relatórios."
+            )
+
+        self.row_count += len(rows)
+        # Depois do primeiro spill, a ordem das linhas exige que o restante também vá para o disco
+        if not self.spilled and self.memory_bytes + size <= self.memory_budget and self.budget.reserve(size):
+            self.rows.extend(rows)
+            self.memory_bytes += size
+            return
+
+        if not self.spilled:
+            self._spill_file = tempfile.TemporaryFile(prefix="report_spill_", dir=REPORT_SPILL_DIR)
+            self.budget.record_spill()
+        pickle.dump(rows, self._spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spilled_bytes += size
+        self.spilled_rows += len(rows)
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[List[tuple]]:
+        """
+        Percorre as linhas em blocos, primeiro as da memória e depois as do disco
+        """
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+        if self._spill_file is None:
+            return
+        self._spill_file.flush()
+        self._spill_file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._spill_file)
+            except EOFError:
+                return
+
+    def all_rows(self) -> List[tuple]:
+        """
+        Todas as linhas em uma lista; só para resultados que couberam no orçamento de memória
+
+        Raises:
+            ResultTooLargeError: se parte das linhas foi para o disco (trazê-las de volta
+                ignoraria o orçamento; use iter_batches)
+        """
+        if self.spilled:
+            raise ResultTooLargeError(
+                f"O resultado do relatório passa do orçamento de memória de "
+                f"{self.memory_budget // (1024 * 1024)} MB ({self.row_count} linhas). Reduza o limite "
+                f"de linhas, adicione filtros ou use a exportação de relatórios."
+            )
+        return self.rows
+
+    def close(self) -> None:
+        """
+        Libera a reserva de memória e remove o arquivo de spill; pode ser chamado mais de uma vez
+        (ex.: pelo fim do streaming e pela tarefa de fundo da resposta)
+        """
+        with self._close_lock:
+            self.budget.release(self.memory_bytes)
+            self.memory_bytes = 0
+            self.rows = []
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
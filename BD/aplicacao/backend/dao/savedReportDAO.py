@@ -0,0 +1,246 @@
+"""
+Relatórios salvos executados por prepared statements do PostgreSQL
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+from sqlalchemy.dialects import postgresql
+
+from .consultaDAO import PARAMETER_BIND_PREFIX, PARAMETER_PLACEHOLDER_PATTERN, REPORT_FETCH_SIZE
+from .database import run_read
+from .resultBuffer import ResultBuffer
+
+# Arquivo onde as definições dos relatórios salvos são persistidas
+SAVED_REPORTS_FILE = os.getenv(
+    'SAVED_REPORTS_FILE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'saved_reports.json')
+)
+
+# Dialeto usado para compilar a consulta com parâmetros posicionais ($1, $2, ...) do PREPARE
+PREPARE_DIALECT = postgresql.psycopg2.dialect(paramstyle='numeric_dollar')
+
+class SavedReportDAO:
+    def __init__(self, consulta_dao):
+        self.consulta_dao = consulta_dao
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._file_mtime = None
+        # Consulta compilada por relatório: nome -> (versão, statement, sql, nomes dos parâmetros posicionais, valores fixos)
+        self._compiled = {}
+
+    def listSavedReports(self) -> List[Dict[str, Any]]:
+        """
+        Lista as definições de relatórios salvos
+        """
+        with self._lock:
+            self._reload_if_changed()
+            return [dict(definition) for _, definition in sorted(self._reports.items())]
+
+    def getSavedReport(self, name: str) -> Dict[str, Any]:
+        """
+        Retorna a definição de um relatório salvo
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if name not in self._reports:
+                raise KeyError(f"Relatório salvo '{name}' não encontrado")
+            return dict(self._reports[name])
+
+    def saveReport(self, name: str, report: Dict[str, Any], parameters: List[str],
+                   description: str = None) -> Dict[str, Any]:
+        """
+        Cria ou substitui a definição de um relatório salvo
+
+        Args:
+            name: Nome do relatório
+            report: Parâmetros do relatório (argumentos de buildAdhocQuery); valores de
+                filtro ":nome" são placeholders para os parâmetros informados na execução
+            parameters: Nomes dos parâmetros aceitos
+            description: Descrição opcional
+
+        Returns:
+            Definição salva
+        """
+        if not name or not name.replace('_', '').replace('-', '').isalnum():
+            raise ValueError("Nome do relatório deve conter apenas letras, números, '_' e '-'")
+
+        for parameter in parameters:
+            if not PARAMETER_PLACEHOLDER_PATTERN.match(f":{parameter}"):
+                raise ValueError(f"Nome de parâmetro inválido: '{parameter}'")
+
+        # Cada parâmetro declarado precisa aparecer em algum filtro (WHERE ou HAVING)
+        placeholders = {
+            PARAMETER_PLACEHOLDER_PATTERN.match(filter_info["value"].strip()).group(1)
+            for filter_info in (
+                self.consulta_dao.listFilterConditions(report.get("filters"), report.get("filter_tree"))
+                + (report.get("having") or [])
+            )
+            if isinstance(filter_info.get("value"), str)
+            and PARAMETER_PLACEHOLDER_PATTERN.match(filter_info["value"].strip())
+        }
+        unused = set(parameters) - placeholders
+        if unused:
+            raise ValueError(f"Parâmetros não utilizados nos filtros: {', '.join(sorted(unused))}")
+
+        # Validar a definição montando a consulta uma vez
+        self.consulta_dao.buildAdhocQuery(**report, parameter_names=parameters)
+
+        definition = {
+            "name": name,
+            "description": description,
+            "report": report,
+            "parameters": list(parameters),
+            "updated_at": time.time(),
+        }
+
+        with self._lock:
+            self._reload_if_changed()
+            self._reports[name] = definition
+            self._compiled.pop(name, None)
+            self._persist()
+
+        return dict(definition)
+
+    def deleteSavedReport(self, name: str) -> None:
+        """
+        Remove a definição de um relatório salvo
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if name not in self._reports:
+                raise KeyError(f"Relatório salvo '{name}' não encontrado")
+            del self._reports[name]
+            self._compiled.pop(name, None)
+            self._persist()
+
+    def runSavedReport(self, name: str, parameter_values: Dict[str, Any]) -> Tuple[ResultBuffer, str]:
+        """
+        Executa um relatório salvo via PREPARE/EXECUTE.
+
+        O statement é preparado uma vez por conexão do pool (e por versão da definição);
+        execuções seguintes enviam apenas os valores dos parâmetros, reaproveitando
+        o parse e o plano do PostgreSQL. Cada relatório tem um nome de statement fixo:
+        quando a definição muda, a conexão desaloca o plano antigo (DEALLOCATE) antes
+        de preparar o novo, e os planos por conexão ficam limitados a um por relatório.
+
+        Args:
+            name: Nome do relatório salvo
+            parameter_values: Valores dos parâmetros declarados
+
+        Returns:
+            Tuple com o buffer de resultados (quem chama deve fechá-lo) e o SQL preparado
+
+        Raises:
+            ResultTooLargeError: se o resultado passar do tamanho máximo configurado
+        """
+        statement_name, sql, positional_names, fixed_values, parameters = self._get_compiled(name)
+
+        missing = [parameter for parameter in parameters if parameter not in parameter_values]
+        if missing:
+            raise ValueError(f"Parâmetros obrigatórios não informados: {', '.join(missing)}")
+
+        values = []
+        for bind_name in positional_names:
+            if bind_name.startswith(PARAMETER_BIND_PREFIX) and bind_name[len(PARAMETER_BIND_PREFIX):] in parameters:
+                values.append(parameter_values[bind_name[len(PARAMETER_BIND_PREFIX):]])
+            else:
+                values.append(fixed_values[bind_name])
+
+        def execute(read_engine):
+            with read_engine.connect() as conn:
+                # Prepared statements vivem na sessão do PostgreSQL, então o controle é por conexão DBAPI:
+                # statement -> SQL preparado nesta conexão
+                prepared = conn.info.setdefault('prepared_statements', {})
+                if prepared.get(statement_name) != sql:
+                    if statement_name in prepared:
+                        conn.exec_driver_sql(f"DEALLOCATE {statement_name}")
+                        del prepared[statement_name]
+                    conn.exec_driver_sql(f"PREPARE {statement_name} AS {sql}")
+                    prepared[statement_name] = sql
+
+                if values:
+                    placeholders = ", ".join(["%s"] * len(values))
+                    result = conn.exec_driver_sql(f"EXECUTE {statement_name} ({placeholders})", tuple(values))
+                else:
+                    result = conn.exec_driver_sql(f"EXECUTE {statement_name}")
+
+                # Mesmo orçamento de memória (e spill para disco) dos relatórios adhoc
+                buffer = ResultBuffer(list(result.keys()))
+                try:
+                    for partition in result.partitions(REPORT_FETCH_SIZE):
+                        buffer.append_rows([tuple(row) for row in partition])
+                except Exception:
+                    buffer.close()
+                    raise
+                conn.rollback()
+                return buffer, sql
+
+        try:
+            # Réplica indisponível: sai do balanceamento e o relatório é repetido no primário
+            return run_read(execute)
+        except Exception as e:
+            print(f"Erro ao executar relatório salvo {name}: {e}")
+            raise e
+
+    def _get_compiled(self, name: str):
+        """
+        Compila (ou reaproveita) a consulta do relatório salvo com parâmetros posicionais
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if name not in self._reports:
+                raise KeyError(f"Relatório salvo '{name}' não encontrado")
+            definition = self._reports[name]
+            version = definition["updated_at"]
+
+            cached = self._compiled.get(name)
+            if cached and cached[0] == version:
+                return cached[1:]
+
+        query = self.consulta_dao.buildAdhocQuery(**definition["report"], parameter_names=definition["parameters"])
+        compiled = query.compile(dialect=PREPARE_DIALECT)
+        sql = str(compiled)
+        positional_names = list(compiled.positiontup or [])
+        fixed_values = {
+            bind_name: compiled.binds[bind_name].effective_value
+            for bind_name in positional_names
+            if not bind_name.startswith(PARAMETER_BIND_PREFIX)
+        }
+
+        # Nome fixo por relatório: uma nova versão da definição substitui o statement anterior
+        statement_name = "saved_report_" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        entry = (version, statement_name, sql, positional_names, fixed_values, list(definition["parameters"]))
+
+        with self._lock:
+            self._compiled[name] = entry
+        return entry[1:]
+
+    def _reload_if_changed(self) -> None:
+        """
+        Recarrega as definições do arquivo se ele foi alterado (ex.: por outro worker)
+        """
+        try:
+            mtime = os.path.getmtime(SAVED_REPORTS_FILE)
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+
+        with open(SAVED_REPORTS_FILE, encoding="utf-8") as file:
+            self._reports = json.load(file)
+        self._file_mtime = mtime
+        self._compiled = {
+            name: entry for name, entry in self._compiled.items()
+            if name in self._reports and self._reports[name]["updated_at"] == entry[0]
+        }
+
+    def _persist(self) -> None:
+        temp_path = SAVED_REPORTS_FILE + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self._reports, file, ensure_ascii=False, indent=2, default=str)
+        os.replace(temp_path, SAVED_REPORTS_FILE)
+        self._file_mtime = os.path.getmtime(SAVED_REPORTS_FILE)
@@ -0,0 +1,304 @@
+"""
+Bancos descartáveis para benchmarks e testes: o backup (ou o Script.sql) é restaurado
+uma única vez em um banco template e cada execução recebe uma cópia criada com
+CREATE DATABASE ... TEMPLATE, que o Postgres faz copiando os arquivos do template
+(milissegundos a poucos segundos, contra minutos de pg_restore).
+
+O backup tem o schema original; depois do pg_restore o template recebe o trecho do
+Script.sql posterior ao backup (permissões, índices, versões dos dados, country_profile,
+cities particionada e estatísticas de cidades), ficando com o schema que a API exige.
+
+O backend lê DATABASE_URL ao importar dao.database, então a cópia é usada
+exportando a URL antes de iniciar o processo:
+
+    python database_fixtures.py template                      # restaura o backup no template (só se mudou)
+    python database_fixtures.py run -- python benchmarks/bench_cities_partitioning.py
+    export DATABASE_URL=$(python database_fixtures.py clone)   # cópia avulsa (remover com drop/cleanup)
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from dao.database import DATABASE_URL
+
+BD_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fontes do template: backup completo (pg_restore) ou só o schema (psql)
+FIXTURE_SOURCES = {
+    "backup": os.path.join(BD_DIR, 'TrabalhoFinalBD2.backup'),
+    "script": os.path.join(BD_DIR, 'Script.sql'),
+}
+
+# Início do trecho do Script.sql com os objetos que o backup não tem
+SCRIPT_UPGRADE_MARKER = '-- A partir daqui: objetos que o backup'
+
+# Banco de manutenção usado para criar e remover bancos (não pode ser o próprio template)
+FIXTURE_ADMIN_URL = os.getenv('FIXTURE_ADMIN_URL')
+# Nome do banco template (padrão: <banco de DATABASE_URL>_template)
+FIXTURE_TEMPLATE_DB = os.getenv('FIXTURE_TEMPLATE_DB')
+# Prefixo das cópias descartáveis (padrão: <banco de DATABASE_URL>_run)
+FIXTURE_CLONE_PREFIX = os.getenv('FIXTURE_CLONE_PREFIX')
+
+# Comentário do template: identifica a fonte restaurada, para reconstruir quando ela muda
+FIXTURE_COMMENT_PREFIX = 'fixture:'
+# Chave do advisory lock que serializa a construção do template entre processos
+FIXTURE_LOCK_KEY = 0x7E3D1A50
+# Limite do Postgres para nomes de bancos
+MAX_DATABASE_NAME = 63
+
+def source_fingerprint(source: str) -> str:
+    """
+    Identificação da fonte do template: tipo e sha256 dos arquivos (o backup também
+    depende do Script.sql, aplicado depois do pg_restore)
+    """
+    digest = hashlib.sha256()
+    paths = [FIXTURE_SOURCES[source]] + ([FIXTURE_SOURCES["script"]] if source == "backup" else [])
+    for path in paths:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+    return f"{FIXTURE_COMMENT_PREFIX}{source}:{digest.hexdigest()}"
+
+def script_upgrade_sql() -> str:
+    """
+    Trecho do Script.sql aplicado sobre o backup restaurado
+    """
+    with open(FIXTURE_SOURCES["script"], encoding='utf-8') as file:
+        script = file.read()
+    start = script.find(SCRIPT_UPGRADE_MARKER)
+    if start < 0:
+        raise ValueError(f"Marcador '{SCRIPT_UPGRADE_MARKER}' não encontrado no Script.sql")
+    return script[start:]
+
+class TemplateDatabaseManager:
+    """
+    Mantém o banco template e as cópias descartáveis criadas a partir dele.
+
+    O template fica marcado IS_TEMPLATE e com ALLOW_CONNECTIONS false: o CREATE
+    DATABASE ... TEMPLATE falha se houver qualquer conexão aberta no template.
+    """
+    def __init__(self, database_url: str = DATABASE_URL, template_name: str = None,
+                 admin_url: str = None, clone_prefix: str = None):
+        self.url = make_url(database_url)
+        self.admin_url = make_url(admin_url or FIXTURE_ADMIN_URL or self.url.set(database='postgres'))
+        self.template_name = template_name or FIXTURE_TEMPLATE_DB or f"{self.url.database}_template"
+        self.clone_prefix = clone_prefix or FIXTURE_CLONE_PREFIX or f"{self.url.database}_run"
+        self._admin_engine = None
+
+    def _admin(self):
+        # CREATE/DROP DATABASE não rodam dentro de transação
+        if self._admin_engine is None:
+            self._admin_engine = create_engine(self.admin_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        return self._admin_engine
+
+    def _quote(self, name: str) -> str:
+        return self._admin().dialect.identifier_preparer.quote(name)
+
+    def databaseUrl(self, name: str) -> str:
+        """
+        URL de conexão (com senha) para o banco informado, no mesmo servidor de DATABASE_URL
+        """
+        return self.url.set(database=name).render_as_string(hide_password=False)
+
+    def _libpq_url(self, name: str) -> str:
+        # pg_restore/psql não entendem o sufixo do driver (postgresql+psycopg2://)
+        return self.url.set(drivername='postgresql', database=name).render_as_string(hide_password=False)
+
+    def getTemplateFingerprint(self) -> str:
+        """
+        Comentário gravado no template na última construção (None se o template não existe)
+        """
+        with self._admin().connect() as conn:
+            return conn.execute(
+                text("SELECT coalesce(shobj_description(oid, 'pg_database'), '') FROM pg_database WHERE datname = :name"),
+                {"name": self.template_name}
+            ).scalar()
+
+    def ensureTemplate(self, source: str = "backup", force: bool = False) -> bool:
+        """
+        Restaura a fonte no banco template se ele não existe ou foi construído de outra fonte
+
+        Args:
+            source: "backup" (TrabalhoFinalBD2.backup, dados completos, atualizado pelo Script.sql)
+                ou "script" (Script.sql, só o schema)
+            force: Reconstrói mesmo que o template esteja atualizado
+
+        Returns:
+            True se o template foi (re)construído
+
+        Raises:
+            ValueError: se a fonte é desconhecida ou o cliente do Postgres não está instalado
+            subprocess.CalledProcessError: se a restauração falha
+        """
+        if source not in FIXTURE_SOURCES:
+            raise ValueError(f"Fonte desconhecida: {source} (use {', '.join(FIXTURE_SOURCES)})")
+        programs = ["pg_restore", "psql"] if source == "backup" else ["psql"]
+        for program in programs:
+            if shutil.which(program) is None:
+                raise ValueError(f"O template requer o cliente '{program}' do PostgreSQL no PATH")
+        fingerprint = source_fingerprint(source)
+
+        with self._admin().connect() as lock_conn:
+            # Vários processos de teste podem tentar construir o template ao mesmo tempo
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": FIXTURE_LOCK_KEY})
+            try:
+                if not force and self.getTemplateFingerprint() == fingerprint:
+                    return False
+                self._build_template(source, fingerprint)
+                return True
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": FIXTURE_LOCK_KEY})
+
+    def _build_template(self, source: str, fingerprint: str):
+        name = self._quote(self.template_name)
+        print(f"🧱 Construindo o template {self.template_name} a partir de {os.path.basename(FIXTURE_SOURCES[source])}")
+        self.dropDatabase(self.template_name)
+        with self._admin().connect() as conn:
+            conn.execute(text(f"CREATE DATABASE {name}"))
+
+        target = self._libpq_url(self.template_name)
+        psql = ["psql", "--quiet", "-v", "ON_ERROR_STOP=1", f"--dbname={target}"]
+        if source == "backup":
+            subprocess.run(["pg_restore", "--no-owner", "--no-privileges", "--exit-on-error",
+                            f"--dbname={target}", FIXTURE_SOURCES[source]], check=True)
+            # O backup tem o schema original: aplica o restante do Script.sql (a API recusa subir sem ele)
+            subprocess.run(psql + ["--file", "-"], input=script_upgrade_sql(), text=True, check=True)
+        else:
+            subprocess.run(psql + ["--file", FIXTURE_SOURCES[source]], check=True)
+
+        # Estatísticas do planejador e visibility map são copiados junto com os arquivos:
+        # as cópias já nascem analisadas
+        template_engine = create_engine(self.databaseUrl(self.template_name), poolclass=NullPool,
+                                        isolation_level="AUTOCOMMIT")
+        try:
+            with template_engine.connect() as conn:
+                conn.execute(text("VACUUM (FREEZE, ANALYZE)"))
+        finally:
+            template_engine.dispose()
+
+        with self._admin().connect() as conn:
+            conn.execute(text(f"COMMENT ON DATABASE {name} IS :comment").bindparams(comment=fingerprint))
+            conn.execute(text(f"ALTER DATABASE {name} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false"))
+        print(f"✅ Template {self.template_name} pronto")
+
+    def createClone(self, name: str = None) -> str:
+        """
+        Cria uma cópia do template
+
+        Args:
+            name: Nome do banco (padrão: prefixo das cópias + identificador aleatório)
+
+        Returns:
+            URL de conexão da cópia
+        """
+        name = name or f"{self.clone_prefix}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        if len(name) > MAX_DATABASE_NAME:
+            raise ValueError(f"Nome de banco com mais de {MAX_DATABASE_NAME} caracteres: {name}")
+        with self._admin().connect() as conn:
+            # FILE_COPY (PG 15+) copia os diretórios do template sem passar pelo WAL
+            strategy = " STRATEGY FILE_COPY" if conn.dialect.server_version_info >= (15,) else ""
+            conn.execute(text(f"CREATE DATABASE {self._quote(name)} TEMPLATE {self._quote(self.template_name)}{strategy}"))
+        return self.databaseUrl(name)
+
+    def dropDatabase(self, name: str):
+        """
+        Remove o banco (template ou cópia), encerrando as conexões abertas nele
+        """
+        with self._admin().connect() as conn:
+            is_template = conn.execute(
+                text("SELECT datistemplate FROM pg_database WHERE datname = :name"), {"name": name}
+            ).scalar()
+            if is_template:
+                # DROP DATABASE recusa bancos marcados como template
+                conn.execute(text(f"ALTER DATABASE {self._quote(name)} WITH IS_TEMPLATE false"))
+            force = " WITH (FORCE)" if conn.dialect.server_version_info >= (13,) else ""
+            conn.execute(text(f"DROP DATABASE IF EXISTS {self._quote(name)}{force}"))
+
+    def listClones(self) -> List[str]:
+        """
+        Cópias existentes (bancos com o prefixo das cópias)
+        """
+        with self._admin().connect() as conn:
+            return list(conn.execute(
+                text("SELECT datname FROM pg_database WHERE starts_with(datname, :prefix) ORDER BY datname"),
+                {"prefix": f"{self.clone_prefix}_"}
+            ).scalars())
+
+    def dropClones(self) -> List[str]:
+        """
+        Remove todas as cópias (as deixadas por execuções interrompidas, por exemplo)
+        """
+        clones = self.listClones()
+        for name in clones:
+            self.dropDatabase(name)
+        return clones
+
+    @contextmanager
+    def clone(self, keep: bool = False) -> Iterator[str]:
+        """
+        Cópia descartável do template, removida ao fim do bloco (a menos que keep)
+        """
+        url = self.createClone()
+        try:
+            yield url
+        finally:
+            if not keep:
+                self.dropDatabase(make_url(url).database)
+
+    def dispose(self):
+        if self._admin_engine is not None:
+            self._admin_engine.dispose()
+            self._admin_engine = None
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Banco template e cópias descartáveis para benchmarks e testes")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    template_parser = subcommands.add_parser("template", help="Restaura a fonte no template (se mudou)")
+    template_parser.add_argument("--source", choices=sorted(FIXTURE_SOURCES), default="backup")
+    template_parser.add_argument("--force", action="store_true", help="Reconstrói o template mesmo se atualizado")
+    subcommands.add_parser("clone", help="Cria uma cópia e imprime a URL dela")
+    drop_parser = subcommands.add_parser("drop", help="Remove uma cópia")
+    drop_parser.add_argument("name")
+    subcommands.add_parser("cleanup", help="Remove todas as cópias")
+    run_parser = subcommands.add_parser("run", help="Executa um comando com DATABASE_URL apontando para uma cópia nova")
+    run_parser.add_argument("--source", choices=sorted(FIXTURE_SOURCES), default="backup")
+    run_parser.add_argument("--keep", action="store_true", help="Mantém a cópia ao fim do comando")
+    run_parser.add_argument("argv", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    manager = TemplateDatabaseManager()
+    try:
+        if args.command == "template":
+            manager.ensureTemplate(args.source, force=args.force)
+        elif args.command == "clone":
+            print(manager.createClone())
+        elif args.command == "drop":
+            manager.dropDatabase(args.name)
+        elif args.command == "cleanup":
+            removed = manager.dropClones()
+            print(f"🧹 Cópias removidas: {len(removed)}")
+        else:
+            argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+            if not argv:
+                parser.error("informe o comando após --")
+            manager.ensureTemplate(args.source)
+            started = time.perf_counter()
+            with manager.clone(keep=args.keep) as url:
+                print(f"📋 Cópia {make_url(url).database} criada em {(time.perf_counter() - started) * 1000:.0f} ms",
+                      file=sys.stderr)
+                result = subprocess.run(argv, env={**os.environ, "DATABASE_URL": url})
+            sys.exit(result.returncode)
+    finally:
+        manager.dispose()
@@ -0,0 +1,67 @@
+"""
+Configuração do Gunicorn para o modo de produção (vários workers Uvicorn)
+
+Uso: gunicorn -c gunicorn.conf.py main:app   (ou SERVER_MODE=production python main.py)
+"""
+import multiprocessing
+import os
+
+# Endereço e workers
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WORKERS', '0')) or multiprocessing.cpu_count()
+# Os handlers que acessam o banco são síncronos (def): o FastAPI os executa no threadpool
+# do worker, e um relatório lento não bloqueia o event loop (nem /health/*) do worker
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# A aplicação é carregada uma vez no master e herdada pelos workers via fork
+preload_app = True
+
+# Reinício gradual: workers terminam as requisições em andamento antes de sair
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.getenv('WORKER_TIMEOUT', '120'))
+keepalive = int(os.getenv('KEEPALIVE', '5'))
+
+# Reciclagem periódica dos workers (com jitter para não reiniciarem todos juntos)
+max_requests = int(os.getenv('MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', '1000'))
+
+# Conexões pré-abertas por worker em cada pool (primário e réplicas)
+POOL_PREWARM = int(os.getenv('DB_POOL_PREWARM', '2'))
+
+loglevel = os.getenv('LOG_LEVEL', 'info')
+accesslog = os.getenv('ACCESS_LOG', '-')
+
+def when_ready(server):
+    """Aquece o estado da aplicação no master, antes do fork dos workers"""
+    from main import warmup_app_state
+    from dao.consultaDAO import SchemaMismatchError
+    from dao.database import get_all_engines, POOL_SIZE, POOL_MAX_OVERFLOW
+
+    try:
+        summary = warmup_app_state()
+        server.log.info(f"Estado da aplicação pré-carregado: {summary}")
+    except SchemaMismatchError as e:
+        # Banco sem migrar: os relatórios falhariam com erro 500, melhor não subir
+        server.log.error(str(e))
+        raise
+    except Exception as e:
+        # Sem banco disponível os workers sobem mesmo assim e carregam os metadados sob demanda
+        server.log.warning(f"Não foi possível aquecer o estado da aplicação: {e}")
+
+    # O master não atende requisições: fecha as conexões usadas no aquecimento
+    for each_engine in get_all_engines():
+        each_engine.dispose()
+
+    max_connections = workers * (POOL_SIZE + POOL_MAX_OVERFLOW)
+    server.log.info(
+        f"{workers} workers x pool de até {POOL_SIZE + POOL_MAX_OVERFLOW} conexões = "
+        f"até {max_connections} conexões por banco (confira o max_connections do PostgreSQL)"
+    )
+
+def post_fork(server, worker):
+    """Cada worker descarta as conexões herdadas e pré-abre as suas"""
+    from dao.database import reset_pools_after_fork, prewarm_pools
+
+    reset_pools_after_fork()
+    if POOL_PREWARM > 0:
+        prewarm_pools(POOL_PREWARM)
@@ -5,14 +5,24 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
+import sys
 
-from controller import consultaController
+from compression import CompressionMiddleware
+from controller import consultaController, exportController, geoController, graphController, savedReportController
+from dao.borderGraphDAO import border_graph_dao
+from dao.database import get_pool_stats, get_replica_status
+from dao.memoryEngine import memory_engine
+from dao.olapDAO import olap_dao
+from dao.resultBuffer import process_budget
 
 # Configurações da aplicação
 APP_TITLE = "API de Relatórios ADHOC"
 APP_VERSION = "1.0.0"
 APP_DESCRIPTION = "API para geração dinâmica de relatórios a partir do banco de dados"
 
+# Modo do servidor: "development" (uvicorn com reload) ou "production" (gunicorn com vários workers)
+SERVER_MODE = os.getenv("SERVER_MODE", "development").lower()
+
 # Configurações de CORS
 ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -21,6 +31,12 @@ ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173"
 ]
 
+# Compressão de respostas: respostas menores que o limite seguem sem compressão
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
 # Criar a aplicação FastAPI
 app = FastAPI(
     title=APP_TITLE,
@@ -37,6 +53,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+
+# Negociar Content-Encoding (zstd, br ou gzip, conforme Accept-Encoding e pacotes instalados)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
+    zstd_level=ZSTD_LEVEL,
 )
 
 # Adicionar routers
@@ -45,6 +71,26 @@ app.include_router(
     prefix="/api/db", 
     tags=["database"]
 )
+app.include_router(
+    exportController.router,
+    prefix="/api/db",
+    tags=["export"]
+)
+app.include_router(
+    savedReportController.router,
+    prefix="/api/db",
+    tags=["saved-reports"]
+)
+app.include_router(
+    geoController.router,
+    prefix="/api/db",
+    tags=["geo"]
+)
+app.include_router(
+    graphController.router,
+    prefix="/api/db",
+    tags=["graph"]
+)
 
 # Rotas básicas
 @app.get("/", tags=["health"])
@@ -65,8 +111,46 @@ def health_check():
         "service": "adhoc-reports-api"
     }
 
+@app.get("/health/pool", tags=["health"])
+def pool_stats():
+    """Métricas do pool de conexões (uso, overflow, espera por conexão e timeouts)"""
+    return {"pool": get_pool_stats()}
+
+@app.get("/health/memory", tags=["health"])
+def memory_budget():
+    """Orçamento de memória dos relatórios em andamento no worker (reservado e relatórios com spill)"""
+    return {"reports": process_budget.stats()}
+
+@app.get("/health/replicas", tags=["health"])
+def replica_status():
+    """Estado das réplicas de leitura (saúde, falhas e conexões em uso)"""
+    return get_replica_status()
+
+@app.get("/health/olap", tags=["health"])
+def olap_status():
+    """Snapshots Parquet do backend OLAP (DuckDB): linhas, versão exportada e se estão atualizados"""
+    return olap_dao.getStatus()
+
+def warmup_app_state():
+    """
+    Pré-carrega o estado compartilhado pelos workers: mapeamentos ORM e
+    metadados do schema (tabelas, colunas e chaves estrangeiras), o grafo de fronteiras
+    e a cópia em memória das tabelas de dimensão
+    """
+    summary = consultaController.consulta_dao.warmup()
+    graph = border_graph_dao.getGraph()
+    summary["border_graph"] = {"countries": len(graph.codes), "borders": graph.edge_count}
+    summary["memory_engine"] = memory_engine.warmup()
+    return summary
+
 # Iniciar o servidor se executado diretamente
 if __name__ == "__main__":
+    if SERVER_MODE == "production":
+        # Workers, preload e hooks de fork ficam em gunicorn.conf.py
+        from gunicorn.app.wsgiapp import run
+        sys.argv = ["gunicorn", "-c", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py"), "main:app"]
+        sys.exit(run())
+
     # Configurações do servidor
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
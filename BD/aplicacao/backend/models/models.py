@@ -1,5 +1,7 @@
+import datetime
 from typing import List, Optional
-from sqlalchemy import BigInteger, CHAR, Double, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, String, UniqueConstraint
+from sqlalchemy import BigInteger, CHAR, DateTime, Double, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -142,7 +144,8 @@ class States(Base):
     __tablename__ = 'states'
     __table_args__ = (
         ForeignKeyConstraint(['country_code'], ['countries.country_code'], name='fk_states_country'),
-        PrimaryKeyConstraint('state_id', name='states_pkey')
+        PrimaryKeyConstraint('state_id', name='states_pkey'),
+        UniqueConstraint('state_id', 'country_code', name='states_state_id_country_code_key')
     )
 
     state_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -159,16 +162,90 @@ class Cities(Base):
     Modelo representando cidades dentro de estados.
     
     Último nível na hierarquia geográfica do sistema.
+    Particionada por país (country_code, copiado do estado); a FK composta
+    garante que o país da cidade é o do seu estado.
     """
     __tablename__ = 'cities'
     __table_args__ = (
-        ForeignKeyConstraint(['state_id'], ['states.state_id'], name='cities_state_id_fkey'),
-        PrimaryKeyConstraint('city_id', name='cities_pkey')
+        ForeignKeyConstraint(['state_id', 'country_code'], ['states.state_id', 'states.country_code'], name='cities_state_id_country_code_fkey'),
+        PrimaryKeyConstraint('city_id', 'country_code', name='cities_pkey')
     )
 
     city_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     state_id: Mapped[int] = mapped_column(Integer)
+    country_code: Mapped[str] = mapped_column(CHAR(3), primary_key=True)
     name: Mapped[str] = mapped_column(String(100))
     population: Mapped[Optional[int]] = mapped_column(BigInteger)
 
     state: Mapped['States'] = relationship('States', back_populates='cities')
+
+
+class CountryProfile(Base):
+    """
+    Modelo representando o perfil desnormalizado dos países (view materializada).
+    
+    Uma linha por país com geografia, sociedade e idiomas/moedas agregados em arrays;
+    atualizada ao fim das cargas. Somente leitura.
+    """
+    __tablename__ = 'country_profile'
+    __table_args__ = (
+        PrimaryKeyConstraint('country_code', name='idx_country_profile_country_code'),
+    )
+
+    country_code: Mapped[str] = mapped_column(CHAR(3), primary_key=True)
+    name: Mapped[str] = mapped_column(String(100))
+    region: Mapped[Optional[str]] = mapped_column(String(100))
+    area: Mapped[Optional[float]] = mapped_column(Double(53))
+    lat: Mapped[Optional[float]] = mapped_column(Double(53))
+    lng: Mapped[Optional[float]] = mapped_column(Double(53))
+    capital: Mapped[Optional[str]] = mapped_column(String(100))
+    population: Mapped[Optional[int]] = mapped_column(BigInteger)
+    languages: Mapped[List[str]] = mapped_column(ARRAY(String(100)))
+    language_count: Mapped[int] = mapped_column(Integer)
+    currencies: Mapped[List[str]] = mapped_column(ARRAY(String(100)))
+    currency_count: Mapped[int] = mapped_column(Integer)
+
+
+class StateCityStats(Base):
+    """
+    Modelo representando as estatísticas de cidades por estado.
+    
+    Mantida por triggers em cities (contagem, soma, mínimo e máximo de população e
+    cidades sem população): agregações por estado sem varrer cities. Somente leitura.
+    """
+    __tablename__ = 'state_city_stats'
+    __table_args__ = (
+        ForeignKeyConstraint(['state_id'], ['states.state_id'], name='state_city_stats_state_id_fkey'),
+        ForeignKeyConstraint(['country_code'], ['countries.country_code'], name='state_city_stats_country_code_fkey'),
+        PrimaryKeyConstraint('state_id', name='state_city_stats_pkey')
+    )
+
+    state_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    country_code: Mapped[str] = mapped_column(CHAR(3))
+    city_count: Mapped[int] = mapped_column(BigInteger)
+    population_sum: Mapped[int] = mapped_column(BigInteger)
+    population_min: Mapped[Optional[int]] = mapped_column(BigInteger)
+    population_max: Mapped[Optional[int]] = mapped_column(BigInteger)
+    null_population_count: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime)
+
+
+class CountryCityStats(Base):
+    """
+    Modelo representando as estatísticas de cidades por país.
+    
+    Mesmas métricas de StateCityStats, somadas por país. Somente leitura.
+    """
+    __tablename__ = 'country_city_stats'
+    __table_args__ = (
+        ForeignKeyConstraint(['country_code'], ['countries.country_code'], name='country_city_stats_country_code_fkey'),
+        PrimaryKeyConstraint('country_code', name='country_city_stats_pkey')
+    )
+
+    country_code: Mapped[str] = mapped_column(CHAR(3), primary_key=True)
+    city_count: Mapped[int] = mapped_column(BigInteger)
+    population_sum: Mapped[int] = mapped_column(BigInteger)
+    population_min: Mapped[Optional[int]] = mapped_column(BigInteger)
+    population_max: Mapped[Optional[int]] = mapped_column(BigInteger)
+    null_population_count: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime)
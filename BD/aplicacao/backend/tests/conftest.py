@@ -0,0 +1,48 @@
+"""
+Configuração dos testes do backend (executar a partir de BD/aplicacao/backend: python -m pytest tests)
+
+Os testes de unidade não usam o banco. Os que usam recebem uma cópia descartável do
+banco template (database_fixtures.py), criada uma vez por sessão de testes e removida
+no fim; sem Postgres acessível ou sem o cliente do Postgres no PATH eles são pulados.
+A fonte do template vem de FIXTURE_TEST_SOURCE (padrão: script, só o schema).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fonte do template usado pelos testes com banco: script (Script.sql) ou backup
+FIXTURE_TEST_SOURCE = os.getenv('FIXTURE_TEST_SOURCE', 'script')
+
+@pytest.fixture(scope="session")
+def database_url():
+    """
+    URL de uma cópia do template, exclusiva desta sessão de testes
+    """
+    from sqlalchemy.exc import OperationalError
+    from database_fixtures import TemplateDatabaseManager
+
+    manager = TemplateDatabaseManager()
+    try:
+        try:
+            manager.ensureTemplate(FIXTURE_TEST_SOURCE)
+        except (ValueError, OperationalError) as e:
+            pytest.skip(f"Banco de testes indisponível: {e}")
+        with manager.clone() as url:
+            yield url
+    finally:
+        manager.dispose()
+
+@pytest.fixture(scope="session")
+def database_engine(database_url):
+    """
+    Engine da cópia da sessão (sem pool: as conexões não sobrevivem ao DROP DATABASE do fim)
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    engine = create_engine(database_url, poolclass=NullPool)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,58 @@
+"""
+Grafo de fronteiras em formato CSR (dao/borderGraphDAO.py)
+"""
+import pytest
+
+from dao.borderGraphDAO import BorderGraph
+
+@pytest.fixture(scope="module")
+def graph():
+    codes = ["ARG", "BOL", "BRA", "PRY", "URY", "AUS"]
+    names = {"ARG": "Argentina", "BRA": "Brazil", "AUS": "Australia"}
+    edges = [
+        ("BRA", "ARG"), ("ARG", "BRA"), ("BRA", "URY"), ("BRA", "PRY"), ("BRA", "BOL"),
+        ("ARG", "URY"), ("ARG", "PRY"), ("BOL", "PRY"),
+        # Fronteira cadastrada em uma só direção, laço e país desconhecido
+        ("BOL", "ARG"), ("AUS", "AUS"), ("BRA", "XXX"),
+    ]
+    return BorderGraph(codes, names, edges)
+
+def neighbors(graph, code):
+    node = graph.node(code)
+    return {graph.codes[n] for n in graph.neighbors[graph.offsets[node]:graph.offsets[node + 1]]}
+
+def test_arestas_nao_direcionadas_sem_duplicatas(graph):
+    assert graph.edge_count == 8
+    assert neighbors(graph, "ARG") == {"BOL", "BRA", "PRY", "URY"}
+    assert neighbors(graph, "BOL") == {"ARG", "BRA", "PRY"}
+    assert neighbors(graph, "AUS") == set()
+
+def test_node_normaliza_o_codigo(graph):
+    assert graph.node(" bra ") == graph.node("BRA")
+    with pytest.raises(KeyError):
+        graph.node("XXX")
+
+def test_bfs_distancias_e_caminho(graph):
+    distances, parents = graph.bfs(graph.node("URY"))
+    assert distances[graph.node("URY")] == 0
+    assert distances[graph.node("BOL")] == 2
+    assert distances[graph.node("AUS")] == -1
+    path, node = [], graph.node("BOL")
+    while node >= 0:
+        path.append(graph.codes[node])
+        node = parents[node]
+    assert path[-1] == "URY" and len(path) == 3
+
+def test_bfs_limitada_por_saltos(graph):
+    distances, _ = graph.bfs(graph.node("URY"), max_hops=1)
+    reached = {graph.codes[node] for node, distance in enumerate(distances) if distance >= 0}
+    assert reached == {"URY", "ARG", "BRA"}
+
+def test_componentes(graph):
+    component = graph.component_of
+    assert len({component[graph.node(code)] for code in ["ARG", "BOL", "BRA", "PRY", "URY"]}) == 1
+    assert component[graph.node("AUS")] != component[graph.node("BRA")]
+
+def test_describe(graph):
+    assert graph.describe(graph.node("BRA")) == {"country_code": "BRA", "name": "Brazil"}
+    assert graph.describe(graph.node("PRY")) == {"country_code": "PRY", "name": None}
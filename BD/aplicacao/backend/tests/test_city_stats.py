@@ -0,0 +1,88 @@
+"""
+Estatísticas de cidades por estado e por país mantidas pelos triggers de cities (Script.sql)
+"""
+import pytest
+from sqlalchemy import text
+
+STATE_STATS = """SELECT state_id, city_count, population_sum, population_min, population_max, null_population_count
+FROM state_city_stats WHERE country_code = 'ZZA' ORDER BY state_id"""
+STATE_AGGREGATES = """SELECT state_id, count(*), coalesce(sum(population), 0), min(population), max(population),
+       count(*) FILTER (WHERE population IS NULL)
+FROM cities WHERE country_code = 'ZZA' GROUP BY state_id ORDER BY state_id"""
+COUNTRY_STATS = """SELECT city_count, population_sum, population_min, population_max, null_population_count
+FROM country_city_stats WHERE country_code = 'ZZA'"""
+COUNTRY_AGGREGATES = """SELECT count(*), coalesce(sum(population), 0), min(population), max(population),
+       count(*) FILTER (WHERE population IS NULL)
+FROM cities WHERE country_code = 'ZZA' HAVING count(*) > 0"""
+
+@pytest.fixture
+def conn(database_engine):
+    # Tudo na mesma transação, desfeita no fim: os triggers rodam por comando dentro dela
+    with database_engine.begin() as conn:
+        conn.execute(text("INSERT INTO countries (country_code, name) VALUES ('ZZA', 'Zedlândia')"))
+        yield conn
+        conn.rollback()
+
+def add_state(conn, name):
+    return conn.execute(text(
+        "INSERT INTO states (country_code, name) VALUES ('ZZA', :name) RETURNING state_id"
+    ), {"name": name}).scalar()
+
+def add_cities(conn, state_id, populations):
+    conn.execute(text(
+        "INSERT INTO cities (state_id, country_code, name, population) VALUES (:state_id, 'ZZA', :name, :population)"
+    ), [{"state_id": state_id, "name": f"Cidade {i}", "population": population} for i, population in enumerate(populations)])
+
+def assert_stats_match_cities(conn):
+    assert conn.execute(text(STATE_STATS)).all() == conn.execute(text(STATE_AGGREGATES)).all()
+    assert conn.execute(text(COUNTRY_STATS)).all() == conn.execute(text(COUNTRY_AGGREGATES)).all()
+
+def test_insercao_soma_por_estado_e_pais(conn):
+    north, south = add_state(conn, "Norte"), add_state(conn, "Sul")
+    add_cities(conn, north, [100, 50, None])
+    add_cities(conn, south, [30])
+    assert conn.execute(text(STATE_STATS)).all() == [(north, 3, 150, 50, 100, 1), (south, 1, 30, 30, 30, 0)]
+    assert conn.execute(text(COUNTRY_STATS)).all() == [(4, 180, 30, 100, 1)]
+    assert_stats_match_cities(conn)
+
+def test_alteracao_do_extremo_recalcula_minimo_e_maximo(conn):
+    north, south = add_state(conn, "Norte"), add_state(conn, "Sul")
+    add_cities(conn, north, [100, 50, None])
+    add_cities(conn, south, [30])
+    # A cidade com o máximo do estado e do país deixa de ser a maior
+    conn.execute(text("UPDATE cities SET population = 10 WHERE state_id = :state_id AND population = 100"),
+                 {"state_id": north})
+    assert conn.execute(text(STATE_STATS)).all()[0] == (north, 3, 60, 10, 50, 1)
+    # Cidade sem população passa a ter e muda de estado
+    conn.execute(text("UPDATE cities SET population = 70, state_id = :south WHERE population IS NULL AND country_code = 'ZZA'"),
+                 {"south": south})
+    assert_stats_match_cities(conn)
+    assert conn.execute(text(COUNTRY_STATS)).all() == [(4, 160, 10, 70, 0)]
+
+def test_alteracao_sem_mudanca_relevante_nao_altera(conn):
+    north = add_state(conn, "Norte")
+    add_cities(conn, north, [100, 50])
+    before = conn.execute(text(STATE_STATS)).all()
+    conn.execute(text("UPDATE cities SET name = upper(name) WHERE country_code = 'ZZA'"))
+    assert conn.execute(text(STATE_STATS)).all() == before
+
+def test_remocao_subtrai_e_apaga_estado_sem_cidades(conn):
+    north, south = add_state(conn, "Norte"), add_state(conn, "Sul")
+    add_cities(conn, north, [100, 50, None])
+    add_cities(conn, south, [30])
+    conn.execute(text("DELETE FROM cities WHERE state_id = :state_id"), {"state_id": south})
+    assert [row[0] for row in conn.execute(text(STATE_STATS))] == [north]
+    conn.execute(text("DELETE FROM cities WHERE state_id = :state_id AND population = 50"), {"state_id": north})
+    assert_stats_match_cities(conn)
+    conn.execute(text("DELETE FROM cities WHERE country_code = 'ZZA'"))
+    assert conn.execute(text(STATE_STATS)).all() == []
+    assert conn.execute(text(COUNTRY_STATS)).all() == []
+
+def test_recalculo_completo_igual_aos_triggers(conn):
+    north, south = add_state(conn, "Norte"), add_state(conn, "Sul")
+    add_cities(conn, north, [100, 50, None])
+    add_cities(conn, south, [30, 20])
+    conn.execute(text("DELETE FROM cities WHERE population = 20 AND country_code = 'ZZA'"))
+    maintained = conn.execute(text(STATE_STATS)).all(), conn.execute(text(COUNTRY_STATS)).all()
+    conn.execute(text("SELECT refresh_city_stats()"))
+    assert (conn.execute(text(STATE_STATS)).all(), conn.execute(text(COUNTRY_STATS)).all()) == maintained
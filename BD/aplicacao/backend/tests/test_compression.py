@@ -0,0 +1,26 @@
+"""
+Negociação de Accept-Encoding (compression.py)
+"""
+from compression import negotiate_encoding, parse_accept_encoding
+
+def test_pesos_q_e_padrao():
+    assert parse_accept_encoding("gzip, br;q=0.5, zstd;q=0") == {"gzip": 1.0, "br": 0.5, "zstd": 0.0}
+
+def test_nomes_em_maiusculas_e_espacos():
+    assert parse_accept_encoding(" GZip ; Q=0.8 ,") == {"gzip": 0.8}
+
+def test_peso_invalido_vale_zero():
+    assert parse_accept_encoding("br;q=abc") == {"br": 0.0}
+
+def test_cabecalho_vazio():
+    assert parse_accept_encoding("") == {}
+
+def test_negociacao_pelo_maior_peso():
+    assert negotiate_encoding("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+
+def test_negociacao_desempata_pela_preferencia_do_servidor():
+    assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+
+def test_curinga_e_recusa():
+    assert negotiate_encoding("*;q=0.3, zstd;q=0", ["zstd", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["zstd", "gzip"]) is None
@@ -0,0 +1,50 @@
+"""
+ETags e requisições condicionais (controller/conditional.py)
+"""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from controller.conditional import (
+    REPORT_CACHE_CONTROL, canonical_hash, check_not_modified, etag_matches, make_etag,
+)
+
+def request_with(**headers):
+    raw_headers = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+def test_make_etag_e_forte_e_deterministico():
+    etag = make_etag("relatorio", "v1")
+    assert etag.startswith('"') and etag.endswith('"') and not etag.startswith('W/')
+    assert etag == make_etag("relatorio", "v1")
+    # O separador impede que partes diferentes formem o mesmo texto
+    assert make_etag("ab", "c") != make_etag("a", "bc")
+
+def test_canonical_hash_ignora_ordem_das_chaves():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+
+def test_etag_matches():
+    etag = make_etag("x")
+    assert etag_matches(etag, etag)
+    assert etag_matches("*", etag)
+    assert etag_matches(f'"outro", W/{etag}', etag)
+    assert not etag_matches('"outro"', etag)
+
+def test_etag_matches_com_sufixo_de_compressao():
+    etag = make_etag("x")
+    assert etag_matches(etag[:-1] + '-gzip"', etag)
+    assert etag_matches(etag[:-1] + '-zstd"', etag)
+
+def test_check_not_modified_responde_304():
+    etag = make_etag("x")
+    with pytest.raises(HTTPException) as error:
+        check_not_modified(request_with(if_none_match=etag), etag, REPORT_CACHE_CONTROL)
+    assert error.value.status_code == 304
+    assert error.value.headers["ETag"] == etag
+
+def test_check_not_modified_retorna_cabecalhos():
+    etag = make_etag("x")
+    headers = check_not_modified(request_with(if_none_match='"outro"'), etag, REPORT_CACHE_CONTROL)
+    assert headers == {"ETag": etag, "Cache-Control": REPORT_CACHE_CONTROL}
+    assert check_not_modified(request_with(), etag, REPORT_CACHE_CONTROL)["ETag"] == etag
@@ -0,0 +1,59 @@
+"""
+View materializada country_profile (Script.sql), atualizada ao fim das cargas por BD/pos_carga.py
+"""
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from database_fixtures import BD_DIR
+from dao.consultaDAO import ConsultaDAO
+
+sys.path.insert(0, BD_DIR)
+from pos_carga import run_post_load
+
+PROFILE = """SELECT name, region, area, capital, population, languages, language_count, currencies, currency_count
+FROM country_profile WHERE country_code = :code"""
+
+@pytest.fixture
+def conn(database_engine):
+    # Carga desfeita no fim: o REFRESH ... CONCURRENTLY roda dentro da transação de quem chama
+    with database_engine.begin() as conn:
+        conn.execute(text("INSERT INTO countries (country_code, name) VALUES ('ZZA', 'Zedlândia'), ('ZZB', 'Zedônia')"))
+        # Duas linhas de geografia: o perfil usa a primeira (menor country_id)
+        conn.execute(text("INSERT INTO country_geography (country_code, region, area) "
+                          "VALUES ('ZZA', 'Norte', 10.5), ('ZZA', 'Sul', 99)"))
+        conn.execute(text("INSERT INTO country_society (country_code, capital, population) VALUES ('ZZA', 'Zed', 1000)"))
+        # Idiomas repetidos não multiplicam linhas nem contam duas vezes
+        conn.execute(text("INSERT INTO languages (country_code, language) "
+                          "VALUES ('ZZA', 'Zedês'), ('ZZA', 'Alfa'), ('ZZA', 'Zedês')"))
+        conn.execute(text("INSERT INTO currencies (country_code, currency) VALUES ('ZZA', 'Zedo')"))
+        yield conn
+        conn.rollback()
+
+def test_perfil_so_muda_depois_da_pos_carga(conn):
+    assert conn.execute(text(PROFILE), {"code": "ZZA"}).first() is None
+    refreshed = run_post_load(conn, ['countries', 'languages'])
+    assert 'country_profile' in refreshed
+    assert conn.execute(text(PROFILE), {"code": "ZZA"}).one() == (
+        'Zedlândia', 'Norte', 10.5, 'Zed', 1000, ['Alfa', 'Zedês'], 2, ['Zedo'], 1
+    )
+
+def test_pais_sem_dados_relacionados_tem_arrays_vazios(conn):
+    run_post_load(conn, ['countries'])
+    assert conn.execute(text(PROFILE), {"code": "ZZB"}).one() == (
+        'Zedônia', None, None, None, None, [], 0, [], 0
+    )
+
+def test_carga_de_tabela_fora_do_perfil_nao_atualiza(conn):
+    assert 'country_profile' not in run_post_load(conn, ['borders'])
+    assert conn.execute(text(PROFILE), {"code": "ZZA"}).first() is None
+
+def test_relatorio_sobre_o_perfil(conn):
+    run_post_load(conn, ['countries'])
+    query = ConsultaDAO().buildAdhocQuery(
+        "country_profile", ["country_profile.name", "country_profile.language_count"], [], [], [],
+        [{"attribute": "country_profile.name", "direction": "ASC"}],
+        [{"attribute": "country_profile.country_code", "operator": "IN", "value": "ZZA,ZZB"}],
+    )
+    assert [tuple(row) for row in conn.execute(query)] == [('Zedlândia', 2), ('Zedônia', 0)]
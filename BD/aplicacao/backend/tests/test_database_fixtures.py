@@ -0,0 +1,21 @@
+"""
+Cópia do banco template usada pelos testes com banco (pulados sem Postgres)
+"""
+from sqlalchemy import text
+
+def test_copia_tem_o_schema(database_engine):
+    with database_engine.connect() as conn:
+        tables = set(conn.execute(text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = 'public'"
+        )).scalars())
+    assert {"countries", "states", "data_versions"} <= tables
+
+def test_bump_data_version_incrementa_a_versao(database_engine):
+    with database_engine.begin() as conn:
+        before = conn.execute(text(
+            "SELECT coalesce(max(version), 0) FROM data_versions WHERE table_name = 'countries'"
+        )).scalar()
+        conn.execute(text("SELECT bump_data_version(VARIADIC :tables)"), {"tables": ["countries"]})
+        after = conn.execute(text("SELECT version FROM data_versions WHERE table_name = 'countries'")).scalar()
+        conn.rollback()
+    assert after == before + 1
@@ -0,0 +1,31 @@
+"""
+Cabeçalho Range dos downloads de exportação (controller/exportController.py)
+"""
+import pytest
+
+from controller.exportController import parse_range_header
+
+FILE_SIZE = 1000
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=500-5000", (500, 999)),
+    ("BYTES = 10-20", (10, 20)),
+])
+def test_intervalos_validos(header, expected):
+    assert parse_range_header(header, FILE_SIZE) == expected
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",
+    "bytes=50-10",
+    "bytes=-0",
+    "bytes=0-10,20-30",
+    "items=0-10",
+    "bytes=abc-",
+    "bytes=",
+])
+def test_intervalos_invalidos(header):
+    assert parse_range_header(header, FILE_SIZE) is None
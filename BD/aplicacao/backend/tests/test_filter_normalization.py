@@ -0,0 +1,74 @@
+"""
+Normalização da árvore de filtros (ConsultaDAO.normalizeFilters); não usa o banco
+"""
+import pytest
+
+from dao.consultaDAO import ConsultaDAO
+
+@pytest.fixture(scope="module")
+def dao():
+    return ConsultaDAO()
+
+def condition(operator, value, attribute="cities.population"):
+    return {"attribute": attribute, "operator": operator, "value": value}
+
+def test_or_de_igualdades_vira_in(dao):
+    tree = {"logic": "OR", "conditions": [condition("=", 1), condition("=", 2), condition("=", 1)]}
+    assert dao.normalizeFilters(None, tree) == {
+        "attribute": "cities.population", "operator": "IN", "value": [1, 2], "function": None,
+    }
+
+def test_and_de_diferencas_vira_not_in(dao):
+    tree = {"logic": "AND", "conditions": [condition("!=", 1), condition("!=", 2)]}
+    assert dao.normalizeFilters(None, tree)["operator"] == "NOT IN"
+
+def test_colunas_diferentes_nao_sao_combinadas(dao):
+    tree = {"logic": "OR", "conditions": [condition("=", 1), condition("=", 2, "cities.city_id")]}
+    normalized = dao.normalizeFilters(None, tree)
+    assert normalized["logic"] == "OR"
+    assert [child["operator"] for child in normalized["conditions"]] == ["=", "="]
+
+def test_or_com_null_nao_vira_in(dao):
+    # col = NULL é IS NULL; dentro de IN o NULL nunca casaria
+    tree = {"logic": "OR", "conditions": [condition("=", None), condition("=", 1)]}
+    normalized = dao.normalizeFilters(None, tree)
+    assert normalized["logic"] == "OR"
+    assert [(child["operator"], child["value"]) for child in normalized["conditions"]] == [("=", None), ("=", 1)]
+
+def test_and_com_null_nao_vira_not_in(dao):
+    # NOT IN (NULL, ...) nunca é verdadeiro: o relatório voltaria vazio
+    tree = {"logic": "AND", "conditions": [condition("!=", None), condition("!=", 1), condition("!=", 2)]}
+    normalized = dao.normalizeFilters(None, tree)
+    assert {"attribute": "cities.population", "operator": "!=", "value": None, "function": None} in normalized["conditions"]
+    assert {"attribute": "cities.population", "operator": "NOT IN", "value": [1, 2], "function": None} in normalized["conditions"]
+
+def test_lista_in_com_null_nao_e_combinada(dao):
+    tree = {"logic": "OR", "conditions": [condition("IN", [None, 3]), condition("=", 1)]}
+    normalized = dao.normalizeFilters(None, tree)
+    assert len(normalized["conditions"]) == 2
+
+@pytest.mark.parametrize("operator", ["IN", "NOT IN"])
+def test_lista_de_um_null_nao_vira_igualdade(dao, operator):
+    normalized = dao.normalizeFilters([condition(operator, [None])], None)
+    assert normalized == {"attribute": "cities.population", "operator": operator, "value": [None], "function": None}
+
+def test_grupo_absorvido_e_removido(dao):
+    # A AND (A OR B) -> A
+    a = condition("=", 1)
+    tree = {"logic": "AND", "conditions": [a, {"logic": "OR", "conditions": [dict(a), condition(">", 5, "cities.city_id")]}]}
+    assert dao.normalizeFilters(None, tree) == {**a, "function": None}
+
+def test_filtros_planos_entram_com_and(dao):
+    filters = [condition("=", 1), {**condition("=", 2), "logic": "OR"}]
+    tree = condition(">", 10, "cities.city_id")
+    normalized = dao.normalizeFilters(filters, tree)
+    assert normalized["logic"] == "AND"
+    assert {"attribute": "cities.population", "operator": "IN", "value": [1, 2], "function": None} in normalized["conditions"]
+
+def test_placeholder_de_relatorio_salvo_nao_e_combinado(dao):
+    tree = {"logic": "OR", "conditions": [condition("=", ":minimo"), condition("=", 1)]}
+    normalized = dao.normalizeFilters(None, tree, parameter_names=["minimo"])
+    assert len(normalized["conditions"]) == 2
+
+def test_sem_filtros(dao):
+    assert dao.normalizeFilters(None, None) is None
@@ -0,0 +1,55 @@
+"""
+KD-tree sobre a esfera e distâncias do GeoDAO (dao/geoDAO.py)
+"""
+import math
+import random
+
+import pytest
+
+from dao.geoDAO import SphereKDTree, haversine_km, km_to_chord, to_unit_vector
+
+@pytest.fixture(scope="module")
+def coordinates():
+    generator = random.Random(42)
+    return [(generator.uniform(-90, 90), generator.uniform(-180, 180)) for _ in range(500)]
+
+@pytest.fixture(scope="module")
+def tree(coordinates):
+    return SphereKDTree([to_unit_vector(lat, lng) for lat, lng in coordinates])
+
+def brute_force_distances(coordinates, lat, lng):
+    return sorted((haversine_km(lat, lng, *point), index) for index, point in enumerate(coordinates))
+
+def test_haversine_conhecido():
+    # Um grau de latitude no meridiano: ~111,2 km
+    assert haversine_km(0, 0, 1, 0) == pytest.approx(111.195, rel=1e-3)
+    assert haversine_km(10, 20, 10, 20) == 0
+    assert haversine_km(0, 0, 0, 180) == pytest.approx(math.pi * 6371.0088)
+
+def test_corda_cresce_com_a_distancia():
+    lat1, lng1, lat2, lng2 = -15.8, -47.9, 38.7, -9.1
+    a, b = to_unit_vector(lat1, lng1), to_unit_vector(lat2, lng2)
+    chord = math.dist(a, b)
+    assert km_to_chord(haversine_km(lat1, lng1, lat2, lng2)) == pytest.approx(chord)
+
+@pytest.mark.parametrize("lat, lng, radius_km", [(0, 0, 2000), (-23.5, -46.6, 3500), (89, 179, 1500)])
+def test_within_igual_a_forca_bruta(tree, coordinates, lat, lng, radius_km):
+    expected = {index for distance, index in brute_force_distances(coordinates, lat, lng) if distance <= radius_km}
+    found = set(tree.within(to_unit_vector(lat, lng), km_to_chord(radius_km)))
+    assert found == expected
+
+@pytest.mark.parametrize("lat, lng, k", [(0, 0, 1), (48.8, 2.3, 7), (-33.9, 151.2, 25)])
+def test_nearest_igual_a_forca_bruta(tree, coordinates, lat, lng, k):
+    expected = [index for _, index in brute_force_distances(coordinates, lat, lng)[:k]]
+    assert tree.nearest(to_unit_vector(lat, lng), k) == expected
+
+def test_nearest_com_raio(tree, coordinates):
+    target, radius_km = to_unit_vector(10, 10), 1500
+    within = brute_force_distances(coordinates, 10, 10)
+    expected = [index for distance, index in within if distance <= radius_km][:50]
+    assert tree.nearest(target, 50, km_to_chord(radius_km)) == expected
+
+def test_arvore_vazia_e_k_zero(tree):
+    assert SphereKDTree([]).within(to_unit_vector(0, 0), 1.0) == []
+    assert SphereKDTree([]).nearest(to_unit_vector(0, 0), 3) == []
+    assert tree.nearest(to_unit_vector(0, 0), 0) == []
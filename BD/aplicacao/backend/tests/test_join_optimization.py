@@ -0,0 +1,64 @@
+"""
+Otimização dos joins do relatório (ConsultaDAO.optimizeJoins); não usa o banco
+"""
+import pytest
+
+from dao.consultaDAO import ConsultaDAO
+
+@pytest.fixture(scope="module")
+def dao():
+    return ConsultaDAO()
+
+def join(target_table, source_attribute, target_attribute, join_type="LEFT"):
+    return {
+        "targetTable": target_table, "sourceAttribute": source_attribute,
+        "targetAttribute": target_attribute, "joinType": join_type,
+    }
+
+COUNTRIES_JOIN = ("countries", "states.country_code", "countries.country_code")
+
+def optimize(dao, attributes, joins, filters=[]):
+    return dao.optimizeJoins("states", attributes, joins, [], [], [], filters)
+
+def test_left_join_sem_colunas_para_chave_unica_e_removido(dao):
+    joins, plan = optimize(dao, ["states.name"], [join(*COUNTRIES_JOIN)])
+    assert joins == []
+    assert [pruned["table"] for pruned in plan["pruned"]] == ["countries"]
+
+def test_inner_join_por_fk_nao_nula_sem_colunas_e_removido(dao):
+    joins, plan = optimize(dao, ["states.name"], [join(*COUNTRIES_JOIN, "INNER")])
+    assert joins == []
+    assert "FK não nula" in plan["pruned"][0]["reason"]
+
+def test_join_com_coluna_usada_e_mantido(dao):
+    joins, plan = optimize(dao, ["states.name", "countries.name"], [join(*COUNTRIES_JOIN)])
+    assert [each["targetTable"] for each in joins] == ["countries"]
+    assert plan["pruned"] == []
+
+def test_join_usado_so_no_filtro_e_mantido(dao):
+    filters = [{"attribute": "countries.name", "operator": "=", "value": "Brazil"}]
+    joins, _ = optimize(dao, ["states.name"], [join(*COUNTRIES_JOIN)], filters)
+    assert [each["targetTable"] for each in joins] == ["countries"]
+
+def test_left_join_para_coluna_nao_unica_e_mantido(dao):
+    # Várias línguas por país: remover o join mudaria o número de linhas
+    joins, plan = dao.optimizeJoins(
+        "countries", ["countries.name"],
+        [join("languages", "countries.country_code", "languages.country_code")], [], [], []
+    )
+    assert [each["targetTable"] for each in joins] == ["languages"]
+    assert plan["pruned"] == []
+
+def test_joins_internos_antes_dos_externos(dao):
+    joins, plan = optimize(
+        dao, ["states.name", "countries.name", "country_geography.area"],
+        [join(*COUNTRIES_JOIN), join("country_geography", "states.country_code", "country_geography.country_code", "INNER")]
+    )
+    assert plan["originalOrder"] == ["countries", "country_geography"]
+    assert plan["order"] == ["country_geography", "countries"]
+    assert [each["joinType"] for each in joins] == ["INNER", "LEFT"]
+
+def test_right_join_impede_remocao_e_reordenacao(dao):
+    joins, plan = optimize(dao, ["states.name"], [join(*COUNTRIES_JOIN, "RIGHT")])
+    assert [each["targetTable"] for each in joins] == ["countries"]
+    assert plan["pruned"] == []
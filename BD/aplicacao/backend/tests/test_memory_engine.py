@@ -0,0 +1,134 @@
+"""
+Motor de relatórios em memória (dao/memoryEngine.py): mesmo resultado do Postgres
+"""
+import pytest
+from sqlalchemy import text
+
+np = pytest.importorskip("numpy")
+
+from dao import memoryEngine
+from dao.consultaDAO import ConsultaDAO
+from dao.memoryEngine import MemoryEngine, MemoryEngineUnsupported
+
+VERSION_TOKEN = "teste"
+
+COUNTRIES = [("ARG", "Argentina"), ("BRA", "Brasil"), ("CHL", "Chile"), ("URY", "Uruguai")]
+# Chile sem população: nulos entram primeiro no DESC e por último no ASC
+SOCIETY = [(1, "BRA", "Brasília", 210), (2, "ARG", "Buenos Aires", 45), (3, "CHL", "Santiago", None),
+           (4, "URY", "Montevidéu", 3)]
+LANGUAGES = [(1, "BRA", "Portuguese"), (2, "ARG", "Spanish"), (3, "CHL", "Spanish"), (4, "URY", "Spanish")]
+
+SOCIETY_JOIN = {"targetTable": "country_society", "sourceAttribute": "countries.country_code",
+                "targetAttribute": "country_society.country_code", "joinType": "INNER"}
+
+def build_table(engine, column_kinds, rows):
+    """
+    Colunas em memória a partir das linhas; textos ganham a posição na ordem (como o dense_rank da carga)
+    """
+    table = {}
+    for (name, kind), values in zip(column_kinds, zip(*rows)):
+        ranks = None
+        if kind == "str":
+            order = {value: rank for rank, value in enumerate(sorted(set(values)), start=1)}
+            ranks = [order[value] for value in values]
+        table[name] = engine._build_vector(values, kind, ranks)
+    return table
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(memoryEngine.data_version_dao, "getVersionToken", lambda tables=None: VERSION_TOKEN)
+    engine = MemoryEngine()
+    engine._tables = {
+        "countries": build_table(engine, [("country_code", "str"), ("name", "str")], COUNTRIES),
+        "country_society": build_table(
+            engine, [("country_id", "int"), ("country_code", "str"), ("capital", "str"), ("population", "int")], SOCIETY
+        ),
+        "languages": build_table(engine, [("id", "int"), ("country_code", "str"), ("language", "str")], LANGUAGES),
+    }
+    engine._version_token = VERSION_TOKEN
+    return engine
+
+def test_pode_executar_so_com_tabelas_em_memoria(engine):
+    assert engine.canExecute("countries", [SOCIETY_JOIN])
+    assert not engine.canExecute("cities", [])
+    assert not engine.canExecute("countries", [{**SOCIETY_JOIN, "targetTable": "states"}])
+
+def test_filtro_join_e_ordem(engine):
+    names, rows = engine.execute(
+        "countries", ["countries.name", "country_society.population"], [SOCIETY_JOIN], [], [],
+        [{"attribute": "country_society.population", "direction": "DESC"}],
+        {"attribute": "country_society.population", "operator": ">", "value": "10"},
+    )
+    assert names == ["name", "population"]
+    assert rows == [("Brasil", 210), ("Argentina", 45)]
+
+def test_nulos_na_ordem_do_postgres(engine):
+    def order(direction):
+        _, rows = engine.execute(
+            "country_society", ["country_society.country_code"], [], [], [],
+            [{"attribute": "country_society.population", "direction": direction}], None,
+        )
+        return [row[0] for row in rows]
+
+    assert order("DESC") == ["CHL", "BRA", "ARG", "URY"]
+    assert order("ASC") == ["URY", "ARG", "BRA", "CHL"]
+
+def test_agrupamento_e_agregacoes(engine):
+    join = {"targetTable": "country_society", "sourceAttribute": "languages.country_code",
+            "targetAttribute": "country_society.country_code", "joinType": "INNER"}
+    names, rows = engine.execute(
+        "languages", ["languages.language"], [join], ["languages.language"],
+        [{"function": "COUNT", "attribute": "languages.id", "alias": "paises"},
+         {"function": "SUM", "attribute": "country_society.population", "alias": "total"},
+         {"function": "MAX", "attribute": "country_society.capital", "alias": "capital"}],
+        [{"attribute": "paises", "direction": "DESC"}], None,
+    )
+    assert names == ["language", "paises", "total", "capital"]
+    # SUM ignora a população nula do Chile
+    assert rows == [("Spanish", 3, 48, "Santiago"), ("Portuguese", 1, 210, "Brasília")]
+
+def test_recurso_fora_do_motor_vai_para_o_banco(engine):
+    with pytest.raises(MemoryEngineUnsupported):
+        engine.execute("countries", ["countries.name"], [], [], [], [],
+                       {"attribute": "countries.name", "operator": ">", "value": "B"})
+
+@pytest.fixture
+def database_rows(database_engine, monkeypatch):
+    monkeypatch.setattr(memoryEngine, "run_read", lambda operation: operation(database_engine))
+    monkeypatch.setattr(memoryEngine.data_version_dao, "getVersionToken", lambda tables=None: VERSION_TOKEN)
+    # Cópia vazia: a primeira execução carrega as tabelas do banco de testes
+    monkeypatch.setattr(memoryEngine.memory_engine, "_tables", {})
+    with database_engine.begin() as conn:
+        conn.execute(text("INSERT INTO countries (country_code, name) VALUES (:code, :name)"),
+                     [{"code": code, "name": name} for code, name in COUNTRIES])
+        conn.execute(text("INSERT INTO country_society (country_code, capital, population) VALUES (:code, :capital, :population)"),
+                     [{"code": code, "capital": capital, "population": population} for _, code, capital, population in SOCIETY])
+        conn.execute(text("INSERT INTO languages (country_code, language) VALUES (:code, :language)"),
+                     [{"code": code, "language": language} for _, code, language in LANGUAGES])
+    yield
+    codes = {"codes": [code for code, _ in COUNTRIES]}
+    with database_engine.begin() as conn:
+        for table in ("languages", "country_society", "countries"):
+            conn.execute(text(f"DELETE FROM {table} WHERE country_code = ANY(:codes)"), codes)
+
+@pytest.mark.parametrize("report", [
+    {"base_table": "countries", "attributes": ["countries.name", "country_society.capital"],
+     "joins": [SOCIETY_JOIN], "group_by_attributes": [], "aggregate_functions": [],
+     "order_by_columns": [{"attribute": "country_society.population", "direction": "DESC"}],
+     "filters": [{"attribute": "countries.country_code", "operator": "NOT IN", "value": "URY"}]},
+    {"base_table": "languages", "attributes": ["languages.language"], "joins": [], "group_by_attributes": ["languages.language"],
+     "aggregate_functions": [{"function": "COUNT", "attribute": "languages.id", "alias": "paises"}],
+     "order_by_columns": [{"attribute": "languages.language", "direction": "ASC"}], "filters": []},
+])
+def test_mesmo_resultado_do_postgres(report, database_engine, database_rows):
+    consulta_dao = ConsultaDAO()
+    result = consulta_dao._execute_in_memory(
+        report["base_table"], report["attributes"], report["joins"], report["group_by_attributes"],
+        report["aggregate_functions"], report["order_by_columns"], report["filters"], None, None, None
+    )
+    assert result is not None
+    with result:
+        in_memory = [tuple(row) for row in result.all_rows()]
+    with database_engine.connect() as conn:
+        expected = [tuple(row) for row in conn.execute(consulta_dao.buildAdhocQuery(**report))]
+    assert in_memory == expected
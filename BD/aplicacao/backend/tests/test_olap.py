@@ -0,0 +1,68 @@
+"""
+Backend OLAP (DuckDB sobre snapshots Parquet): mesmo resultado do Postgres
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from dao.consultaDAO import ConsultaDAO
+from dao.olapDAO import OlapDAO
+
+duckdb = pytest.importorskip("duckdb")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+# Cidades sem população (carga sem informações de população) geram somas NULL por estado
+CITIES = [
+    (1, 10, "BRA", "Alfa", 100), (2, 10, "BRA", "Beta", 50),
+    (3, 11, "BRA", "Gama", None),
+    (4, 12, "ARG", "Delta", 30), (5, 12, "ARG", "Épsilon", None),
+    (6, 13, "ARG", "Zeta", 500),
+]
+CITY_FIELDS = [("city_id", pa.int32()), ("state_id", pa.int32()), ("country_code", pa.string()),
+               ("name", pa.string()), ("population", pa.int64())]
+
+@pytest.fixture(scope="module")
+def consulta_dao():
+    return ConsultaDAO()
+
+@pytest.fixture
+def olap(tmp_path):
+    schema = pa.schema(CITY_FIELDS)
+    columns = list(zip(*CITIES))
+    pq.write_table(pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                        schema=schema), tmp_path / "cities.parquet")
+    (tmp_path / "manifest.json").write_text(json.dumps({"tables": {"cities": {"rows": len(CITIES), "version": 0}}}))
+    return OlapDAO(str(tmp_path))
+
+def population_by_state(consulta_dao, direction, limit=None):
+    return consulta_dao.buildAdhocQuery(
+        "cities", ["cities.state_id"], [], ["cities.state_id"],
+        [{"function": "SUM", "attribute": "cities.population", "alias": "total"}],
+        [{"attribute": "total", "direction": direction}, {"attribute": "cities.state_id", "direction": "ASC"}],
+        limit=limit,
+    )
+
+def run_olap(olap, query):
+    with olap.execute(query, ["cities"]) as result:
+        return [tuple(row) for row in result.all_rows()]
+
+def test_nulls_primeiro_no_desc(olap, consulta_dao):
+    # Postgres: NULLS FIRST no DESC; o top-2 inclui o estado sem população
+    assert run_olap(olap, population_by_state(consulta_dao, "DESC", limit=2)) == [(11, None), (13, 500)]
+
+def test_nulls_por_ultimo_no_asc(olap, consulta_dao):
+    assert run_olap(olap, population_by_state(consulta_dao, "ASC")) == [(12, 30), (10, 150), (13, 500), (11, None)]
+
+def test_mesmo_resultado_do_postgres(olap, consulta_dao, database_engine):
+    with database_engine.begin() as conn:
+        conn.execute(text("CREATE TEMPORARY TABLE cities (city_id INT, state_id INT, country_code CHAR(3), "
+                          "name VARCHAR(100), population BIGINT)"))
+        conn.execute(text("INSERT INTO cities VALUES (:a, :b, :c, :d, :e)"),
+                     [dict(zip("abcde", city)) for city in CITIES])
+        for direction in ("ASC", "DESC"):
+            query = population_by_state(consulta_dao, direction, limit=3)
+            expected = [tuple(row) for row in conn.execute(query)]
+            assert run_olap(olap, query) == expected
+        conn.rollback()
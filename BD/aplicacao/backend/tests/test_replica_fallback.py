@@ -0,0 +1,102 @@
+"""
+Leituras em réplicas com fallback para o primário (dao/database.py: run_read; ConsultaDAO: Inspector)
+"""
+import time
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from dao import consultaDAO, database
+from dao.consultaDAO import ConsultaDAO
+from dao.replicaRouter import ReplicaRouter
+
+def connection_refused():
+    return OperationalError("SELECT 1", {}, Exception("conexão recusada"))
+
+class FakeEngine:
+    """Engine sem banco: down simula a réplica fora do ar"""
+    def __init__(self, name, down=False):
+        self.url = make_url(f"postgresql://{name}/trabalhoBD2")
+        self.down = down
+
+    def connect(self):
+        if self.down:
+            raise connection_refused()
+        return FakeConnection()
+
+class FakeConnection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, statement):
+        return self
+
+    def scalars(self):
+        return iter(["cities_p0"])
+
+class FakeInspector:
+    def __init__(self, bind):
+        self.bind = bind
+
+    def get_table_names(self, schema=None):
+        if self.bind.down:
+            raise connection_refused()
+        return ["countries", "cities", "cities_p0"]
+
+    def get_materialized_view_names(self, schema=None):
+        return ["country_profile"]
+
+@pytest.fixture
+def engines(monkeypatch):
+    primary, replica = FakeEngine("primario"), FakeEngine("replica", down=True)
+    router = ReplicaRouter(primary, [replica])
+    # Sem health check em segundo plano: a réplica só sai do rodízio pela falha da leitura
+    monkeypatch.setattr(router, "_ensure_health_thread", lambda: None)
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "engine", primary)
+    return primary, replica, router
+
+def test_leitura_repetida_no_primario(engines):
+    primary, replica, router = engines
+    used = []
+
+    def operation(read_engine):
+        used.append(read_engine)
+        with read_engine.connect():
+            return "ok"
+
+    assert database.run_read(operation) == "ok"
+    assert used == [replica, primary]
+    assert router.replicas[0]["healthy"] is False
+    # Próximas leituras já vão direto para o primário
+    assert database.get_read_engine() is primary
+
+def test_falha_no_primario_nao_e_repetida(engines):
+    primary, _, router = engines
+    router.replicas = []
+    primary.down = True
+    calls = []
+
+    def operation(read_engine):
+        calls.append(read_engine)
+        return read_engine.connect()
+
+    with pytest.raises(OperationalError):
+        database.run_read(operation)
+    assert calls == [primary]
+
+def test_inspector_da_replica_trocado_pelo_do_primario(engines, monkeypatch):
+    primary, replica, router = engines
+    monkeypatch.setattr(consultaDAO, "inspect", FakeInspector)
+    dao = ConsultaDAO()
+    dao.engine = primary
+    dao._inspector = FakeInspector(replica)
+    dao._inspector_created_at = time.monotonic()
+
+    assert dao.getAllTables() == ["countries", "cities", "country_profile"]
+    assert dao._inspector.bind is primary
+    assert router.replicas[0]["healthy"] is False
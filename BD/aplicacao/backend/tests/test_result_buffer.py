@@ -0,0 +1,68 @@
+"""
+Orçamento de memória, spill para disco e limite dos resultados (dao/resultBuffer.py)
+"""
+import pytest
+
+from dao.resultBuffer import ProcessMemoryBudget, ResultBuffer, ResultTooLargeError, estimate_rows_size
+
+ROWS = [(index, f"cidade {index}") for index in range(100)]
+ROWS_SIZE = estimate_rows_size(ROWS)
+
+def make_buffer(memory_budget=ROWS_SIZE, max_bytes=10 * ROWS_SIZE, process_limit=100 * ROWS_SIZE):
+    budget = ProcessMemoryBudget(process_limit)
+    return ResultBuffer(["id", "name"], memory_budget=memory_budget, max_bytes=max_bytes, budget=budget), budget
+
+def collect(buffer, batch_size=30):
+    return [row for batch in buffer.iter_batches(batch_size) for row in batch]
+
+def test_resultado_pequeno_fica_em_memoria():
+    buffer, budget = make_buffer()
+    with buffer:
+        buffer.append_rows(ROWS)
+        assert not buffer.spilled
+        assert buffer.all_rows() == ROWS
+        assert budget.stats()["reserved_bytes"] == ROWS_SIZE
+    assert budget.stats()["reserved_bytes"] == 0
+
+def test_excedente_vai_para_o_disco_na_ordem():
+    buffer, budget = make_buffer()
+    more_rows = [(index, f"cidade {index}") for index in range(100, 200)]
+    with buffer:
+        buffer.append_rows(ROWS)
+        buffer.append_rows(more_rows)
+        buffer.append_rows(ROWS)
+        assert buffer.spilled
+        assert buffer.spilled_rows == 200
+        assert buffer.row_count == 300
+        assert collect(buffer) == ROWS + more_rows + ROWS
+        assert budget.stats()["spilled_reports"] == 1
+
+def test_all_rows_recusa_resultado_em_disco():
+    buffer, _ = make_buffer(memory_budget=0)
+    with buffer:
+        buffer.append_rows(ROWS)
+        with pytest.raises(ResultTooLargeError):
+            buffer.all_rows()
+
+def test_orcamento_do_processo_esgotado_faz_spill():
+    buffer, budget = make_buffer(memory_budget=10 * ROWS_SIZE, process_limit=ROWS_SIZE // 2)
+    with buffer:
+        buffer.append_rows(ROWS)
+        assert buffer.spilled
+        assert budget.stats()["reserved_bytes"] == 0
+
+def test_resultado_acima_do_maximo_e_rejeitado():
+    buffer, _ = make_buffer(max_bytes=ROWS_SIZE + ROWS_SIZE // 2)
+    with buffer:
+        buffer.append_rows(ROWS)
+        with pytest.raises(ResultTooLargeError):
+            buffer.append_rows(ROWS)
+        assert buffer.row_count == len(ROWS)
+
+def test_close_pode_ser_chamado_mais_de_uma_vez():
+    buffer, budget = make_buffer()
+    buffer.append_rows(ROWS)
+    buffer.close()
+    buffer.close()
+    assert budget.stats()["reserved_bytes"] == 0
+    assert buffer.rows == []
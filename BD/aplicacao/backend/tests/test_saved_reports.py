@@ -0,0 +1,72 @@
+"""
+Relatórios salvos executados por PREPARE/EXECUTE (dao/savedReportDAO.py)
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from dao import savedReportDAO
+from dao.consultaDAO import ConsultaDAO
+from dao.savedReportDAO import PREPARE_DIALECT, SavedReportDAO
+
+CONTAINS_REPORT = {
+    "base_table": "countries",
+    "attributes": ["countries.country_code", "countries.name"],
+    "joins": [],
+    "group_by_attributes": [],
+    "aggregate_functions": [],
+    "order_by_columns": [],
+    "filters": [{"attribute": "countries.name", "operator": "CONTAINS", "value": ":termo"}],
+    "limit": 10,
+}
+
+@pytest.fixture(scope="module")
+def consulta_dao():
+    return ConsultaDAO()
+
+def compile_prepared(consulta_dao, report, parameters):
+    return consulta_dao.buildAdhocQuery(**report, parameter_names=parameters).compile(dialect=PREPARE_DIALECT)
+
+def test_contains_com_parametro_tem_tipos_explicitos(consulta_dao):
+    sql = str(compile_prepared(consulta_dao, CONTAINS_REPORT, ["termo"]))
+    assert "concat" not in sql.lower()
+    assert "ILIKE (CAST($1 AS VARCHAR) || CAST($2 AS VARCHAR) || CAST($1 AS VARCHAR))" in sql
+
+@pytest.fixture
+def pooled_engine(database_url):
+    # Uma única conexão no pool: as execuções reaproveitam a mesma sessão do PostgreSQL
+    engine = create_engine(database_url, pool_size=1, max_overflow=0)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def saved_report_dao(consulta_dao, database_engine, pooled_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(savedReportDAO, "SAVED_REPORTS_FILE", str(tmp_path / "saved_reports.json"))
+    monkeypatch.setattr(savedReportDAO, "run_read", lambda operation: operation(pooled_engine))
+    with database_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO countries (country_code, name) VALUES ('ZZA', 'Zedlândia'), ('ZZB', 'Zedônia')"
+        ))
+    yield SavedReportDAO(consulta_dao)
+    with database_engine.begin() as conn:
+        conn.execute(text("DELETE FROM countries WHERE country_code IN ('ZZA', 'ZZB')"))
+
+def test_contains_com_parametro_e_preparado_e_executado(saved_report_dao):
+    saved_report_dao.saveReport("paises_por_nome", CONTAINS_REPORT, ["termo"])
+    result, sql = saved_report_dao.runSavedReport("paises_por_nome", {"termo": "zedl"})
+    with result:
+        assert [row[1] for row in result.all_rows()] == ["Zedlândia"]
+    assert "PREPARE" not in sql
+
+def test_nova_versao_da_definicao_substitui_o_statement(saved_report_dao, pooled_engine):
+    saved_report_dao.saveReport("paises_por_nome", CONTAINS_REPORT, ["termo"])
+    saved_report_dao.runSavedReport("paises_por_nome", {"termo": "zed"})[0].close()
+    changed = {**CONTAINS_REPORT, "attributes": ["countries.name"]}
+    saved_report_dao.saveReport("paises_por_nome", changed, ["termo"])
+    result, _ = saved_report_dao.runSavedReport("paises_por_nome", {"termo": "zed"})
+    with result:
+        assert sorted(row[0] for row in result.all_rows()) == ["Zedlândia", "Zedônia"]
+    with pooled_engine.connect() as conn:
+        statements = conn.execute(text("SELECT statement FROM pg_prepared_statements")).scalars().all()
+    # O plano da primeira versão foi desalocado: resta um statement, o da definição atual
+    assert len(statements) == 1
+    assert "countries.country_code" not in statements[0]
@@ -0,0 +1,69 @@
+"""
+Listagem de tabelas do schema (ConsultaDAO): partições e tabelas de apoio ficam de fora
+"""
+import pytest
+
+from dao.consultaDAO import ConsultaDAO
+
+PARTITIONS = {"cities_p0", "cities_p1"}
+
+class FakeConnection:
+    def __init__(self, inspector):
+        self.inspector = inspector
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, statement):
+        self.inspector.partition_queries += 1
+        return self
+
+    def scalars(self):
+        return iter(PARTITIONS)
+
+class FakeInspector:
+    """Inspector com cities particionada (cities_p0/p1) e a tabela antiga mantida por --no-drop"""
+    def __init__(self):
+        self.bind = self
+        self.partition_queries = 0
+        self.foreign_keys = {
+            "countries": [],
+            "states": [{"referred_table": "countries"}],
+            "cities": [{"referred_table": "states"}],
+            "cities_p0": [{"referred_table": "states"}],
+            "cities_p1": [{"referred_table": "states"}],
+            "cities_unpartitioned": [{"referred_table": "states"}],
+        }
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def get_table_names(self, schema=None):
+        return list(self.foreign_keys)
+
+    def get_materialized_view_names(self, schema=None):
+        return ["country_profile"]
+
+    def get_foreign_keys(self, table_name, schema=None):
+        return self.foreign_keys[table_name]
+
+@pytest.fixture
+def dao():
+    consulta_dao = ConsultaDAO()
+    inspector = FakeInspector()
+    consulta_dao._get_inspector = lambda: inspector
+    return consulta_dao
+
+def test_tabelas_sem_particoes_nem_tabela_antiga(dao):
+    assert dao.getAllTables() == ["countries", "states", "cities", "country_profile"]
+
+def test_relacoes_nao_oferecem_particoes(dao):
+    assert sorted(dao.getTableRelations("states")) == ["cities", "countries"]
+
+def test_particoes_lidas_uma_vez_por_inspector(dao):
+    dao.getAllTables()
+    dao.getAllTables()
+    assert dao._get_inspector().partition_queries == 1
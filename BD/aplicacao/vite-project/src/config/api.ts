@@ -6,13 +6,18 @@ export const API_CONFIG = {
   ENDPOINTS: {
     TABLES: '/tables',
     TABLE_COLUMNS: (tableName: string) => `/tables/${tableName}/columns`,
+    COLUMN_VALUES: (tableName: string, columnName: string) => `/tables/${tableName}/columns/${columnName}/values`,
     TABLE_RELATIONS: (tableName: string) => `/tables/${tableName}/relations`,
     TRANSITIVE_RELATIONS: (tableName: string) => `/tables/${tableName}/transitive-relations`,
     TRANSITIVE_RELATIONS_WITH_JOINS: (tableName: string) => `/tables/${tableName}/transitive-relations-with-joins`,
     FOREIGN_KEYS: (sourceTable: string, targetTable: string) => `/tables/${sourceTable}/foreign-keys/${targetTable}`,
     JOINED_COLUMNS: '/tables/joined-columns',
     REPORT: '/report',
-    FUNCTIONS: '/functions/available'
+    FUNCTIONS: '/functions/available',
+    GEO_NEARBY: '/geo/nearby',
+    BORDER_NEIGHBORHOOD: (country: string) => `/graph/borders/${country}`,
+    BORDER_PATH: '/graph/borders/path',
+    BORDER_COMPONENTS: '/graph/borders/components'
   }
 } as const;
 
@@ -28,6 +33,11 @@ export class ApiUrlBuilder {
     return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.TABLE_COLUMNS(tableName)}`;
   }
 
+  static getColumnValues(tableName: string, columnName: string, prefix: string, mode: string = 'prefix'): string {
+    const url = `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.COLUMN_VALUES(tableName, columnName)}`;
+    return `${url}?prefix=${encodeURIComponent(prefix)}&mode=${mode}`;
+  }
+
   static getTableRelations(tableName: string): string {
     return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.TABLE_RELATIONS(tableName)}`;
   }
@@ -56,4 +66,24 @@ export class ApiUrlBuilder {
   static getAvailableFunctions(): string {
     return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.FUNCTIONS}`;
   }
+
+  static getNearbyCountries(params: Record<string, string | number | boolean>): string {
+    const query = Object.entries(params)
+      .map(([key, value]) => `${key}=${encodeURIComponent(String(value))}`)
+      .join('&');
+    return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.GEO_NEARBY}?${query}`;
+  }
+
+  static getBorderNeighborhood(country: string, hops: number = 1): string {
+    return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.BORDER_NEIGHBORHOOD(encodeURIComponent(country))}?hops=${hops}`;
+  }
+
+  static getBorderPath(source: string, target: string): string {
+    const url = `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.BORDER_PATH}`;
+    return `${url}?source=${encodeURIComponent(source)}&target=${encodeURIComponent(target)}`;
+  }
+
+  static getBorderComponents(minSize: number = 1): string {
+    return `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.BORDER_COMPONENTS}?minSize=${minSize}`;
+  }
 }
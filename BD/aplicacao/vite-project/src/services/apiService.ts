@@ -6,13 +6,22 @@ import type {
   ReportRequest, 
   ReportResponse, 
   TableRelations, 
-  ApiResponse 
+  ApiResponse,
+  NearbyCountriesQuery,
+  NearbyCountriesResponse,
+  BorderNeighborhoodResponse,
+  BorderPathResponse,
+  BorderComponentsResponse
 } from '../types';
 
 /**
  * Serviço centralizado para comunicação com a API
  */
 export class ApiService {
+  // Últimos relatórios gerados, por requisição, para revalidação com ETag
+  private static readonly REPORT_CACHE_SIZE = 20;
+  private static reportCache = new Map<string, { etag: string; data: ReportResponse }>();
+
   /**
    * Busca todas as tabelas disponíveis
    */
@@ -41,6 +50,26 @@ export class ApiService {
     }
   }
 
+  /**
+   * Busca valores distintos de uma coluna para autocomplete de filtros
+   */
+  static async getColumnValues(
+    tableName: string,
+    columnName: string,
+    prefix: string,
+    mode: 'prefix' | 'contains' = 'prefix'
+  ): Promise<any[]> {
+    try {
+      const response = await axios.get<ApiResponse<any[]>>(
+        ApiUrlBuilder.getColumnValues(tableName, columnName, prefix, mode)
+      );
+      return response.data.values || [];
+    } catch (error) {
+      console.error(`Erro ao buscar valores da coluna ${tableName}.${columnName}:`, error);
+      return []; // Autocomplete não deve bloquear a edição do filtro
+    }
+  }
+
   /**
    * Busca relações transitivas de uma tabela
    */
@@ -115,10 +144,30 @@ export class ApiService {
    */
   static async generateReport(request: ReportRequest): Promise<ReportResponse> {
     try {
+      // POST não passa pelo cache HTTP do navegador: o ETag do último resultado
+      // de cada requisição é reenviado manualmente em If-None-Match
+      const cacheKey = JSON.stringify(request);
+      const cached = ApiService.reportCache.get(cacheKey);
       const response = await axios.post<ReportResponse>(
         ApiUrlBuilder.getReport(),
-        request
+        request,
+        {
+          headers: cached ? { 'If-None-Match': cached.etag } : undefined,
+          validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+        }
       );
+      if (response.status === 304 && cached) {
+        return cached.data;
+      }
+
+      const etag = response.headers['etag'];
+      if (etag) {
+        ApiService.reportCache.delete(cacheKey);
+        ApiService.reportCache.set(cacheKey, { etag, data: response.data });
+        if (ApiService.reportCache.size > ApiService.REPORT_CACHE_SIZE) {
+          ApiService.reportCache.delete(ApiService.reportCache.keys().next().value as string);
+        }
+      }
       return response.data;
     } catch (error) {
       console.error('Erro ao gerar relatório:', error);
@@ -148,4 +197,59 @@ export class ApiService {
       throw new Error('Erro ao carregar funções disponíveis.');
     }
   }
+
+  /**
+   * Busca países próximos de um país ou ponto (índice geográfico do backend)
+   */
+  static async getNearbyCountries(query: NearbyCountriesQuery): Promise<NearbyCountriesResponse> {
+    try {
+      const params = Object.fromEntries(
+        Object.entries(query).filter(([, value]) => value !== undefined && value !== null)
+      ) as Record<string, string | number | boolean>;
+      const response = await axios.get<NearbyCountriesResponse>(ApiUrlBuilder.getNearbyCountries(params));
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao buscar países próximos:', error);
+      throw new Error('Erro ao buscar países próximos.');
+    }
+  }
+
+  /**
+   * Busca os países a até hops fronteiras terrestres de um país
+   */
+  static async getBorderNeighborhood(country: string, hops: number = 1): Promise<BorderNeighborhoodResponse> {
+    try {
+      const response = await axios.get<BorderNeighborhoodResponse>(ApiUrlBuilder.getBorderNeighborhood(country, hops));
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao buscar vizinhança do país:', error);
+      throw new Error('Erro ao buscar vizinhança do país.');
+    }
+  }
+
+  /**
+   * Busca o menor caminho por fronteiras terrestres entre dois países
+   */
+  static async getBorderPath(source: string, target: string): Promise<BorderPathResponse> {
+    try {
+      const response = await axios.get<BorderPathResponse>(ApiUrlBuilder.getBorderPath(source, target));
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao calcular caminho entre países:', error);
+      throw new Error('Erro ao calcular caminho entre países.');
+    }
+  }
+
+  /**
+   * Busca os grupos de países ligados por fronteiras terrestres
+   */
+  static async getBorderComponents(minSize: number = 1): Promise<BorderComponentsResponse> {
+    try {
+      const response = await axios.get<BorderComponentsResponse>(ApiUrlBuilder.getBorderComponents(minSize));
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao listar componentes do grafo de fronteiras:', error);
+      throw new Error('Erro ao listar componentes do grafo de fronteiras.');
+    }
+  }
 }
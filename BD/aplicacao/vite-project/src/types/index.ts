@@ -14,6 +14,7 @@ export interface Join {
   sourceAttribute: string;
   targetAttribute: string;
   joinType: string;
+  alias?: string; // Permite juntar a mesma tabela mais de uma vez (ex.: countries como "neighbor")
   isTransitive?: boolean;
   intermediateJoins?: Join[];
 }
@@ -41,6 +42,50 @@ export interface ReportRequest {
   orderByColumns: OrderByColumn[];
   filters: Filter[];
   limit?: number;
+  preview?: PreviewOptions;
+  responseFormat?: 'objects' | 'rows';
+  having?: HavingCondition[];
+  topN?: TopNPerGroup;
+  optimizeJoins?: boolean;
+  filterTree?: FilterGroup; // Combinado com AND aos filtros planos
+  engine?: ReportEngine;
+}
+
+// Motor de execução: auto escolhe entre memória, DuckDB (OLAP) e Postgres
+export type ReportEngine = 'auto' | 'postgres' | 'olap';
+
+// Grupo de filtros aninhados (parênteses no WHERE)
+export interface FilterGroup {
+  logic: 'AND' | 'OR';
+  conditions: Array<Omit<Filter, 'logic'> | FilterGroup>;
+}
+
+export interface JoinPlan {
+  originalOrder: string[];
+  order: string[];
+  pruned: Array<{ table: string; alias?: string | null; reason: string }>;
+}
+
+// Filtro sobre agregação: alias de uma agregação selecionada ou função + atributo
+export interface HavingCondition {
+  attribute: string;
+  function?: string;
+  operator: string;
+  value: any;
+  logic?: 'AND' | 'OR';
+}
+
+// Top-N por grupo: N primeiras linhas de cada partição, segundo orderBy
+export interface TopNPerGroup {
+  partitionBy: string[];
+  orderBy: OrderByColumn[];
+  n: number;
+}
+
+export interface PreviewOptions {
+  method?: 'SYSTEM' | 'BERNOULLI';
+  percent?: number;
+  seed?: number | null;
 }
 
 export interface TableRelations {
@@ -51,6 +96,21 @@ export interface TableRelations {
 export interface ReportResponse {
   data: any[];
   sql: string;
+  // Motor que executou o relatório
+  engine?: 'postgres' | 'memory' | 'olap';
+  // Presentes quando responseFormat = 'rows' (no lugar de data)
+  columns?: string[];
+  rows?: any[][];
+  // Presente quando o otimizador removeu ou reordenou joins
+  joinPlan?: JoinPlan;
+  preview?: {
+    approximate: boolean;
+    method: string;
+    percent: number;
+    seed: number | null;
+    scaleFactor: number;
+    aggregates: Array<{ alias: string; function: string; scaled: boolean; scaleFactor: number }>;
+  };
 }
 
 export interface ApiResponse<T> {
@@ -62,7 +122,66 @@ export type JoinType = 'INNER JOIN' | 'LEFT JOIN' | 'RIGHT JOIN' | 'FULL JOIN';
 
 export type SortDirection = 'ASC' | 'DESC';
 
-export type FilterOperator = '=' | '!=' | '>' | '<' | '>=' | '<=' | 'LIKE' | 'ILIKE' | 'IN' | 'NOT IN';
+export type FilterOperator = '=' | '!=' | '>' | '<' | '>=' | '<=' | 'LIKE' | 'ILIKE' | 'CONTAINS' | 'SIMILAR' | 'IN' | 'NOT IN' | 'WITHIN_KM';
+
+// Valor do filtro WITHIN_KM (atributo com códigos de país): país ou ponto de referência e raio
+export interface WithinKmValue {
+  km: number;
+  country?: string;
+  lat?: number;
+  lng?: number;
+}
+
+export interface NearbyCountriesQuery {
+  country?: string;
+  lat?: number;
+  lng?: number;
+  radiusKm?: number;
+  k?: number;
+  includeSelf?: boolean;
+}
+
+export interface NearbyCountry {
+  country_code: string;
+  name: string;
+  lat: number;
+  lng: number;
+  distance_km: number;
+}
+
+export interface NearbyCountriesResponse {
+  center: { country_code?: string; name?: string; lat: number; lng: number };
+  radiusKm: number | null;
+  k: number | null;
+  results: NearbyCountry[];
+}
+
+export interface BorderCountry {
+  country_code: string;
+  name: string | null;
+}
+
+export interface BorderNeighbor extends BorderCountry {
+  hops: number;
+}
+
+export interface BorderNeighborhoodResponse {
+  country: BorderCountry;
+  hops: number;
+  neighbors: BorderNeighbor[];
+}
+
+export interface BorderPathResponse {
+  source: BorderCountry;
+  target: BorderCountry;
+  hops: number | null;
+  path: BorderCountry[];
+}
+
+export interface BorderComponentsResponse {
+  count: number;
+  components: Array<{ size: number; countries: BorderCountry[] }>;
+}
 
 export type AggregateFunctionType = 'COUNT' | 'SUM' | 'AVG' | 'MIN' | 'MAX';
 
@@ -67,6 +67,8 @@ export class FilterUtils {
     { title: 'Diferente (≠)', value: '!=' },
     { title: 'Como (LIKE)', value: 'LIKE' },
     { title: 'Como (sem case)', value: 'ILIKE' },
+    { title: 'Contém', value: 'CONTAINS' },
+    { title: 'Semelhante a', value: 'SIMILAR' },
     { title: 'Em lista (IN)', value: 'IN' },
     { title: 'Não em lista (NOT IN)', value: 'NOT IN' }
   ];
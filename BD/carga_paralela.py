@@ -0,0 +1,170 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from carga_cidades_sem_populacao import DATABASE_URL, Country, load_missing_cities_for_country
+from pos_carga import export_parquet_snapshots, run_post_load
+
+# Fábrica de sessões do processo worker (criada no initializer, uma engine por processo)
+worker_session_factory = None
+
+def init_worker(database_url):
+    """
+    Inicializa o processo worker com sua própria engine.
+    Conexões não podem ser compartilhadas entre processos, então cada worker
+    abre um pool mínimo próprio.
+    """
+    global worker_session_factory
+    worker_engine = create_engine(database_url, pool_size=1, max_overflow=0)
+    worker_session_factory = sessionmaker(bind=worker_engine)
+
+def split_into_shards(country_codes, shard_count):
+    """
+    Divide a lista de países em shards de forma intercalada (round-robin),
+    para que países grandes e pequenos fiquem distribuídos entre os shards.
+    """
+    shard_count = max(1, min(shard_count, len(country_codes)))
+    return [country_codes[i::shard_count] for i in range(shard_count)]
+
+def process_shard(shard_index, country_codes, pause):
+    """
+    Processa um shard de países dentro de um worker.
+    Cada país roda em sua própria transação: uma falha desfaz apenas aquele país.
+
+    Returns:
+        Dicionário com contadores e erros do shard
+    """
+    stats = {
+        'shard': shard_index,
+        'countries_processed': 0,
+        'countries_skipped': 0,
+        'cities_added': 0,
+        'errors': []
+    }
+
+    with worker_session_factory() as session:
+        for country_code in country_codes:
+            country = session.get(Country, country_code)
+            if country is None:
+                stats['countries_skipped'] += 1
+                continue
+
+            print(f"\n🔄 [shard {shard_index} | pid {os.getpid()}] País: {country.name} ({country.country_code})")
+
+            try:
+                cities_added = load_missing_cities_for_country(session, country)
+                if cities_added is None:
+                    session.rollback()
+                    stats['countries_skipped'] += 1
+                else:
+                    session.commit()
+                    stats['countries_processed'] += 1
+                    stats['cities_added'] += cities_added
+            except Exception as e:
+                print(f"❌ [shard {shard_index}] Erro ao processar {country.name}: {e}")
+                session.rollback()
+                stats['errors'].append({'country_code': country_code, 'error': str(e)})
+
+            time.sleep(pause)
+
+    return stats
+
+def load_missing_cities_parallel(start=0, end=None, workers=None, shards=None, pause=3):
+    """
+    Carga de cidades particionada por país e executada em um pool de processos.
+
+    Args:
+        start: Índice inicial dos países a processar (ordenados por country_code)
+        end: Índice final (None para processar todos)
+        workers: Número de processos (padrão: número de CPUs)
+        shards: Número de shards (padrão: 4 por worker, para balancear a carga)
+        pause: Pausa entre países dentro de cada worker
+
+    Returns:
+        Dicionário com os contadores agregados e a lista de erros
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * 4
+
+    # O coordenador usa uma engine própria e a descarta antes de criar o pool,
+    # evitando que conexões abertas sejam herdadas pelos processos filhos
+    coordinator_engine = create_engine(DATABASE_URL)
+    try:
+        with coordinator_engine.connect() as conn:
+            countries_query = select(Country.country_code).order_by(Country.country_code).offset(start)
+            if end is not None:
+                countries_query = countries_query.limit(end - start)
+            country_codes = list(conn.execute(countries_query).scalars().all())
+    finally:
+        coordinator_engine.dispose()
+
+    if not country_codes:
+        print("Nenhum país encontrado para carregar")
+        return {'countries_processed': 0, 'countries_skipped': 0, 'cities_added': 0, 'errors': []}
+
+    country_shards = split_into_shards(country_codes, shards)
+    print(f"\n🔢 {len(country_codes)} países divididos em {len(country_shards)} shards para {workers} workers...\n")
+
+    totals = {'countries_processed': 0, 'countries_skipped': 0, 'cities_added': 0, 'errors': []}
+    started_at = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(DATABASE_URL,)) as executor:
+        futures = {
+            executor.submit(process_shard, index, shard, pause): index
+            for index, shard in enumerate(country_shards)
+        }
+
+        for completed, future in enumerate(as_completed(futures), start=1):
+            shard_index = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                # Falha do processo inteiro (ex.: worker encerrado): registra todos os países do shard
+                print(f"❌ Shard {shard_index} falhou: {e}")
+                totals['errors'].extend(
+                    {'country_code': code, 'error': str(e)} for code in country_shards[shard_index]
+                )
+                continue
+
+            for key in ('countries_processed', 'countries_skipped', 'cities_added'):
+                totals[key] += stats[key]
+            totals['errors'].extend(stats['errors'])
+
+            print(
+                f"📦 Shard {shard_index} concluído ({completed}/{len(country_shards)}): "
+                f"{stats['countries_processed']} países, {stats['cities_added']} cidades, "
+                f"{len(stats['errors'])} erros"
+            )
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"\n✔ Carga paralela concluída em {elapsed:.1f}s: {totals['countries_processed']} países processados, "
+        f"{totals['countries_skipped']} ignorados, {totals['cities_added']} cidades adicionadas, "
+        f"{len(totals['errors'])} erros"
+    )
+    for error in totals['errors']:
+        print(f"   ❌ {error['country_code']}: {error['error']}")
+
+    # Tarefas pós-carga rodam uma única vez, no coordenador, depois de todos os shards
+    if totals['cities_added']:
+        coordinator_engine = create_engine(DATABASE_URL)
+        try:
+            with coordinator_engine.begin() as conn:
+                refreshed = run_post_load(conn, ['cities'])
+            export_parquet_snapshots(coordinator_engine, refreshed)
+        finally:
+            coordinator_engine.dispose()
+
+    return totals
+
+if __name__ == "__main__":
+    print("🚀 Iniciando carga paralela de cidades sem informações de população...")
+
+    workers = int(os.getenv("LOAD_WORKERS", "0")) or None
+    pause = float(os.getenv("LOAD_PAUSE", "3"))
+
+    load_missing_cities_parallel(workers=workers, pause=pause)
+
+    print("\n✅ Processo concluído!")
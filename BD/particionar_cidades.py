@@ -0,0 +1,147 @@
+import argparse
+import os
+from sqlalchemy import create_engine, text
+
+from carga_cidades_sem_populacao import DATABASE_URL
+from pos_carga import export_parquet_snapshots, run_post_load
+
+# Índices de cities recriados na tabela particionada (propagados para cada partição)
+CITY_INDEXES = [
+    "CREATE INDEX idx_cities_state_id ON cities(state_id)",
+    "CREATE INDEX idx_cities_name ON cities(name)",
+    "CREATE INDEX idx_cities_population ON cities(population)",
+    "CREATE INDEX idx_cities_name_lower_prefix ON cities (lower(name) varchar_pattern_ops)",
+    "CREATE INDEX idx_cities_name_lower_trgm ON cities USING gin (lower(name) gin_trgm_ops)",
+    "CREATE INDEX idx_cities_name_trgm ON cities USING gin (name gin_trgm_ops)",
+]
+
+def partition_statements(strategy, partitions, country_codes):
+    """
+    Comandos de criação da tabela particionada e das partições.
+
+    - hash: partitions partições (cities_p0 ... cities_pN) por hash do country_code,
+      com países distribuídos de forma uniforme;
+    - list: uma partição por país com estados cadastrados (cities_bra, ...) e uma
+      partição DEFAULT para países cadastrados depois da migração.
+    """
+    statements = [
+        f"""CREATE TABLE cities (
+    city_id INT NOT NULL DEFAULT nextval('cities_city_id_seq'),
+    state_id INT NOT NULL,
+    country_code CHAR(3) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    population BIGINT,
+    CONSTRAINT cities_pkey PRIMARY KEY (city_id, country_code),
+    CONSTRAINT cities_state_id_country_code_fkey FOREIGN KEY (state_id, country_code)
+        REFERENCES states(state_id, country_code)
+) PARTITION BY {strategy.upper()} (country_code)"""
+    ]
+    if strategy == "hash":
+        for remainder in range(partitions):
+            statements.append(
+                f"CREATE TABLE cities_p{remainder} PARTITION OF cities "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+    else:
+        for country_code in country_codes:
+            statements.append(
+                f"CREATE TABLE cities_{country_code.strip().lower()} PARTITION OF cities "
+                f"FOR VALUES IN ('{country_code.strip()}')"
+            )
+        statements.append("CREATE TABLE cities_default PARTITION OF cities DEFAULT")
+    return statements
+
+def migration_statements(strategy, partitions, country_codes, keep_old=False):
+    """
+    Comandos da migração de cities para a tabela particionada, na ordem de execução.
+
+    A tabela antiga é renomeada para cities_unpartitioned (com os índices renomeados),
+    os dados são copiados com o country_code do estado e a sequência de city_id passa
+    para a nova tabela. A tabela antiga é removida ao final; com keep_old ela fica
+    disponível para comparação (ver backend/benchmarks/bench_cities_partitioning.py).
+    """
+    statements = [
+        # O country_code da cidade precisa ser o do estado: FK composta para (state_id, country_code)
+        "ALTER TABLE states ADD CONSTRAINT states_state_id_country_code_key UNIQUE (state_id, country_code)",
+        "ALTER TABLE cities RENAME TO cities_unpartitioned",
+        """DO $$
+DECLARE
+    idx RECORD;
+BEGIN
+    FOR idx IN SELECT indexname FROM pg_indexes
+               WHERE schemaname = 'public' AND tablename = 'cities_unpartitioned' LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, left(idx.indexname, 49) || '_unpartitioned');
+    END LOOP;
+END $$""",
+    ]
+    statements += partition_statements(strategy, partitions, country_codes)
+    statements += [
+        """INSERT INTO cities (city_id, state_id, country_code, name, population)
+SELECT c.city_id, c.state_id, s.country_code, c.name, c.population
+FROM cities_unpartitioned c
+JOIN states s ON s.state_id = c.state_id""",
+    ]
+    statements += CITY_INDEXES
+    statements += [
+        "ALTER SEQUENCE cities_city_id_seq OWNED BY cities.city_id",
+        "GRANT SELECT ON cities TO documentador",
+        "GRANT SELECT, INSERT, UPDATE, DELETE ON cities TO programador",
+        "GRANT ALL PRIVILEGES ON cities TO dba WITH GRANT OPTION",
+        "ANALYZE cities",
+    ]
+    if not keep_old:
+        statements.append("DROP TABLE cities_unpartitioned")
+    return statements
+
+def migrate_cities(database_url, strategy="hash", partitions=8, keep_old=False, dry_run=False):
+    """
+    Migra cities para uma tabela particionada por país, em uma única transação.
+
+    Args:
+        database_url: URL do banco (usuário com permissão de DDL, ex.: dba)
+        strategy: hash ou list
+        partitions: Número de partições no particionamento por hash
+        keep_old: Mantém a tabela antiga (cities_unpartitioned) para comparação
+        dry_run: Apenas imprime os comandos
+    """
+    engine = create_engine(database_url)
+    try:
+        with engine.begin() as conn:
+            already_partitioned = conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.cities'::regclass"
+            )).first()
+            if already_partitioned:
+                print("ℹ️ A tabela cities já é particionada, nada a fazer")
+                return
+            country_codes = list(conn.execute(text(
+                "SELECT DISTINCT country_code FROM states ORDER BY country_code"
+            )).scalars().all())
+
+            statements = migration_statements(strategy, partitions, country_codes, keep_old)
+            if dry_run:
+                print(";\n\n".join(statements) + ";")
+                return
+
+            print(f"🔧 Particionando cities por {strategy} ({len(statements)} comandos)...")
+            for statement in statements:
+                conn.execute(text(statement))
+            copied = conn.execute(text("SELECT count(*) FROM cities")).scalar()
+            refreshed = run_post_load(conn, ['cities'])
+        print(f"✔ cities particionada por {strategy}: {copied} cidades copiadas")
+        export_parquet_snapshots(engine, refreshed)
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra cities para uma tabela particionada por país")
+    parser.add_argument("--strategy", choices=["hash", "list"], default="hash")
+    parser.add_argument("--partitions", type=int, default=8, help="Partições do particionamento por hash")
+    parser.add_argument("--no-drop", action="store_true",
+                        help="Mantém a tabela original como cities_unpartitioned, para comparação")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas imprime os comandos")
+    args = parser.parse_args()
+
+    migrate_cities(
+        os.getenv("DATABASE_URL", DATABASE_URL), args.strategy, args.partitions,
+        keep_old=args.no_drop, dry_run=args.dry_run
+    )
@@ -0,0 +1,316 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+# Views materializadas e as tabelas das quais dependem: a view é atualizada
+# ao fim de toda carga que altera alguma dessas tabelas
+MATERIALIZED_VIEW_SOURCES = {
+    'country_profile': {'countries', 'country_geography', 'country_society', 'languages', 'currencies'},
+}
+
+# Tabelas mantidas por triggers e as tabelas de origem: já estão atualizadas ao fim
+# da carga, mas a versão dos dados delas também precisa mudar
+TRIGGER_MAINTAINED_SOURCES = {
+    'state_city_stats': {'cities'},
+    'country_city_stats': {'cities'},
+}
+
+# Snapshots Parquet lidos pelo backend OLAP da API (DuckDB); vazio desativa a exportação
+SNAPSHOT_DIR = os.getenv(
+    'OLAP_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aplicacao', 'backend', 'olap_snapshots')
+)
+SNAPSHOT_MANIFEST_FILE = 'manifest.json'
+# Bytes do arquivo exportado convertidos por vez pelo pyarrow (cada bloco vira um row group)
+SNAPSHOT_BLOCK_SIZE = 64 * 1024 * 1024
+# Tabelas internas ou de apoio que não entram nos relatórios
+SNAPSHOT_EXCLUDED = {'data_versions', 'cities_unpartitioned'}
+
+# Colunas de texto com índice GIN de trigramas para filtros de substring (LIKE '%termo%',
+# CONTAINS, SIMILAR); os mesmos índices que o Script.sql cria
+TRIGRAM_INDEXED_COLUMNS = [('states', 'name'), ('cities', 'name')]
+
+def refresh_materialized_views(connection, views):
+    """
+    Atualiza as views materializadas informadas.
+
+    Usa REFRESH ... CONCURRENTLY (a view continua legível durante a atualização e só
+    as linhas alteradas são regravadas); a primeira atualização de uma view criada
+    WITH NO DATA precisa ser completa.
+
+    Args:
+        connection: Conexão ou sessão SQLAlchemy
+        views: Nomes das views materializadas
+
+    Returns:
+        Lista das views atualizadas (as inexistentes no banco são ignoradas)
+    """
+    populated = dict(connection.execute(
+        text("SELECT matviewname, ispopulated FROM pg_matviews WHERE schemaname = 'public'")
+    ).all())
+    refreshed = []
+    for view in sorted(views):
+        if view not in populated:
+            print(f"⚠️ View materializada {view} não existe no banco, atualização ignorada")
+            continue
+        concurrently = "CONCURRENTLY " if populated[view] else ""
+        connection.execute(text(f"REFRESH MATERIALIZED VIEW {concurrently}{view}"))
+        refreshed.append(view)
+    if refreshed:
+        print(f"🔄 Views materializadas atualizadas: {', '.join(refreshed)}")
+    return refreshed
+
+def reportable_relations(connection):
+    """
+    Tabelas e views materializadas do schema public que os relatórios consultam
+    (partições entram pela tabela particionada)
+    """
+    names = connection.execute(text(
+        """SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+           WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'm') AND NOT c.relispartition
+           ORDER BY c.relname"""
+    )).scalars().all()
+    return [name for name in names if name not in SNAPSHOT_EXCLUDED]
+
+# Tipos do Postgres exportados com o tipo Arrow correspondente (os demais viram texto)
+ARROW_NATIVE_TYPES = {'int2', 'int4', 'int8', 'float4', 'float8', 'numeric', 'bool', 'date', 'timestamp', 'timestamptz'}
+
+def _arrow_type(pa, type_name):
+    """
+    Tipo Arrow de uma coluna a partir do tipo do Postgres (pg_type.typname)
+    """
+    if type_name.startswith('_'):
+        return pa.list_(_arrow_type(pa, type_name[1:]))
+    return {
+        'int2': pa.int16(), 'int4': pa.int32(), 'int8': pa.int64(),
+        'float4': pa.float32(), 'float8': pa.float64(), 'numeric': pa.float64(),
+        'bool': pa.bool_(), 'date': pa.date32(),
+        'timestamp': pa.timestamp('us'), 'timestamptz': pa.timestamp('us', tz='UTC'),
+    }.get(type_name, pa.string())
+
+def _snapshot_select(table, table_columns):
+    """
+    SELECT que serializa cada linha da tabela como um objeto JSON: números, booleanos e
+    arrays mantêm o tipo; colunas sem tipo Arrow correspondente saem como texto
+    """
+    def column_expression(name, type_name):
+        if type_name.lstrip('_') in ARROW_NATIVE_TYPES:
+            return f'"{name}"'
+        cast = 'text[]' if type_name.startswith('_') else 'text'
+        return f'"{name}"::{cast} AS "{name}"'
+
+    select_list = ", ".join(column_expression(name, type_name) for name, type_name in table_columns)
+    return f'SELECT row_to_json(t) FROM (SELECT {select_list} FROM "{table}") t'
+
+def export_parquet_snapshots(engine, tables, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Grava um snapshot Parquet de cada tabela (ou view materializada) para o backend
+    OLAP da API e registra no manifest as linhas e a versão dos dados exportada.
+
+    Roda depois do commit da carga, em uma conexão própria e em uma transação somente
+    leitura REPEATABLE READ: os snapshots e as versões do manifest vêm da mesma foto do
+    banco, e uma carga confirmada no meio da exportação só deixa o manifest atrás do
+    banco (a API trata o snapshot como desatualizado até a próxima exportação).
+
+    As linhas saem do Postgres por COPY ... TO STDOUT como JSON (uma linha por registro)
+    para um arquivo temporário e são convertidas em lotes pelo leitor JSON do pyarrow,
+    sem passar valor a valor pelo Python.
+
+    Args:
+        engine: Engine SQLAlchemy
+        tables: Nomes das tabelas/views
+        snapshot_dir: Diretório dos snapshots (vazio desativa a exportação)
+
+    Returns:
+        Lista das tabelas exportadas
+    """
+    if not snapshot_dir or not tables:
+        return []
+    try:
+        import pyarrow as pa
+        import pyarrow.json as pj
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⚠️ pyarrow não instalado, snapshots Parquet não exportados")
+        return []
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tables = sorted(set(tables))
+    exported = {}
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+        cursor.execute(
+            """SELECT c.relname, a.attname, t.typname
+               FROM pg_attribute a
+               JOIN pg_class c ON c.oid = a.attrelid
+               JOIN pg_namespace n ON n.oid = c.relnamespace
+               JOIN pg_type t ON t.oid = a.atttypid
+               WHERE n.nspname = 'public' AND c.relname = ANY(%s) AND a.attnum > 0 AND NOT a.attisdropped
+               ORDER BY c.relname, a.attnum""",
+            (tables,)
+        )
+        columns = {}
+        for table, column, type_name in cursor.fetchall():
+            columns.setdefault(table, []).append((column, type_name))
+        cursor.execute("SELECT table_name, version FROM data_versions WHERE table_name = ANY(%s)", (tables,))
+        versions = dict(cursor.fetchall())
+
+        for table in tables:
+            if table not in columns:
+                print(f"⚠️ Tabela {table} não existe no banco, snapshot ignorado")
+                continue
+            schema = pa.schema([pa.field(name, _arrow_type(pa, type_name)) for name, type_name in columns[table]])
+            # Datas e timestamps chegam como texto ISO 8601 e são convertidos por lote
+            read_schema = pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_temporal(field.type) else field
+                for field in schema
+            ])
+            path = os.path.join(snapshot_dir, f"{table}.parquet")
+            partial_path = path + '.part'
+            json_path = path + '.jsonl.part'
+            rows = 0
+            try:
+                # CSV com aspas e delimitador que o JSON nunca contém: cada linha sai sem escapes
+                with open(json_path, 'wb') as file:
+                    cursor.copy_expert(
+                        f"COPY ({_snapshot_select(table, columns[table])}) TO STDOUT "
+                        "WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+                        file
+                    )
+                reader = pj.open_json(
+                    json_path,
+                    read_options=pj.ReadOptions(block_size=SNAPSHOT_BLOCK_SIZE),
+                    parse_options=pj.ParseOptions(explicit_schema=read_schema, unexpected_field_behavior='error')
+                )
+                with pq.ParquetWriter(partial_path, schema, compression='zstd') as writer:
+                    for batch in reader:
+                        writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+                        rows += batch.num_rows
+            finally:
+                if os.path.exists(json_path):
+                    os.remove(json_path)
+            # Troca atômica: a API nunca lê um arquivo pela metade
+            os.replace(partial_path, path)
+            exported[table] = {
+                "rows": rows,
+                "version": versions.get(table, 0),
+                "exported_at": datetime.now(timezone.utc).isoformat(),
+            }
+        raw_connection.commit()
+    finally:
+        raw_connection.close()
+
+    manifest_path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST_FILE)
+    manifest = {"tables": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    manifest.setdefault("tables", {}).update(exported)
+    with open(manifest_path + '.part', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(manifest_path + '.part', manifest_path)
+    if exported:
+        summary = ", ".join(f"{name} ({info['rows']} linhas)" for name, info in exported.items())
+        print(f"📦 Snapshots Parquet exportados: {summary}")
+    return list(exported)
+
+def ensure_trigram_indexes(engine, columns=TRIGRAM_INDEXED_COLUMNS):
+    """
+    Cria os índices de trigramas que faltam nas colunas da lista (manutenção manual,
+    ex.: banco criado antes dos índices no Script.sql).
+
+    Usa CREATE INDEX CONCURRENTLY, que não bloqueia escritas mas, se interrompido,
+    deixa o índice marcado como INVALID: nesse caso o índice é removido e recriado.
+
+    Args:
+        engine: Engine SQLAlchemy (CONCURRENTLY exige conexão fora de transação)
+        columns: Pares (tabela, coluna)
+
+    Returns:
+        Lista dos índices criados
+    """
+    created = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table, column in columns:
+            index_name = f"idx_{table}_{column}_trgm"
+            valid = conn.execute(text(
+                """SELECT i.indisvalid FROM pg_index i
+                   JOIN pg_class c ON c.oid = i.indexrelid
+                   JOIN pg_namespace n ON n.oid = c.relnamespace
+                   WHERE n.nspname = 'public' AND c.relname = :name"""
+            ), {"name": index_name}).scalar()
+            if valid:
+                continue
+            if valid is not None:
+                print(f"⚠️ Índice {index_name} inválido (criação interrompida), recriando")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+            conn.execute(text(
+                f'CREATE INDEX CONCURRENTLY "{index_name}" ON "{table}" USING gin ("{column}" gin_trgm_ops)'
+            ))
+            created.append(index_name)
+    if created:
+        print(f"🔎 Índices de trigramas criados: {', '.join(created)}")
+    return created
+
+def run_post_load(connection, tables):
+    """
+    Tarefas executadas ao fim de uma carga, na mesma transação de quem chama.
+
+    Atualiza as views materializadas que dependem das tabelas alteradas e incrementa
+    a versão dos dados das tabelas, das views e das tabelas mantidas por triggers (o que
+    invalida os ETags de relatórios e os caches em memória da API). Os snapshots Parquet
+    usados pelo backend OLAP são regravados por quem chama, depois do commit, com
+    export_parquet_snapshots(engine, <tabelas retornadas>).
+
+    Args:
+        connection: Conexão ou sessão SQLAlchemy (o commit fica a cargo de quem chama)
+        tables: Nomes das tabelas alteradas pela carga
+
+    Returns:
+        Lista das tabelas e views com a versão dos dados atualizada
+    """
+    tables = sorted(set(tables))
+    if not tables:
+        return []
+    views = [view for view, sources in MATERIALIZED_VIEW_SOURCES.items() if sources & set(tables)]
+    derived = {table for table, sources in TRIGGER_MAINTAINED_SOURCES.items() if sources & set(tables)}
+    if views:
+        derived |= set(refresh_materialized_views(connection, views))
+    tables = sorted(set(tables) | derived)
+    connection.execute(text("SELECT bump_data_version(VARIADIC :tables)"), {"tables": tables})
+    print(f"🔖 Versão dos dados atualizada: {', '.join(tables)}")
+    return tables
+
+if __name__ == "__main__":
+    # Atualização manual de todas as views (ex.: depois de alterações feitas fora das cargas);
+    # com --snapshots também exporta os snapshots Parquet de todas as tabelas (primeira exportação)
+    # e com --indices-trigramas cria os índices de trigramas que faltam
+    import argparse
+    from sqlalchemy import create_engine
+    from carga_cidades_sem_populacao import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Atualiza as views materializadas e os snapshots Parquet")
+    parser.add_argument("--snapshots", action="store_true", help="Exporta os snapshots Parquet de todas as tabelas")
+    parser.add_argument("--indices-trigramas", action="store_true",
+                        help="Cria os índices de trigramas que faltam (TRIGRAM_INDEXED_COLUMNS)")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", DATABASE_URL))
+    try:
+        if args.indices_trigramas:
+            ensure_trigram_indexes(engine)
+        with engine.begin() as conn:
+            views = refresh_materialized_views(conn, MATERIALIZED_VIEW_SOURCES)
+            if views:
+                conn.execute(text("SELECT bump_data_version(VARIADIC :tables)"), {"tables": views})
+            if args.snapshots:
+                views = reportable_relations(conn)
+        export_parquet_snapshots(engine, views)
+    finally:
+        engine.dispose()